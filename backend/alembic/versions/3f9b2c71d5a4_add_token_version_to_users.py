@@ -0,0 +1,26 @@
+"""add_token_version_to_users
+
+Revision ID: 3f9b2c71d5a4
+Revises: d34404f8ec53
+Create Date: 2026-10-17 09:12:40.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9b2c71d5a4'
+down_revision: Union[str, None] = 'd34404f8ec53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'token_version')
@@ -0,0 +1,61 @@
+"""add_user_roles_table
+
+Revision ID: 8c1e4a6f2b90
+Revises: 3f9b2c71d5a4
+Create Date: 2026-10-17 11:03:17.562190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c1e4a6f2b90'
+down_revision: Union[str, None] = '3f9b2c71d5a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_roles',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('role_name', sa.String(length=50), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'role_name')
+    )
+    op.create_index('ix_user_roles_role_name_user_id', 'user_roles', ['role_name', 'user_id'], unique=False)
+
+    # Переносим роли из JSON-строки users.roles. Некорректный JSON и значения,
+    # отличные от массива, пропускаются (как в startup.sync_user_role_memberships),
+    # а не прерывают миграцию
+    op.execute("""
+        CREATE FUNCTION pg_temp.user_roles_json(value text) RETURNS json AS $$
+        BEGIN
+            RETURN value::json;
+        EXCEPTION WHEN others THEN
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql IMMUTABLE
+    """)
+    op.execute("""
+        INSERT INTO user_roles (user_id, role_name)
+        SELECT DISTINCT u.id, r.role_name
+        FROM users u
+        CROSS JOIN LATERAL (SELECT pg_temp.user_roles_json(u.roles) AS roles) j
+        CROSS JOIN LATERAL json_array_elements_text(
+            CASE WHEN json_typeof(j.roles) = 'array' THEN j.roles ELSE '[]'::json END
+        ) AS r(role_name)
+        WHERE json_typeof(j.roles) = 'array'
+          AND r.role_name IS NOT NULL
+          AND length(r.role_name) <= 50
+        ON CONFLICT DO NOTHING
+    """)
+    op.execute("DROP FUNCTION pg_temp.user_roles_json(text)")
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_roles_role_name_user_id', table_name='user_roles')
+    op.drop_table('user_roles')
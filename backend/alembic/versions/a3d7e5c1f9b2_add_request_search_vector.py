@@ -0,0 +1,76 @@
+"""add_request_search_vector
+
+Revision ID: a3d7e5c1f9b2
+Revises: c6f2a8d4e1b9
+Create Date: 2026-10-17 23:41:06.318274
+
+Полнотекстовый поиск заявок: колонка search_vector, триггер, который ее
+поддерживает, заполнение существующих заявок пачками и GIN-индекс (вне
+транзакции миграции).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3d7e5c1f9b2'
+down_revision: Union[str, None] = 'c6f2a8d4e1b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 5000
+
+# Выражение продублировано из модели, чтобы миграция не зависела от ее будущих правок
+SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('russian', coalesce({row}title, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce({row}description, '')), 'B') ||
+    setweight(jsonb_to_tsvector('russian', coalesce({row}form_data::jsonb, '{{}}'::jsonb), '["string"]'), 'C')
+"""
+
+
+def upgrade() -> None:
+    op.add_column('requests', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION requests_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {SEARCH_VECTOR_SQL.format(row='NEW.')};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER requests_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF title, description, form_data ON requests
+        FOR EACH ROW EXECUTE FUNCTION requests_search_vector_update()
+    """)
+
+    # Миграции идут в одной транзакции (alembic/env.py), поэтому заполнение и
+    # индекс выполняются в autocommit: колонка и триггер фиксируются до него,
+    # каждая пачка по id фиксируется сразу и не держит блокировки строк до
+    # конца миграции, а индекс строится без блокировки записи в requests
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        max_id = connection.execute(sa.text("SELECT max(id) FROM requests")).scalar() or 0
+        for start in range(0, max_id + 1, BACKFILL_BATCH_SIZE):
+            connection.execute(
+                sa.text(f"""
+                    UPDATE requests SET search_vector = {SEARCH_VECTOR_SQL.format(row='')}
+                    WHERE id >= :start AND id < :stop AND search_vector IS NULL
+                """),
+                {"start": start, "stop": start + BACKFILL_BATCH_SIZE}
+            )
+
+        op.create_index(
+            'ix_requests_search_vector', 'requests', ['search_vector'], unique=False,
+            postgresql_using='gin', postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_requests_search_vector', table_name='requests')
+    op.execute("DROP TRIGGER IF EXISTS requests_search_vector_trigger ON requests")
+    op.execute("DROP FUNCTION IF EXISTS requests_search_vector_update()")
+    op.drop_column('requests', 'search_vector')
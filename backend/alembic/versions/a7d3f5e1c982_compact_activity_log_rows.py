@@ -0,0 +1,120 @@
+"""compact_activity_log_rows
+
+Revision ID: a7d3f5e1c982
+Revises: f4c8a1d2e6b3
+Create Date: 2026-10-17 18:42:09.317264
+
+Строка User-Agent заменяется ссылкой на справочник user_agents, а
+method/status_code/process_time переносятся из details в колонки.
+Перенос идет пакетами по диапазонам id вне транзакции миграции
+(autocommit_block): каждая пачка фиксируется сразу и не держит блокировки
+строк и WAL до конца миграции. Место, занятое старыми версиями строк, возвращается только
+VACUUM FULL или pg_repack после миграции.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3f5e1c982'
+down_revision: Union[str, None] = 'f4c8a1d2e6b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 50000
+
+
+def _id_batches(connection):
+    min_id, max_id = connection.execute(sa.text("SELECT min(id), max(id) FROM activity_logs")).one()
+    if min_id is None:
+        return
+    for start in range(min_id, max_id + 1, BATCH_SIZE):
+        yield start, start + BATCH_SIZE
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+
+    op.create_table(
+        'user_agents',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('hash', sa.String(length=32), nullable=False),
+        sa.Column('value', sa.Text(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('hash')
+    )
+
+    op.add_column('activity_logs', sa.Column('user_agent_id', sa.Integer(), nullable=True))
+    op.add_column('activity_logs', sa.Column('method', sa.String(length=10), nullable=True))
+    op.add_column('activity_logs', sa.Column('status_code', sa.SmallInteger(), nullable=True))
+    op.add_column('activity_logs', sa.Column('duration_ms', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'activity_logs_user_agent_id_fkey', 'activity_logs', 'user_agents', ['user_agent_id'], ['id']
+    )
+
+    connection.execute(sa.text("""
+        INSERT INTO user_agents (hash, value)
+        SELECT DISTINCT md5(user_agent), user_agent
+        FROM activity_logs
+        WHERE user_agent IS NOT NULL AND user_agent <> ''
+        ON CONFLICT (hash) DO NOTHING
+    """))
+
+    # Миграции идут в одной транзакции (alembic/env.py): без autocommit все
+    # пачки копились бы в ней. Повторный проход по уже перенесенной пачке
+    # ничего не теряет - значения колонок сохраняются через COALESCE
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        for start, end in _id_batches(connection):
+            connection.execute(sa.text("""
+                UPDATE activity_logs l
+                SET user_agent_id = COALESCE(
+                        l.user_agent_id,
+                        (SELECT ua.id FROM user_agents ua WHERE ua.hash = md5(l.user_agent))
+                    ),
+                    method = COALESCE(l.method, l.details->>'method'),
+                    status_code = COALESCE(l.status_code, (l.details->>'status_code')::int),
+                    duration_ms = COALESCE(l.duration_ms, round((l.details->>'process_time')::numeric * 1000)),
+                    details = NULLIF(
+                        l.details::jsonb - 'method' - 'status_code' - 'process_time',
+                        '{}'::jsonb
+                    )::json
+                WHERE l.id >= :start AND l.id < :end
+            """), {"start": start, "end": end})
+
+    op.drop_column('activity_logs', 'user_agent')
+
+    op.create_index('ix_activity_logs_status_code', 'activity_logs', ['status_code'], unique=False)
+    op.create_index('ix_activity_logs_duration_ms', 'activity_logs', ['duration_ms'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_activity_logs_duration_ms', table_name='activity_logs')
+    op.drop_index('ix_activity_logs_status_code', table_name='activity_logs')
+    op.add_column('activity_logs', sa.Column('user_agent', sa.Text(), nullable=True))
+
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        for start, end in _id_batches(connection):
+            connection.execute(sa.text("""
+                UPDATE activity_logs l
+                SET user_agent = (SELECT ua.value FROM user_agents ua WHERE ua.id = l.user_agent_id),
+                    details = (
+                        COALESCE(l.details::jsonb, '{}'::jsonb)
+                        || jsonb_strip_nulls(jsonb_build_object(
+                            'method', l.method,
+                            'status_code', l.status_code,
+                            'process_time', l.duration_ms / 1000.0
+                        ))
+                    )::json
+                WHERE l.id >= :start AND l.id < :end
+            """), {"start": start, "end": end})
+
+    op.drop_constraint('activity_logs_user_agent_id_fkey', 'activity_logs', type_='foreignkey')
+    op.drop_column('activity_logs', 'duration_ms')
+    op.drop_column('activity_logs', 'status_code')
+    op.drop_column('activity_logs', 'method')
+    op.drop_column('activity_logs', 'user_agent_id')
+    op.drop_table('user_agents')
@@ -0,0 +1,133 @@
+"""partition_activity_logs_by_month
+
+Revision ID: b5d7e2c94a1f
+Revises: 8c1e4a6f2b90
+Create Date: 2026-10-17 13:41:05.917342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d7e2c94a1f'
+down_revision: Union[str, None] = '8c1e4a6f2b90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Сколько месяцев вперед создавать секции (дальше их создает startup/скрипт обслуживания)
+MONTHS_AHEAD = 3
+
+INDEXED_COLUMNS = ['action', 'created_at', 'id', 'resource_id', 'resource_type', 'user_id']
+
+
+def _create_indexes() -> None:
+    for column in INDEXED_COLUMNS:
+        op.create_index(f'ix_activity_logs_{column}', 'activity_logs', [column], unique=False)
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    relkind = connection.execute(
+        sa.text("SELECT relkind FROM pg_class WHERE relname = 'activity_logs' AND relkind IN ('p', 'r')")
+    ).scalar()
+    if relkind == 'p':
+        # Таблица уже создана секционированной (create_all на пустой базе)
+        return
+
+    # Старая таблица: индексы освобождают имена, последовательность id переходит к новой таблице
+    op.execute("ALTER TABLE activity_logs RENAME TO activity_logs_unpartitioned")
+    op.execute("ALTER TABLE activity_logs_unpartitioned RENAME CONSTRAINT activity_logs_pkey TO activity_logs_unpartitioned_pkey")
+    for column in INDEXED_COLUMNS:
+        op.execute(f"DROP INDEX IF EXISTS ix_activity_logs_{column}")
+    op.execute("ALTER SEQUENCE activity_logs_id_seq OWNED BY NONE")
+
+    op.execute("""
+        CREATE TABLE activity_logs (
+            id INTEGER NOT NULL DEFAULT nextval('activity_logs_id_seq'),
+            user_id INTEGER REFERENCES users (id),
+            action VARCHAR NOT NULL,
+            resource_type VARCHAR,
+            resource_id VARCHAR,
+            description TEXT NOT NULL,
+            details JSON,
+            ip_address VARCHAR,
+            user_agent TEXT,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("ALTER SEQUENCE activity_logs_id_seq OWNED BY activity_logs.id")
+    _create_indexes()
+
+    # Месячные секции от самой старой записи до MONTHS_AHEAD месяцев вперед
+    op.execute(f"""
+        DO $$
+        DECLARE
+            month_start DATE;
+            last_month DATE := date_trunc('month', now() AT TIME ZONE 'UTC')::date + INTERVAL '{MONTHS_AHEAD} months';
+        BEGIN
+            SELECT COALESCE(date_trunc('month', min(created_at) AT TIME ZONE 'UTC')::date,
+                            date_trunc('month', now() AT TIME ZONE 'UTC')::date)
+            INTO month_start
+            FROM activity_logs_unpartitioned;
+
+            WHILE month_start <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF activity_logs FOR VALUES FROM (%L) TO (%L)',
+                    'activity_logs_y' || to_char(month_start, 'YYYY') || 'm' || to_char(month_start, 'MM'),
+                    month_start::text || ' 00:00:00+00',
+                    (month_start + INTERVAL '1 month')::date::text || ' 00:00:00+00'
+                );
+                month_start := (month_start + INTERVAL '1 month')::date;
+            END LOOP;
+        END $$;
+    """)
+    # Страховка от записей вне созданных секций (например, с часами в будущем)
+    op.execute("CREATE TABLE activity_logs_default PARTITION OF activity_logs DEFAULT")
+
+    op.execute("""
+        INSERT INTO activity_logs (id, user_id, action, resource_type, resource_id, description,
+                                   details, ip_address, user_agent, created_at)
+        SELECT id, user_id, action, resource_type, resource_id, description,
+               details, ip_address, user_agent, COALESCE(created_at, now())
+        FROM activity_logs_unpartitioned
+    """)
+    op.execute("DROP TABLE activity_logs_unpartitioned")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE activity_logs RENAME TO activity_logs_partitioned")
+    op.execute("ALTER TABLE activity_logs_partitioned RENAME CONSTRAINT activity_logs_pkey TO activity_logs_partitioned_pkey")
+    for column in INDEXED_COLUMNS:
+        op.execute(f"DROP INDEX IF EXISTS ix_activity_logs_{column}")
+    op.execute("ALTER SEQUENCE activity_logs_id_seq OWNED BY NONE")
+
+    op.execute("""
+        CREATE TABLE activity_logs (
+            id INTEGER NOT NULL DEFAULT nextval('activity_logs_id_seq'),
+            user_id INTEGER REFERENCES users (id),
+            action VARCHAR NOT NULL,
+            resource_type VARCHAR,
+            resource_id VARCHAR,
+            description TEXT NOT NULL,
+            details JSON,
+            ip_address VARCHAR,
+            user_agent TEXT,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+            CONSTRAINT activity_logs_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute("ALTER SEQUENCE activity_logs_id_seq OWNED BY activity_logs.id")
+    _create_indexes()
+
+    op.execute("""
+        INSERT INTO activity_logs
+        SELECT id, user_id, action, resource_type, resource_id, description,
+               details, ip_address, user_agent, created_at
+        FROM activity_logs_partitioned
+    """)
+    # Удаляет и все секции
+    op.execute("DROP TABLE activity_logs_partitioned CASCADE")
@@ -0,0 +1,31 @@
+"""add_open_assignee_index
+
+Revision ID: b8e4d1f6a3c7
+Revises: e5b7c9d2f4a6
+Create Date: 2026-10-17 21:36:52.104718
+
+Частичный индекс открытых заявок по исполнителям: по нему при старте
+строятся счетчики нагрузки для автоназначения.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e4d1f6a3c7'
+down_revision: Union[str, None] = 'e5b7c9d2f4a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_requests_open_assignee', 'requests', ['assignee_id'], unique=False,
+        postgresql_where=sa.text("status IN ('submitted', 'in_review', 'approved') AND assignee_id IS NOT NULL")
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_requests_open_assignee', table_name='requests')
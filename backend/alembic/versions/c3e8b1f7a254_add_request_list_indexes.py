@@ -0,0 +1,28 @@
+"""add_request_list_indexes
+
+Revision ID: c3e8b1f7a254
+Revises: a7d3f5e1c982
+Create Date: 2026-10-17 19:26:44.801537
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8b1f7a254'
+down_revision: Union[str, None] = 'a7d3f5e1c982'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_requests_author_created_at_id', 'requests', ['author_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_requests_assignee_created_at_id', 'requests', ['assignee_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_requests_assignee_created_at_id', table_name='requests')
+    op.drop_index('ix_requests_author_created_at_id', table_name='requests')
@@ -0,0 +1,52 @@
+"""add_request_sla_scheduler
+
+Revision ID: c6f2a8d4e1b9
+Revises: b8e4d1f6a3c7
+Create Date: 2026-10-17 22:58:14.602381
+
+Частичный индекс сроков заявок в работе, журнал эскалаций и счетчики
+просроченных заявок для дашборда.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6f2a8d4e1b9'
+down_revision: Union[str, None] = 'b8e4d1f6a3c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_requests_open_deadline', 'requests', ['deadline'], unique=False,
+        postgresql_where=sa.text("status IN ('in_review', 'approved')")
+    )
+    op.create_table(
+        'request_escalations',
+        sa.Column('request_id', sa.Integer(), nullable=False),
+        sa.Column('level', sa.String(length=16), nullable=False),
+        sa.Column('deadline', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('recipients', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['request_id'], ['requests.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('request_id', 'level')
+    )
+    op.create_table(
+        'request_sla_counters',
+        sa.Column('dimension', sa.String(length=16), nullable=False),
+        sa.Column('key', sa.String(length=32), nullable=False),
+        sa.Column('overdue', sa.Integer(), nullable=False),
+        sa.Column('due_soon', sa.Integer(), nullable=False),
+        sa.Column('refreshed_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('dimension', 'key')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('request_sla_counters')
+    op.drop_table('request_escalations')
+    op.drop_index('ix_requests_open_deadline', table_name='requests')
@@ -0,0 +1,54 @@
+"""add_request_candidates
+
+Revision ID: d9f2a6c4e817
+Revises: c3e8b1f7a254
+Create Date: 2026-10-17 20:03:51.274906
+
+Возможные исполнители заявок переносятся из JSON-колонки
+requests.possible_assignees в таблицу request_candidates.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9f2a6c4e817'
+down_revision: Union[str, None] = 'c3e8b1f7a254'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'request_candidates',
+        sa.Column('request_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['request_id'], ['requests.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('request_id', 'user_id')
+    )
+    op.create_index(
+        'ix_request_candidates_user_id_request_id', 'request_candidates', ['user_id', 'request_id'], unique=False
+    )
+
+    # Элементы списка могут быть числами или строками - берем только целые id существующих пользователей
+    op.execute("""
+        INSERT INTO request_candidates (request_id, user_id)
+        SELECT DISTINCT r.id, u.id
+        FROM requests r
+        CROSS JOIN LATERAL json_array_elements_text(r.possible_assignees) AS candidate(value)
+        JOIN users u ON u.id = candidate.value::integer
+        WHERE r.possible_assignees IS NOT NULL
+          AND json_typeof(r.possible_assignees) = 'array'
+          AND candidate.value ~ '^[0-9]+$'
+        ON CONFLICT DO NOTHING
+    """)
+
+
+def downgrade() -> None:
+    # possible_assignees поддерживается в актуальном состоянии - переносить обратно нечего
+    op.drop_index('ix_request_candidates_user_id_request_id', table_name='request_candidates')
+    op.drop_table('request_candidates')
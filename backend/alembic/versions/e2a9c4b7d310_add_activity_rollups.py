@@ -0,0 +1,54 @@
+"""add_activity_rollups
+
+Revision ID: e2a9c4b7d310
+Revises: b5d7e2c94a1f
+Create Date: 2026-10-17 15:12:44.208113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a9c4b7d310'
+down_revision: Union[str, None] = 'b5d7e2c94a1f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'activity_rollups',
+        sa.Column('granularity', sa.String(length=8), nullable=False),
+        sa.Column('dimension', sa.String(length=32), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('granularity', 'dimension', 'bucket_start', 'key')
+    )
+    op.create_index('ix_activity_rollups_granularity_bucket_start', 'activity_rollups', ['granularity', 'bucket_start'], unique=False)
+    op.create_table(
+        'activity_user_sketches',
+        sa.Column('granularity', sa.String(length=8), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('registers', sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint('granularity', 'bucket_start')
+    )
+    # Агрегаты заполняются фоновой задачей приложения при первом запуске
+    op.create_table(
+        'activity_rollup_state',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('watermark', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('covered_until', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('refreshed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('activity_rollup_state')
+    op.drop_table('activity_user_sketches')
+    op.drop_index('ix_activity_rollups_granularity_bucket_start', table_name='activity_rollups')
+    op.drop_table('activity_rollups')
@@ -0,0 +1,31 @@
+"""add_request_version_and_claim_queue
+
+Revision ID: e5b7c9d2f4a6
+Revises: d9f2a6c4e817
+Create Date: 2026-10-17 20:47:18.530942
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b7c9d2f4a6'
+down_revision: Union[str, None] = 'd9f2a6c4e817'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('requests', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.create_index(
+        'ix_requests_claim_queue', 'requests', ['template_id', 'created_at', 'id'], unique=False,
+        postgresql_where=sa.text("status = 'in_review' AND assignee_id IS NULL")
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_requests_claim_queue', table_name='requests')
+    op.drop_column('requests', 'version')
@@ -0,0 +1,30 @@
+"""add_request_comments_request_id_index
+
+Revision ID: f1b6d3a9c2e7
+Revises: a3d7e5c1f9b2
+Create Date: 2026-10-18 00:27:43.915062
+
+Индекс (request_id, id) для постраничной загрузки комментариев заявки
+и подсчета их количества.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b6d3a9c2e7'
+down_revision: Union[str, None] = 'a3d7e5c1f9b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_request_comments_request_id_id', 'request_comments', ['request_id', 'id'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_request_comments_request_id_id', table_name='request_comments')
@@ -0,0 +1,27 @@
+"""add_activity_logs_keyset_index
+
+Revision ID: f4c8a1d2e6b3
+Revises: e2a9c4b7d310
+Create Date: 2026-10-17 15:58:21.604712
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4c8a1d2e6b3'
+down_revision: Union[str, None] = 'e2a9c4b7d310'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Индекс на секционированной таблице создается и во всех секциях
+    op.create_index('ix_activity_logs_created_at_id', 'activity_logs', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_activity_logs_created_at_id', table_name='activity_logs')
@@ -1,15 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
 from datetime import datetime
 
-from ..database import get_db
-from ..dependencies import get_current_user, require_admin
+from ..database import get_db, get_async_db
+from ..dependencies import get_current_user_async, require_admin, require_admin_async
 from ..models.user import User
 from ..schemas.activity_log import (
-    ActivityLogFilter, ActivityLogListResponse, ActivityLogResponse
+    ActivityLogFilter, ActivityLogListResponse, ActivityLogResponse, TotalMode
 )
 from ..services.activity_service import ActivityService
+from ..services.activity_export import EXPORT_FORMATS, export_activity_logs
+from ..services.activity_analytics import ActivityAnalyticsService
 
 router = APIRouter()
 
@@ -21,13 +25,19 @@ async def get_activity_logs(
     resource_id: Optional[str] = Query(None, description="ID ресурса для фильтрации"),
     start_date: Optional[datetime] = Query(None, description="Начальная дата для фильтрации"),
     end_date: Optional[datetime] = Query(None, description="Конечная дата для фильтрации"),
-    page: int = Query(1, ge=1, description="Номер страницы"),
+    status_code: Optional[int] = Query(None, description="HTTP-статус ответа"),
+    min_duration_ms: Optional[int] = Query(None, ge=0, description="Минимальное время ответа, мс"),
+    page: int = Query(1, ge=1, description="Номер страницы (только для первых страниц)"),
     size: int = Query(50, ge=1, le=1000, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="Курсор next_cursor предыдущей страницы"),
+    total: TotalMode = Query(TotalMode.CAPPED, description="Подсчет total: exact, estimate, capped, none"),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin)
 ):
     """
     Получить журнал активности с фильтрацией и пагинацией.
+    С cursor выдается страница после указанной записи (keyset по created_at, id),
+    без него - страница page в пределах первых записей.
     Доступно только администраторам.
     """
     activity_service = ActivityService(db)
@@ -39,38 +49,83 @@ async def get_activity_logs(
         resource_id=resource_id,
         start_date=start_date,
         end_date=end_date,
+        status_code=status_code,
+        min_duration_ms=min_duration_ms,
         page=page,
-        size=size
+        size=size,
+        cursor=cursor,
+        total_mode=total
     )
     
     return activity_service.get_activity_logs(filters)
 
+@router.get("/export")
+async def export_activity_log(
+    format: str = Query("csv", description="Формат выгрузки: csv, ndjson, xlsx"),
+    user_id: Optional[int] = Query(None, description="ID пользователя для фильтрации"),
+    action: Optional[str] = Query(None, description="Тип действия для фильтрации"),
+    resource_type: Optional[str] = Query(None, description="Тип ресурса для фильтрации"),
+    resource_id: Optional[str] = Query(None, description="ID ресурса для фильтрации"),
+    start_date: Optional[datetime] = Query(None, description="Начальная дата для фильтрации"),
+    end_date: Optional[datetime] = Query(None, description="Конечная дата для фильтрации"),
+    status_code: Optional[int] = Query(None, description="HTTP-статус ответа"),
+    min_duration_ms: Optional[int] = Query(None, ge=0, description="Минимальное время ответа, мс"),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Выгрузить журнал активности целиком по фильтрам (потоком, без пагинации).
+    Доступно только администраторам.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Неизвестный формат выгрузки. Доступны: {', '.join(EXPORT_FORMATS)}"
+        )
+    
+    filters = ActivityLogFilter(
+        user_id=user_id,
+        action=action,
+        resource_type=resource_type,
+        resource_id=resource_id,
+        start_date=start_date,
+        end_date=end_date,
+        status_code=status_code,
+        min_duration_ms=min_duration_ms
+    )
+    
+    stream, media_type, filename = export_activity_logs(filters, format)
+    return StreamingResponse(
+        stream,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @router.get("/user/{user_id}", response_model=List[ActivityLogResponse])
 async def get_user_activity_logs(
     user_id: int,
     limit: int = Query(100, ge=1, le=1000, description="Максимальное количество записей"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_admin)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(require_admin_async)
 ):
     """
     Получить последние действия конкретного пользователя.
     Доступно только администраторам.
     """
     activity_service = ActivityService(db)
-    return activity_service.get_user_activities(user_id, limit)
+    return await activity_service.get_user_activities_async(user_id, limit)
 
 @router.get("/my", response_model=List[ActivityLogResponse])
 async def get_my_activity_logs(
     limit: int = Query(100, ge=1, le=500, description="Максимальное количество записей"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """
     Получить свои последние действия.
     Доступно любому авторизованному пользователю.
     """
     activity_service = ActivityService(db)
-    return activity_service.get_user_activities(current_user.id, limit)
+    return await activity_service.get_user_activities_async(current_user.id, limit)
 
 @router.get("/stats")
 async def get_activity_stats(
@@ -80,11 +135,60 @@ async def get_activity_stats(
 ):
     """
     Получить статистику активности за указанный период.
+    Считается по дневным агрегатам; поле freshness показывает,
+    по какой момент учтены записи журнала.
     Доступно только администраторам.
     """
     activity_service = ActivityService(db)
     return activity_service.get_activity_stats(days)
 
+@router.get("/analytics/heatmap")
+async def get_activity_heatmap(
+    start_date: Optional[datetime] = Query(None, description="Начало периода (по умолчанию 4 недели назад)"),
+    end_date: Optional[datetime] = Query(None, description="Конец периода (по умолчанию сейчас)"),
+    tz: str = Query("Europe/Moscow", description="Часовой пояс для дней недели и часов"),
+    action: Optional[str] = Query(None, description="Тип действия для фильтрации"),
+    resource_type: Optional[str] = Query(None, description="Тип ресурса для фильтрации"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Тепловая карта активности: matrix[день недели 0-6, с понедельника][час 0-23].
+    Доступно только администраторам.
+    """
+    return ActivityAnalyticsService(db).heatmap(start_date, end_date, tz, action, resource_type)
+
+@router.get("/analytics/latency")
+async def get_activity_latency(
+    start_date: Optional[datetime] = Query(None, description="Начало периода (по умолчанию сутки назад)"),
+    end_date: Optional[datetime] = Query(None, description="Конец периода (по умолчанию сейчас)"),
+    resource_type: Optional[str] = Query(None, description="Тип ресурса для фильтрации"),
+    limit: int = Query(20, ge=1, le=200, description="Количество эндпоинтов"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Перцентили времени ответа (p50/p95/p99, мс) по эндпоинтам API.
+    Доступно только администраторам.
+    """
+    return ActivityAnalyticsService(db).latency(start_date, end_date, resource_type, limit)
+
+@router.get("/analytics/errors")
+async def get_activity_error_rate(
+    start_date: Optional[datetime] = Query(None, description="Начало периода"),
+    end_date: Optional[datetime] = Query(None, description="Конец периода (по умолчанию сейчас)"),
+    interval: str = Query("hour", description="Интервал точек: hour, day, week"),
+    tz: str = Query("Europe/Moscow", description="Часовой пояс для границ интервалов"),
+    resource_type: Optional[str] = Query(None, description="Тип ресурса для фильтрации"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Динамика ошибок: количество ответов 4xx/5xx и их доля по интервалам.
+    Доступно только администраторам.
+    """
+    return ActivityAnalyticsService(db).errors(start_date, end_date, interval, tz, resource_type)
+
 @router.get("/actions")
 async def get_available_actions(
     current_user: User = Depends(require_admin)
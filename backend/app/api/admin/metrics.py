@@ -0,0 +1,101 @@
+from fastapi import APIRouter, Depends
+
+from ...database import get_pool_stats
+from ...dependencies import require_admin, UserInfo
+from ...services.user_cache import user_info_cache
+from ...services.token_versions import token_version_registry
+from ...services.password_hasher import password_hash_pool
+from ...services.activity_buffer import activity_log_buffer
+from ...services.activity_rollups import activity_rollup_job
+from ...services.activity_policy import activity_log_policy
+from ...services.assignment_engine import assignment_engine
+from ...services.sla_scheduler import sla_scheduler
+
+router = APIRouter()
+
+@router.get("/user-cache")
+async def get_user_cache_metrics(current_user: UserInfo = Depends(require_admin)):
+    """
+    Метрики кэша пользователей (попадания/промахи, размер, вытеснения).
+    Доступно только администраторам.
+    """
+    return user_info_cache.stats()
+
+@router.post("/user-cache/clear")
+async def clear_user_cache(current_user: UserInfo = Depends(require_admin)):
+    """
+    Полная очистка кэша пользователей в текущем процессе.
+    Доступно только администраторам.
+    """
+    user_info_cache.clear()
+    return {"message": "Кэш пользователей очищен"}
+
+@router.get("/token-versions")
+async def get_token_version_metrics(current_user: UserInfo = Depends(require_admin)):
+    """
+    Состояние карты версий токенов (самодостаточные JWT).
+    Доступно только администраторам.
+    """
+    return token_version_registry.stats()
+
+@router.get("/password-hashing")
+async def get_password_hashing_metrics(current_user: UserInfo = Depends(require_admin)):
+    """
+    Метрики пула bcrypt: глубина очереди, отказы (503), задержки хеширования.
+    Доступно только администраторам.
+    """
+    return password_hash_pool.stats()
+
+@router.get("/db-pool")
+async def get_db_pool_metrics(current_user: UserInfo = Depends(require_admin)):
+    """
+    Состояние пула соединений с БД в текущем воркере: занятые соединения,
+    overflow, таймауты и время ожидания соединения.
+    Доступно только администраторам.
+    """
+    return get_pool_stats()
+
+@router.get("/activity-buffer")
+async def get_activity_buffer_metrics(current_user: UserInfo = Depends(require_admin)):
+    """
+    Буфер журнала активности: размер, записано/отброшено/сохранено на диск,
+    задержка пакетной записи.
+    Доступно только администраторам.
+    """
+    return activity_log_buffer.stats()
+
+@router.get("/activity-rollups")
+async def get_activity_rollup_metrics(current_user: UserInfo = Depends(require_admin)):
+    """
+    Фоновый пересчет агрегатов журнала активности: число проходов,
+    ошибки, длительность и интервал последнего прохода.
+    Доступно только администраторам.
+    """
+    return activity_rollup_job.stats()
+
+@router.get("/activity-policy")
+async def get_activity_policy_metrics(current_user: UserInfo = Depends(require_admin)):
+    """
+    Политика записи журнала активности: правила и счетчики решений
+    (записано, записано обязательно, отброшено выборкой, дедуплицировано).
+    Доступно только администраторам.
+    """
+    return activity_log_policy.stats()
+
+@router.get("/assignment-engine")
+async def get_assignment_engine_metrics(current_user: UserInfo = Depends(require_admin)):
+    """
+    Автоназначение заявок: отслеживаемые исполнители и открытые заявки,
+    пользователи с неполной ставкой, перестроения счетчиков.
+    Доступно только администраторам.
+    """
+    return assignment_engine.stats()
+
+@router.get("/sla-scheduler")
+async def get_sla_scheduler_metrics(current_user: UserInfo = Depends(require_admin)):
+    """
+    Планировщик сроков заявок: проходы (пропущенные - не лидер), эскалации,
+    отправленные WebSocket/Telegram-уведомления, результат последнего прохода.
+    Доступно только администраторам.
+    """
+    return sla_scheduler.stats()
@@ -1,12 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Request
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, and_, or_, select
 from typing import List, Optional
 import os
 import uuid
 from datetime import datetime
 
-from ..database import get_db
+from ..database import get_db, get_async_db
 from ..models.announcement import Announcement, AnnouncementView
 from ..models.user import User
 from ..models.role import Role
@@ -18,7 +19,7 @@ from ..schemas.announcement import (
     AnnouncementViewCreate,
     CurrentAnnouncementResponse
 )
-from ..dependencies import get_current_user, UserInfo
+from ..dependencies import get_current_user, get_current_user_async, UserInfo
 from ..services.activity_service import ActivityService
 
 router = APIRouter(prefix="/announcements", tags=["Announcements"])
@@ -36,6 +37,11 @@ def get_role_display_names(db: Session) -> dict:
     roles = db.query(Role).filter(Role.is_active == True).all()
     return {role.name: role.display_name or role.name for role in roles}
 
+async def get_role_display_names_async(db: AsyncSession) -> dict:
+    """Получение словаря названий ролей для отображения (асинхронная сессия)"""
+    result = await db.execute(select(Role.name, Role.display_name).where(Role.is_active == True))
+    return {name: display_name or name for name, display_name in result.all()}
+
 @router.post("/", response_model=AnnouncementResponse)
 async def create_announcement(
     announcement_data: AnnouncementCreate,
@@ -85,7 +91,8 @@ async def create_announcement(
             "target_roles": announcement.target_roles,
             "is_active": announcement.is_active
         },
-        request=request
+        request=request,
+        defer=True
     )
     
     # Добавляем имя создателя
@@ -141,20 +148,20 @@ async def get_announcements(
 
 @router.get("/current", response_model=CurrentAnnouncementResponse)
 async def get_current_announcement(
-    db: Session = Depends(get_db),
-    current_user: UserInfo = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserInfo = Depends(get_current_user_async)
 ):
     """Получение текущего объявления для пользователя"""
     
     # Получаем последнее активное объявление, которое подходит пользователю по ролям
-    query = db.query(Announcement).filter(
+    query = select(Announcement).where(
         Announcement.is_active == True
     ).order_by(desc(Announcement.created_at))
     
     # Фильтруем по ролям пользователя
     user_roles = current_user.roles if hasattr(current_user, 'roles') else []
     
-    announcements = query.all()
+    announcements = (await db.execute(query)).scalars().all()
     suitable_announcement = None
     
     for announcement in announcements:
@@ -175,19 +182,21 @@ async def get_current_announcement(
         )
     
     # Проверяем, просматривал ли пользователь это объявление
-    existing_view = db.query(AnnouncementView).filter(
-        AnnouncementView.announcement_id == suitable_announcement.id,
-        AnnouncementView.user_id == current_user.id
-    ).first()
+    existing_view = (await db.execute(
+        select(AnnouncementView.id).where(
+            AnnouncementView.announcement_id == suitable_announcement.id,
+            AnnouncementView.user_id == current_user.id
+        ).limit(1)
+    )).first()
     
     has_unviewed = existing_view is None
     
     if has_unviewed:
         # Загружаем создателя для отображения
-        creator = db.query(User).filter(User.id == suitable_announcement.created_by_id).first()
+        creator = await db.get(User, suitable_announcement.created_by_id)
         
         # Получаем словарь названий ролей
-        role_names = get_role_display_names(db)
+        role_names = await get_role_display_names_async(db)
         
         response_announcement = AnnouncementResponse.from_orm(suitable_announcement)
         response_announcement.created_by_name = f"{creator.first_name} {creator.last_name}" if creator else None
@@ -338,7 +347,8 @@ async def update_announcement(
             "updated_fields": list(update_data.keys()),
             "is_active": announcement.is_active
         },
-        request=request
+        request=request,
+        defer=True
     )
     
     # Добавляем имя создателя
@@ -385,7 +395,8 @@ async def delete_announcement(
         details={
             "title": title
         },
-        request=request
+        request=request,
+        defer=True
     )
     
     return {"message": "Объявление удалено"}
@@ -1,10 +1,9 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
-from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from typing import List
 from ..database import get_db
-from ..dependencies import get_current_user
+from ..dependencies import get_current_user, get_current_user_model
 from ..schemas.user import (
     EmailVerificationRequest, 
     EmailVerificationCode, 
@@ -19,7 +18,7 @@ from ..services.auth_service import (
     authenticate_user,
     create_user,
     create_access_token,
-    verify_token
+    build_access_token_claims
 )
 from ..services.activity_service import ActivityService
 from ..models.user import User as UserModel
@@ -27,7 +26,6 @@ from ..core.config import settings
 from sqlalchemy import or_
 
 router = APIRouter()
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 @router.post("/send-verification-code")
 async def send_code(request: EmailVerificationRequest, db: Session = Depends(get_db)):
@@ -84,7 +82,7 @@ async def register(user_data: UserRegistration, request: Request, db: Session =
                 detail="Пользователь с таким email уже зарегистрирован"
             )
         
-        user = create_user(user_data, db)
+        user = await create_user(user_data, db)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -106,13 +104,14 @@ async def register(user_data: UserRegistration, request: Request, db: Session =
                 "last_name": user.last_name,
                 "roles": user.roles
             },
-            request=request
+            request=request,
+            defer=True
         )
         
         # Создаем токен доступа для нового пользователя
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": user.email}, expires_delta=access_token_expires
+            data=build_access_token_claims(user), expires_delta=access_token_expires
         )
         return {"access_token": access_token, "token_type": "bearer"}
     except HTTPException:
@@ -126,7 +125,7 @@ async def register(user_data: UserRegistration, request: Request, db: Session =
 
 @router.post("/login", response_model=Token)
 async def login(user_data: UserLogin, request: Request, db: Session = Depends(get_db)):
-    user = authenticate_user(user_data.email, user_data.password, db)
+    user = await authenticate_user(user_data.email, user_data.password, db)
     if not user:
         # Логирование неудачной попытки входа
         activity_service = ActivityService(db)
@@ -139,7 +138,8 @@ async def login(user_data: UserLogin, request: Request, db: Session = Depends(ge
                 "email": user_data.email,
                 "success": False
             },
-            request=request
+            request=request,
+            defer=True
         )
         
         raise HTTPException(
@@ -160,31 +160,18 @@ async def login(user_data: UserLogin, request: Request, db: Session = Depends(ge
             "success": True,
             "roles": user.roles
         },
-        request=request
+        request=request,
+        defer=True
     )
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=build_access_token_claims(user), expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=User)
-async def get_current_user_info(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    email = verify_token(token)
-    if email is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Недействительный токен",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    user = db.query(UserModel).filter(UserModel.email == email).first()
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
-        )
-    
+async def get_current_user_info(user: UserModel = Depends(get_current_user_model)):
     # Создаем Pydantic схему с правильной сериализацией birth_date
     return User(
         id=user.id,
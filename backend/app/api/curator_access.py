@@ -9,6 +9,7 @@ from ..database import get_db
 from ..models import Department, User, UserProfile, Group, Role
 from ..models.user_assignment import UserDepartmentAssignment
 from ..dependencies import get_current_user, UserInfo
+from ..services.token_versions import token_version_registry
 
 router = APIRouter(prefix="/curator-access", tags=["Curator Access"])
 
@@ -58,6 +59,7 @@ async def assign_curator_to_groups(
     if 'curator' not in curator_roles:
         curator_roles.append('curator')
         curator.roles = curator_roles
+        token_version_registry.revoke(db, curator.id)
         db.commit()
     
     # Получаем роль куратора
@@ -175,7 +177,7 @@ async def get_curator_students(
     
     # Получаем студентов из этих групп
     students_query = db.query(User).join(UserProfile).filter(
-        User._roles.like('%student%'),
+        User.has_role('student'),
         UserProfile.group_id.in_(group_ids)
     )
     
@@ -268,7 +270,7 @@ async def get_my_curator_access(
     if groups:
         group_ids = [group.id for group in groups]
         total_students = db.query(User).join(UserProfile).filter(
-            User._roles.like('%student%'),
+            User.has_role('student'),
             UserProfile.group_id.in_(group_ids)
         ).count()
     
@@ -311,7 +313,7 @@ async def get_all_curators(
     
     # Получаем всех пользователей с ролью куратора
     curators = db.query(User).filter(
-        User._roles.like('%curator%'),
+        User.has_role('curator'),
         User.is_active == True
     ).all()
     
@@ -403,6 +405,7 @@ async def remove_curator_access(
                 roles.remove('curator')
                 curator.roles = roles
     
+    token_version_registry.revoke(db, curator_id)
     db.commit()
     
     return {
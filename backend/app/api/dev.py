@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from ..database import get_db
 from ..models.user import User, UserRole
 from ..core.config import settings
+from ..services.token_versions import token_version_registry
 from pydantic import BaseModel
 from typing import List, Optional
 
@@ -35,6 +36,7 @@ async def assign_admin_role(user_id: int, db: Session = Depends(get_db)):
     if "admin" not in current_roles:
         current_roles.append("admin")
         user.roles = current_roles
+        token_version_registry.revoke(db, user.id)
         db.commit()
         db.refresh(user)
     
@@ -63,6 +65,7 @@ async def assign_admin_by_email_get(email: str, db: Session = Depends(get_db)):
     if "admin" not in current_roles:
         current_roles.append("admin")
         user.roles = current_roles
+        token_version_registry.revoke(db, user.id)
         db.commit()
         db.refresh(user)
     
@@ -91,6 +94,7 @@ async def assign_admin_by_email(email: str, db: Session = Depends(get_db)):
     if "admin" not in current_roles:
         current_roles.append("admin")
         user.roles = current_roles
+        token_version_registry.revoke(db, user.id)
         db.commit()
         db.refresh(user)
     
@@ -122,6 +126,7 @@ async def assign_roles(assignment: UserRoleAssignment, db: Session = Depends(get
     
     # Назначаем роли
     user.roles = assignment.roles
+    token_version_registry.revoke(db, user.id)
     db.commit()
     db.refresh(user)
     
@@ -16,11 +16,9 @@ from ..schemas.portfolio import (
     FileUploadResponse,
     AchievementCategory as AchievementCategorySchema
 )
-from ..services.auth_service import verify_token
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from ..dependencies import get_current_user, UserInfo
 
 router = APIRouter()
-security = HTTPBearer()
 
 # Путь для сохранения файлов портфолио
 PORTFOLIO_UPLOAD_DIR = "uploads/portfolio"
@@ -30,27 +28,7 @@ os.makedirs(PORTFOLIO_UPLOAD_DIR, exist_ok=True)
 ALLOWED_EXTENSIONS = {'.pdf', '.doc', '.docx', '.jpg', '.jpeg', '.png', '.gif', '.txt', '.ppt', '.pptx'}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)) -> User:
-    """Получение текущего пользователя"""
-    token = credentials.credentials
-    email = verify_token(token)
-    if email is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
-    return user
-
-def check_student_access(user: User):
+def check_student_access(user: UserInfo):
     """Проверка доступа студента к портфолио"""
     if 'student' not in user.roles:
         raise HTTPException(
@@ -58,7 +36,7 @@ def check_student_access(user: User):
             detail="Доступ к портфолио разрешен только студентам"
         )
 
-async def check_portfolio_view_access(user: User, student_id: int, db: Session) -> bool:
+async def check_portfolio_view_access(user: UserInfo, student_id: int, db: Session) -> bool:
     """Упрощенная проверка доступа к просмотру портфолио студента"""
     # Студент может смотреть свое портфолио
     if user.id == student_id:
@@ -73,7 +51,7 @@ async def check_portfolio_view_access(user: User, student_id: int, db: Session)
 @router.get("/achievements", response_model=List[PortfolioAchievementSchema])
 async def get_achievements(
     category: Optional[AchievementCategorySchema] = None,
-    current_user: User = Depends(get_current_user),
+    current_user: UserInfo = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Получение списка достижений пользователя"""
@@ -92,7 +70,7 @@ async def get_achievements(
 @router.post("/achievements", response_model=PortfolioAchievementSchema)
 async def create_achievement(
     achievement: PortfolioAchievementCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: UserInfo = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Создание нового достижения"""
@@ -112,7 +90,7 @@ async def create_achievement(
 @router.get("/achievements/{achievement_id}", response_model=PortfolioAchievementSchema)
 async def get_achievement(
     achievement_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: UserInfo = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Получение конкретного достижения"""
@@ -134,7 +112,7 @@ async def get_achievement(
 async def update_achievement(
     achievement_id: int,
     achievement_update: PortfolioAchievementUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: UserInfo = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Обновление достижения"""
@@ -161,7 +139,7 @@ async def update_achievement(
 @router.delete("/achievements/{achievement_id}")
 async def delete_achievement(
     achievement_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: UserInfo = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Удаление достижения"""
@@ -190,7 +168,7 @@ async def delete_achievement(
 async def upload_file(
     achievement_id: int,
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
+    current_user: UserInfo = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Загрузка файла к достижению"""
@@ -249,7 +227,7 @@ async def upload_file(
 @router.delete("/files/{file_id}")
 async def delete_file(
     file_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: UserInfo = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Удаление файла из достижения"""
@@ -276,7 +254,7 @@ async def delete_file(
 
 @router.get("/stats", response_model=PortfolioStats)
 async def get_portfolio_stats(
-    current_user: User = Depends(get_current_user),
+    current_user: UserInfo = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Получение статистики портфолио пользователя"""
@@ -315,7 +293,7 @@ async def get_portfolio_stats(
 async def get_student_achievements(
     student_id: int,
     category: Optional[AchievementCategorySchema] = None,
-    current_user: User = Depends(get_current_user),
+    current_user: UserInfo = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Получение списка достижений студента (для кураторов и сотрудников подразделений)"""
@@ -352,7 +330,7 @@ async def get_student_achievements(
 @router.get("/student/{student_id}/stats", response_model=PortfolioStats)
 async def get_student_portfolio_stats(
     student_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: UserInfo = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Получение статистики портфолио студента (для кураторов и сотрудников подразделений)"""
@@ -406,7 +384,7 @@ async def get_student_portfolio_stats(
 @router.get("/student/{student_id}/info")
 async def get_student_portfolio_info(
     student_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: UserInfo = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Получение основной информации о студенте для портфолио"""
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from sqlalchemy.orm import Session
 from typing import Optional
+from datetime import timedelta
 from pydantic import BaseModel, validator
 import re
+from ..core.config import settings
 from ..database import get_db
 from ..models.user import User
 from ..models.user_profile import UserProfile
@@ -11,31 +13,13 @@ from ..models.role import Role
 from ..models.user_assignment import UserDepartmentAssignment
 from ..models.group import Group
 from ..schemas.user_profile import UserProfileResponse, UserProfileCreate, UserProfileUpdate
-from ..services.auth_service import verify_token, verify_password, get_password_hash
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from ..services.auth_service import (
+    verify_password_async, get_password_hash_async, create_access_token, build_access_token_claims
+)
+from ..services.token_versions import token_version_registry
+from ..dependencies import get_current_user_id
 
 router = APIRouter()
-security = HTTPBearer()
-
-async def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)) -> int:
-    """Получение ID текущего пользователя"""
-    token = credentials.credentials
-    email = verify_token(token)
-    if email is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
-    return user.id
 
 @router.get("/profile/extended", response_model=UserProfileResponse)
 async def get_extended_profile(current_user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
@@ -574,16 +558,23 @@ async def change_password(
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     
     # Проверяем текущий пароль
-    if not verify_password(password_data.current_password, user.password_hash):
+    if not await verify_password_async(password_data.current_password, user.password_hash):
         raise HTTPException(status_code=400, detail="Неверный текущий пароль")
     
     # Проверяем, что новый пароль отличается от текущего
-    if verify_password(password_data.new_password, user.password_hash):
+    if await verify_password_async(password_data.new_password, user.password_hash):
         raise HTTPException(status_code=400, detail="Новый пароль должен отличаться от текущего")
     
     # Обновляем пароль
-    user.password_hash = get_password_hash(password_data.new_password)
+    user.password_hash = await get_password_hash_async(password_data.new_password)
+    # Токены, выданные до смены пароля, отзываются вместе с ее фиксацией
+    token_version_registry.revoke(db, user.id)
     db.commit()
     db.refresh(user)
     
-    return {"message": "Пароль успешно изменен"}
\ No newline at end of file
+    # Текущий токен тоже отозван - выдаем новый, чтобы не разлогинивать пользователя
+    access_token = create_access_token(
+        data=build_access_token_claims(user),
+        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {"message": "Пароль успешно изменен", "access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
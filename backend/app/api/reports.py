@@ -120,7 +120,8 @@ async def create_report(
             "template_id": template.id,
             "status": report.status
         },
-        request=request
+        request=request,
+        defer=True
     )
     
     # Загружаем с дополнительной информацией
@@ -310,7 +311,8 @@ async def update_report(
             "new_status": report.status,
             "updated_fields": list(update_data.keys())
         },
-        request=request
+        request=request,
+        defer=True
     )
     
     # Получаем информацию о подразделении
@@ -369,7 +371,8 @@ async def delete_report(
             "template_name": template_name,
             "status": report.status
         },
-        request=request
+        request=request,
+        defer=True
     )
     
     return {"message": "Отчет удален"}
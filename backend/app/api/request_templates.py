@@ -5,6 +5,7 @@ from ..database import get_db
 from ..models.request_template import RequestTemplate as RequestTemplateModel
 from ..schemas.request_template import RequestTemplate, RequestTemplateCreate, RequestTemplateUpdate
 from ..dependencies import get_current_user, UserInfo
+from ..services.routing_rules import invalidate_routing_table
 
 router = APIRouter()
 
@@ -122,6 +123,7 @@ async def update_template(
         setattr(template, field, value)
     
     db.commit()
+    invalidate_routing_table(template_id)
     db.refresh(template)
     return template
 
@@ -143,6 +145,7 @@ async def delete_template(
     
     db.delete(template)
     db.commit()
+    invalidate_routing_table(template_id)
     return {"message": "Шаблон удален успешно"}
 
 @router.get("/{template_id}/debug")
@@ -1,140 +1,135 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Request as FastAPIRequest
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_, func, cast, text
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, func, cast, text, select
 from typing import List, Optional
 from datetime import datetime, timedelta
 import json
-from ..database import get_db
-from ..models import Request, RequestTemplate, User, RequestComment, RequestStatus
+from ..database import get_db, get_async_db
+from ..models import Request, RequestTemplate, User, RequestComment, RequestStatus, RoutingType
 from ..schemas import (
     Request as RequestSchema, 
     RequestCreate, 
     RequestUpdate, 
     RequestAssign,
-    RequestList,
+    RequestListPage,
+    RequestSearchPage,
     RequestComment as RequestCommentSchema,
+    RequestCommentPage,
     RequestCommentCreate
 )
-from ..dependencies import get_current_user, UserInfo
-from ..services.profile_update_service import ProfileUpdateService
+from ..dependencies import get_current_user, get_current_user_async, require_admin, UserInfo
 from ..services.activity_service import ActivityService
+from ..services.assignment_engine import assignment_engine
+from ..services.request_candidates import (
+    is_candidate, is_candidate_query, set_candidates
+)
+from ..services.request_comments import (
+    DEFAULT_PAGE_SIZE as COMMENTS_PAGE_SIZE, MAX_PAGE_SIZE as COMMENTS_MAX_PAGE_SIZE,
+    attach_latest_comments, comments_count_query, comments_page, comments_page_query,
+    latest_comments_query, sees_internal_comments
+)
+from ..services.request_transitions import RequestTransitionService
+from ..services.routing_rules import apply_routing_rules
+from ..services.sla_scheduler import get_sla_counters
+from ..services import request_search
+from ..services.request_list_service import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, assigned_scope, list_requests
+)
 
 # WebSocket уведомления
 from .websocket import notify_request_assigned, notify_request_updated
 
 router = APIRouter()
 
-# ===========================================
-# ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ
-# ===========================================
+# Статусы, из которых заявку можно взять в работу
+TAKEABLE_STATUSES = [
+    RequestStatus.SUBMITTED.value,
+    RequestStatus.IN_REVIEW.value,
+    RequestStatus.APPROVED.value
+]
+# Завершенные заявки не меняют статус
+FINAL_STATUSES = [RequestStatus.COMPLETED.value, RequestStatus.REJECTED.value]
+# Типы маршрутизации, при которых исполнитель назначается сразу при отправке
+AUTO_ASSIGN_ROUTING_TYPES = [RoutingType.AUTO_ASSIGN.value, RoutingType.ROUND_ROBIN.value]
 
-def apply_routing_rules(template, form_data):
+async def check_request_view_access(db: AsyncSession, request: Request, current_user: UserInfo) -> bool:
     """
-    Применяет правила маршрутизации к данным формы
-    Возвращает список подходящих ответственных или None
+    Проверяет право просмотра заявки (автор, исполнитель, возможный исполнитель, админ).
+    Возвращает, видит ли пользователь внутренние комментарии.
     """
-    if not template.routing_rules:
-        return None
-    
-    # Проходим по всем правилам
-    for rule in template.routing_rules:
-        field_name = rule.get('field')
-        expected_value = rule.get('value')
-        assignees = rule.get('assignees', [])
-        
-        # Получаем значение поля из данных формы
-        actual_value = form_data.get(field_name)
-        
-        # Проверяем совпадение (приводим к строке для сравнения)
-        if str(actual_value).lower() == str(expected_value).lower():
-            return assignees
-    
-    return None
+    is_author = request.author_id == current_user.id
+    is_assignee = request.assignee_id == current_user.id
+    is_admin = "admin" in (current_user.roles if hasattr(current_user, 'roles') else [])
+    is_possible_assignee = False
+    if not (is_assignee or is_admin):
+        is_possible_assignee = bool(await db.scalar(is_candidate_query(request.id, current_user.id)))
+
+    if not (is_author or is_assignee or is_possible_assignee or is_admin):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Доступ запрещен"
+        )
+    return sees_internal_comments(request, current_user.id, is_admin, is_possible_assignee)
 
 # ===========================================
 # СОЗДАНИЕ И ПРОСМОТР ЗАЯВОК
 # ===========================================
 
-@router.get("/my", response_model=List[RequestList])
+@router.get("/my", response_model=RequestListPage)
 async def get_my_requests(
     status: Optional[str] = Query(None, description="Фильтр по статусу"),
-    db: Session = Depends(get_db),
-    current_user: UserInfo = Depends(get_current_user)
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor)"),
+    size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Размер страницы"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserInfo = Depends(get_current_user_async)
 ):
-    """Получение заявок текущего пользователя"""
-    query = db.query(Request).options(
-        joinedload(Request.author),
-        joinedload(Request.assignee),
-        joinedload(Request.template)
-    ).filter(Request.author_id == current_user.id)
-    
-    if status:
-        try:
-            status_enum = RequestStatus(status)
-            query = query.filter(Request.status == status_enum.value)
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Недопустимый статус: {status}"
-            )
-    
-    requests = query.order_by(Request.created_at.desc()).all()
-    
-    # Преобразуем в RequestList schema с template_name
-    result = []
-    for req in requests:
-        req_dict = req.__dict__.copy()
-        # Удаляем поля, которые будем передавать отдельно
-        req_dict.pop('author', None)
-        req_dict.pop('assignee', None) 
-        req_dict.pop('template', None)
-        req_dict['template_name'] = req.template.name
-        result.append(RequestList(**req_dict, author=req.author, assignee=req.assignee))
-    
-    return result
+    """Получение заявок текущего пользователя (постранично, без данных формы)"""
+    return await list_requests(db, Request.author_id == current_user.id, status, cursor, size)
 
-@router.get("/assigned", response_model=List[RequestList])
+@router.get("/assigned", response_model=RequestListPage)
 async def get_assigned_requests(
     status: Optional[str] = Query(None, description="Фильтр по статусу"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor)"),
+    size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Размер страницы"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserInfo = Depends(get_current_user_async)
+):
+    """Получение заявок назначенных текущему пользователю (постранично, без данных формы)"""
+    return await list_requests(db, assigned_scope(current_user.id), status, cursor, size)
+
+@router.get("/sla")
+async def get_requests_sla(
     db: Session = Depends(get_db),
-    current_user: UserInfo = Depends(get_current_user)
+    current_user: UserInfo = Depends(require_admin)
 ):
-    """Получение заявок назначенных текущему пользователю"""
-    query = db.query(Request).options(
-        joinedload(Request.author),
-        joinedload(Request.assignee),
-        joinedload(Request.template)
-    ).filter(
-        or_(
-            Request.assignee_id == current_user.id,  # Назначенные заявки
-            text(f"requests.possible_assignees::jsonb @> '[{current_user.id}]'::jsonb")  # Возможные заявки (JSON contains)
-        )
+    """
+    Просроченные и «горящие» заявки в работе - всего, по шаблонам и исполнителям.
+    Счетчики пересчитывает планировщик сроков (refreshed_at - время прохода).
+    """
+    return get_sla_counters(db)
+
+@router.get("/search", response_model=RequestSearchPage)
+async def search_requests(
+    q: str = Query(..., min_length=2, max_length=200, description="Поисковый запрос"),
+    status: Optional[str] = Query(None, description="Фильтр по статусу"),
+    template_id: Optional[int] = Query(None, description="Фильтр по шаблону"),
+    scope: Optional[str] = Query(None, pattern="^(my|assigned)$", description="my - мои, assigned - назначенные мне"),
+    page: int = Query(1, ge=1, le=request_search.MAX_PAGE, description="Номер страницы"),
+    size: int = Query(request_search.DEFAULT_PAGE_SIZE, ge=1, le=request_search.MAX_PAGE_SIZE, description="Размер страницы"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserInfo = Depends(get_current_user_async)
+):
+    """
+    Полнотекстовый поиск по заголовку, описанию и данным формы заявок,
+    доступных пользователю (администратору - всех). Результаты по релевантности,
+    с подсветкой совпадений и фасетами по статусам и шаблонам.
+    """
+    is_admin = "admin" in (current_user.roles if hasattr(current_user, 'roles') else [])
+    return await request_search.search_requests(
+        db, q, current_user.id, is_admin,
+        scope=scope, status=status, template_id=template_id, page=page, size=size
     )
-    
-    if status:
-        try:
-            status_enum = RequestStatus(status)
-            query = query.filter(Request.status == status_enum.value)
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Недопустимый статус: {status}"
-            )
-    
-    requests = query.order_by(Request.created_at.desc()).all()
-    
-    # Преобразуем в RequestList schema с template_name
-    result = []
-    for req in requests:
-        req_dict = req.__dict__.copy()
-        # Удаляем поля, которые будем передавать отдельно
-        req_dict.pop('author', None)
-        req_dict.pop('assignee', None)
-        req_dict.pop('template', None)
-        req_dict['template_name'] = req.template.name
-        result.append(RequestList(**req_dict, author=req.author, assignee=req.assignee))
-    
-    return result
 
 @router.post("", response_model=RequestSchema)
 async def create_request(
@@ -189,33 +184,39 @@ async def create_request(
             "status": db_request.status,
             "deadline": deadline.isoformat() if deadline else None
         },
-        request=request
+        request=request,
+        defer=True
     )
     
-    # Загружаем связанные данные
+    # Загружаем связанные данные (у новой заявки комментариев еще нет)
     db_request = db.query(Request).options(
         joinedload(Request.author),
-        joinedload(Request.assignee),
-        joinedload(Request.comments).joinedload(RequestComment.user)
+        joinedload(Request.assignee)
     ).filter(Request.id == db_request.id).first()
+    attach_latest_comments(db_request, 0, [])
     
     return db_request
 
 @router.get("/{request_id}", response_model=RequestSchema)
 async def get_request(
     request_id: int,
-    db: Session = Depends(get_db),
-    current_user: UserInfo = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserInfo = Depends(get_current_user_async)
 ):
     """Получение заявки по ID"""
     print(f"DEBUG: Получение заявки {request_id} пользователем {current_user.id} ({current_user.email})")
     
-    request = db.query(Request).options(
-        joinedload(Request.author),
-        joinedload(Request.assignee),
-        joinedload(Request.comments).joinedload(RequestComment.user),
-        joinedload(Request.template)
-    ).filter(Request.id == request_id).first()
+    # В асинхронной сессии ленивая загрузка недоступна - все, что попадает
+    # в ответ (включая файлы), загружаем явно; комментарии - только последние
+    result = await db.execute(
+        select(Request).options(
+            joinedload(Request.author),
+            joinedload(Request.assignee),
+            selectinload(Request.files),
+            joinedload(Request.template)
+        ).where(Request.id == request_id)
+    )
+    request = result.scalars().first()
     
     if not request:
         print(f"DEBUG: Заявка {request_id} не найдена")
@@ -227,25 +228,37 @@ async def get_request(
     print(f"DEBUG: Заявка найдена. author_id={request.author_id}, assignee_id={request.assignee_id}, possible_assignees={request.possible_assignees}")
     print(f"DEBUG: Пользователь {current_user.id}, роли: {current_user.roles}")
     
-    # Проверяем права доступа
-    is_author = request.author_id == current_user.id
-    is_assignee = request.assignee_id == current_user.id
-    is_possible_assignee = (request.possible_assignees and current_user.id in request.possible_assignees)
-    is_admin = "admin" in (current_user.roles if hasattr(current_user, 'roles') else [])
-    
-    print(f"DEBUG: is_author={is_author}, is_assignee={is_assignee}, is_possible_assignee={is_possible_assignee}, is_admin={is_admin}")
+    include_internal = await check_request_view_access(db, request, current_user)
     
-    has_access = is_author or is_assignee or is_possible_assignee or is_admin
+    count = await db.scalar(comments_count_query(request.id, include_internal))
+    latest = (await db.execute(latest_comments_query(request.id, include_internal))).scalars().all()
+    attach_latest_comments(request, count, list(latest))
     
-    if not has_access:
-        print(f"DEBUG: Доступ запрещен для пользователя {current_user.id} к заявке {request_id}")
+    print(f"DEBUG: Доступ разрешен, возвращаем заявку {request_id}")
+    return request
+
+@router.get("/{request_id}/comments", response_model=RequestCommentPage)
+async def get_request_comments(
+    request_id: int,
+    after_id: Optional[int] = Query(None, description="id последнего полученного комментария"),
+    size: int = Query(COMMENTS_PAGE_SIZE, ge=1, le=COMMENTS_MAX_PAGE_SIZE, description="Размер страницы"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserInfo = Depends(get_current_user_async)
+):
+    """Комментарии заявки по возрастанию id - начиная после after_id (для догрузки и опроса)"""
+    request = await db.get(Request, request_id)
+    if not request:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Доступ запрещен"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Заявка не найдена"
         )
     
-    print(f"DEBUG: Доступ разрешен, возвращаем заявку {request_id}")
-    return request
+    include_internal = await check_request_view_access(db, request, current_user)
+    
+    comments = (await db.execute(
+        comments_page_query(request_id, include_internal, after_id, size)
+    )).scalars().all()
+    return comments_page(list(comments), size)
 
 # ===========================================
 # УПРАВЛЕНИЕ ЗАЯВКАМИ
@@ -260,18 +273,13 @@ async def update_request(
     current_user: UserInfo = Depends(get_current_user)
 ):
     """Обновление заявки"""
-    request = db.query(Request).filter(Request.id == request_id).first()
-    
-    if not request:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Заявка не найдена"
-        )
+    transitions = RequestTransitionService(db, current_user, http_request)
+    request = transitions.load(request_id)
     
     # Проверяем права на редактирование
     is_author = request.author_id == current_user.id
     is_assignee = request.assignee_id == current_user.id
-    is_admin = "admin" in (current_user.roles if hasattr(current_user, 'roles') else [])
+    is_admin = transitions.is_admin
     
     can_edit = is_author or is_assignee or is_admin
     
@@ -296,71 +304,50 @@ async def update_request(
                 detail=f"Заявки в статусе '{request.status}' нельзя редактировать. Доступны для редактирования: черновики, поданные и на рассмотрении."
             )
     
-    # Проверяем, изменяется ли статус на IN_REVIEW из DRAFT
     old_status = request.status
     
-    is_submitting = (
-        hasattr(request_update, 'status') and 
-        request_update.status == RequestStatus.IN_REVIEW.value and 
-        old_status == RequestStatus.DRAFT.value
-    )
-    
-    # Проверяем, завершается ли заявка
-    is_completing = (
-        hasattr(request_update, 'status') and 
-        (request_update.status == RequestStatus.COMPLETED.value or 
-         request_update.status == RequestStatus.COMPLETED) and 
-        old_status != RequestStatus.COMPLETED.value
-    )
+    # Обновляемые поля (статус - строкой, как в колонке)
+    values = request_update.dict(exclude_unset=True)
+    if isinstance(values.get('status'), RequestStatus):
+        values['status'] = values['status'].value
+    if values.get('status') is None:
+        values.pop('status', None)
+    new_status = values.get('status', old_status)
     
-    # Обновляем поля
-    update_data = request_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        # Специальная обработка для enum статуса
-        if field == 'status' and isinstance(value, RequestStatus):
-            value = value.value
-        setattr(request, field, value)
+    # Заявка отправляется на рассмотрение (DRAFT -> IN_REVIEW)
+    is_submitting = new_status == RequestStatus.IN_REVIEW.value and old_status == RequestStatus.DRAFT.value
+    # Заявка завершается
+    is_completing = new_status == RequestStatus.COMPLETED.value and old_status != RequestStatus.COMPLETED.value
     
-    request.updated_at = datetime.utcnow()
+    if 'possible_assignees' in values:
+        values['possible_assignees'] = set_candidates(db, request, values['possible_assignees']) or None
     
-    # Если заявка отправляется (DRAFT -> SUBMITTED)
     if is_submitting:
-        request.submitted_at = datetime.utcnow()
+        values['submitted_at'] = func.now()
         
-        # Автоназначение ответственного если настроено
-        template = db.query(RequestTemplate).filter(RequestTemplate.id == request.template_id).first()
-        if template and template.auto_assign_enabled and template.default_assignees:
-            routing_type = template.routing_type
-            
-            if routing_type == "auto_assign":
-                # Случайное назначение из списка
-                import random
-                request.assignee_id = random.choice(template.default_assignees)
-                
-            elif routing_type == "round_robin":
-                # Назначение по очереди (упрощенная версия - берем первого)
-                # В реальной системе здесь должна быть логика подсчета нагрузки
-                request.assignee_id = template.default_assignees[0]
+        # Автоназначение ответственного если настроено - наименее загруженный по ротации
+        template = request.template
+        if (template and template.auto_assign_enabled and template.default_assignees
+                and template.routing_type in AUTO_ASSIGN_ROUTING_TYPES
+                and 'assignee_id' not in values):
+            if 'possible_assignees' in values:
+                candidate_ids = values['possible_assignees'] or []
+            else:
+                candidate_ids = set_candidates(db, request, template.default_assignees)
+                values['possible_assignees'] = candidate_ids or None
+            assignee_id = assignment_engine.pick(template.id, candidate_ids)
+            if assignee_id is not None:
+                values['assignee_id'] = assignee_id
     
     # Если заявка завершается - обновляем профиль
     if is_completing:
-        try:
-            profile_service = ProfileUpdateService(db)
-            result = profile_service.update_profile_on_approve(request.id)
-            if result.get('updated_fields'):
-                print(f"DEBUG: Обновлены поля профиля при завершении заявки: {result['updated_fields']}")
-            if result.get('errors'):
-                print(f"WARNING: Ошибки при обновлении профиля при завершении заявки: {result['errors']}")
-        except Exception as e:
-            print(f"ERROR: Ошибка при обновлении профиля при завершении заявки: {str(e)}")
+        transitions.update_profile(request, "approve")
     
-    db.commit()
-    db.refresh(request)
+    # Статус проверяется повторно в UPDATE - на случай параллельного изменения
+    request = transitions.apply(request, values, from_statuses=[old_status])
     
     # Логирование изменений статуса заявки
     if old_status != request.status:
-        activity_service = ActivityService(db)
-        action_description = ""
         action_type = "request_status_change"
         
         if request.status == RequestStatus.COMPLETED.value:
@@ -378,28 +365,13 @@ async def update_request(
         else:
             action_description = f"Изменен статус заявки {request.title}: {old_status} → {request.status}"
         
-        activity_service.log_activity(
-            action=action_type,
-            description=action_description,
-            user_id=current_user.id,
-            resource_type="request",
-            resource_id=str(request.id),
-            details={
-                "old_status": old_status,
-                "new_status": request.status,
-                "updated_via": "PUT_request"
-            },
-            request=http_request
-        )
-    
-    # Загружаем связанные данные
-    request = db.query(Request).options(
-        joinedload(Request.author),
-        joinedload(Request.assignee),
-        joinedload(Request.comments).joinedload(RequestComment.user)
-    ).filter(Request.id == request.id).first()
+        transitions.audit(request, action_type, action_description, {
+            "old_status": old_status,
+            "new_status": request.status,
+            "updated_via": "PUT_request"
+        })
     
-    return request
+    return transitions.finish(request)
 
 @router.post("/{request_id}/submit", response_model=RequestSchema)
 async def submit_request(
@@ -409,13 +381,8 @@ async def submit_request(
     current_user: UserInfo = Depends(get_current_user)
 ):
     """Отправка заявки на рассмотрение"""
-    request = db.query(Request).filter(Request.id == request_id).first()
-    
-    if not request:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Заявка не найдена"
-        )
+    transitions = RequestTransitionService(db, current_user, http_request)
+    request = transitions.load(request_id)
     
     # Проверяем права на отправку (только автор)
     if request.author_id != current_user.id:
@@ -432,12 +399,14 @@ async def submit_request(
         )
     
     # Отправляем заявку сразу на рассмотрение
-    request.status = RequestStatus.IN_REVIEW.value
-    request.submitted_at = datetime.utcnow()
-    request.updated_at = datetime.utcnow()
+    values = {
+        "status": RequestStatus.IN_REVIEW.value,
+        "submitted_at": func.now()
+    }
     
     # Автоназначение ответственного
-    template = db.query(RequestTemplate).filter(RequestTemplate.id == request.template_id).first()
+    template = request.template
+    candidate_ids = []
     
     if template and template.auto_assign_enabled:
         # Шаг 1: Проверяем правила условной маршрутизации
@@ -445,76 +414,60 @@ async def submit_request(
         
         if routing_assignees:
             # Используем ответственных из правил маршрутизации
-            request.possible_assignees = routing_assignees
-            request.assignee_id = None  # Не назначаем конкретного, оставляем всем
-            
+            candidate_ids = set_candidates(db, request, routing_assignees)
         elif template.default_assignees:
             # Fallback на стандартную логику если правила не сработали
-            request.possible_assignees = template.default_assignees
-            request.assignee_id = None  # Не назначаем конкретного, оставляем всем
+            candidate_ids = set_candidates(db, request, template.default_assignees)
         else:
             print("DEBUG: Нет ни правил маршрутизации, ни default_assignees")
+        
+        if routing_assignees or template.default_assignees:
+            values["possible_assignees"] = candidate_ids or None
+            values["assignee_id"] = None  # Не назначаем конкретного, оставляем всем
+            
+            # Шаг 2: auto_assign / round_robin - сразу назначаем наименее загруженного
+            if template.routing_type in AUTO_ASSIGN_ROUTING_TYPES:
+                values["assignee_id"] = assignment_engine.pick(template.id, candidate_ids)
     else:
         print("DEBUG: Автоназначение НЕ активировано")
     
     # Обновляем профиль пользователя на основе полей с update_profile_on_submit=true
-    try:
-        profile_service = ProfileUpdateService(db)
-        result = profile_service.update_profile_on_submit(request.id, request.form_data)
-        if result.get('updated_fields'):
-            print(f"DEBUG: Обновлены поля профиля при подаче заявки: {result['updated_fields']}")
-        if result.get('errors'):
-            print(f"WARNING: Ошибки при обновлении профиля при подаче заявки: {result['errors']}")
-    except Exception as e:
-        print(f"ERROR: Ошибка при обновлении профиля при подаче заявки: {str(e)}")
+    transitions.update_profile(request, "submit")
     
-    db.commit()
-    db.refresh(request)
+    request = transitions.apply(request, values, from_statuses=[RequestStatus.DRAFT.value])
     
     # Логирование отправки заявки
-    activity_service = ActivityService(db)
-    activity_service.log_activity(
-        action="request_submit",
-        description=f"Отправлена заявка на рассмотрение: {request.title}",
-        user_id=current_user.id,
-        resource_type="request",
-        resource_id=str(request.id),
-        details={
-            "old_status": "draft",
-            "new_status": request.status,
-            "possible_assignees": request.possible_assignees
-        },
-        request=http_request
-    )
-    
-    # Отправляем WebSocket уведомления возможным исполнителям
-    if request.possible_assignees:
+    transitions.audit(request, "request_submit", f"Отправлена заявка на рассмотрение: {request.title}", {
+        "old_status": "draft",
+        "new_status": request.status,
+        "possible_assignees": request.possible_assignees
+    })
+    
+    response = transitions.finish(request)
+    
+    # Отправляем WebSocket уведомления назначенному исполнителю или всем возможным
+    if response.assignee_id:
+        candidate_ids = [response.assignee_id]
+    if candidate_ids:
         request_data = {
-            'id': request.id,
-            'title': request.title,
-            'description': request.description,
-            'status': request.status,
-            'priority': getattr(request, 'priority', 'medium'),
-            'author_name': f"{request.author.first_name} {request.author.last_name}" if request.author else "Неизвестный",
-            'created_at': request.created_at.isoformat() if request.created_at else None
+            'id': response.id,
+            'title': response.title,
+            'description': response.description,
+            'status': response.status.value,
+            'priority': 'medium',
+            'author_name': f"{response.author.first_name} {response.author.last_name}" if response.author else "Неизвестный",
+            'created_at': response.created_at.isoformat() if response.created_at else None
         }
         
-        for assignee_id in request.possible_assignees:
+        for assignee_id in candidate_ids:
             # Отправляем уведомление асинхронно (не блокируем основной поток)
             try:
                 import asyncio
-                asyncio.create_task(notify_request_assigned(request.id, assignee_id, request_data))
+                asyncio.create_task(notify_request_assigned(response.id, assignee_id, request_data))
             except Exception as e:
                 print(f"Ошибка отправки WebSocket уведомления для пользователя {assignee_id}: {e}")
     
-    # Загружаем связанные данные
-    request = db.query(Request).options(
-        joinedload(Request.author),
-        joinedload(Request.assignee),
-        joinedload(Request.comments).joinedload(RequestComment.user)
-    ).filter(Request.id == request.id).first()
-    
-    return request
+    return response
 
 @router.post("/{request_id}/assign", response_model=RequestSchema)
 async def assign_request(
@@ -525,18 +478,13 @@ async def assign_request(
     current_user: UserInfo = Depends(get_current_user)
 ):
     """Назначение ответственного за заявку"""
-    request = db.query(Request).filter(Request.id == request_id).first()
-    
-    if not request:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Заявка не найдена"
-        )
+    transitions = RequestTransitionService(db, current_user, http_request)
+    request = transitions.load(request_id)
     
     # Проверяем права на назначение (только админы или текущий исполнитель)
     can_assign = (
         request.assignee_id == current_user.id or  # Текущий исполнитель
-        "admin" in (current_user.roles if hasattr(current_user, 'roles') else [])  # Админ
+        transitions.is_admin  # Админ
     )
     
     if not can_assign:
@@ -546,7 +494,7 @@ async def assign_request(
         )
     
     # Проверяем существование пользователя
-    assignee = db.query(User).filter(User.id == assign_data.assignee_id).first()
+    assignee = db.get(User, assign_data.assignee_id)
     if not assignee:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -554,65 +502,61 @@ async def assign_request(
         )
     
     # Назначаем исполнителя
-    old_assignee_id = request.assignee_id
-    request.assignee_id = assign_data.assignee_id
-    request.updated_at = datetime.utcnow()
-    
     # Заявка остается в том же статусе при смене ответственного
     # (логика изменена - заявки сразу идут в IN_REVIEW при отправке)
-    
-    db.commit()
-    db.refresh(request)
+    old_assignee_id = request.assignee_id
+    request = transitions.apply(
+        request, {"assignee_id": assignee.id}, assignee=assignee, expected_version=assign_data.version
+    )
     
     # Логирование назначения ответственного
-    activity_service = ActivityService(db)
-    activity_service.log_activity(
-        action="request_assign",
-        description=f"Назначен ответственный за заявку: {request.title}",
-        user_id=current_user.id,
-        resource_type="request",
-        resource_id=str(request.id),
-        details={
-            "old_assignee": old_assignee_id,
-            "new_assignee": assign_data.assignee_id,
-            "assignee_name": f"{assignee.first_name} {assignee.last_name}" if assignee.first_name else assignee.email
-        },
-        request=http_request
-    )
+    transitions.audit(request, "request_assign", f"Назначен ответственный за заявку: {request.title}", {
+        "old_assignee": old_assignee_id,
+        "new_assignee": assignee.id,
+        "assignee_name": f"{assignee.first_name} {assignee.last_name}" if assignee.first_name else assignee.email
+    })
     
-    # Загружаем связанные данные
-    request = db.query(Request).options(
-        joinedload(Request.author),
-        joinedload(Request.assignee),
-        joinedload(Request.comments).joinedload(RequestComment.user)
-    ).filter(Request.id == request.id).first()
+    return transitions.finish(request)
+
+@router.post("/claim-next", response_model=RequestSchema)
+async def claim_next_request(
+    http_request: FastAPIRequest,
+    template_id: Optional[int] = Query(None, description="Брать только заявки этого шаблона"),
+    db: Session = Depends(get_db),
+    current_user: UserInfo = Depends(get_current_user)
+):
+    """Взять в работу самую старую свободную заявку, доступную пользователю"""
+    transitions = RequestTransitionService(db, current_user, http_request)
+    request = transitions.claim_next(template_id)
     
-    return request
+    if request is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Нет свободных заявок"
+        )
+    
+    return transitions.finish(request)
 
 @router.post("/{request_id}/take", response_model=RequestSchema)
 async def take_request(
     request_id: int,
     http_request: FastAPIRequest,
+    version: Optional[int] = Query(None, description="Версия заявки, которую видел пользователь"),
     db: Session = Depends(get_db),
     current_user: UserInfo = Depends(get_current_user)
 ):
     """Взять заявку в работу"""
-    request = db.query(Request).filter(Request.id == request_id).first()
-    
-    if not request:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Заявка не найдена"
-        )
+    transitions = RequestTransitionService(db, current_user, http_request)
+    request = transitions.load(request_id)
     
     # Проверяем, что пользователь может взять заявку
     can_take = (
-        # Пользователь в списке возможных исполнителей
-        (request.possible_assignees and current_user.id in request.possible_assignees) or
-        # Или уже назначенный исполнитель (для повторных действий)
+        # Уже назначенный исполнитель (для повторных действий)
         request.assignee_id == current_user.id or
         # Или админ
-        "admin" in (current_user.roles if hasattr(current_user, 'roles') else [])
+        transitions.is_admin or
+        # Или пользователь среди возможных исполнителей
+        is_candidate(db, request.id, current_user.id)
     )
     
     if not can_take:
@@ -621,39 +565,36 @@ async def take_request(
             detail="Недостаточно прав для принятия заявки в работу"
         )
     
-    # Берем заявку в работу
-    old_assignee = request.assignee_id
-    request.assignee_id = current_user.id
-    request.status = RequestStatus.APPROVED.value
-    request.updated_at = datetime.utcnow()
+    if request.status not in TAKEABLE_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Нельзя взять в работу завершенную или отклоненную заявку"
+        )
     
-    db.commit()
-    db.refresh(request)
+    # Сотрудник может взять только свободную заявку (или уже свою); перехватить
+    # заявку у другого исполнителя может только админ
+    if not transitions.is_admin and request.assignee_id not in (None, current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Заявку уже взял в работу другой сотрудник"
+        )
     
-    # Логирование взятия заявки в работу
-    activity_service = ActivityService(db)
-    activity_service.log_activity(
-        action="request_take",
-        description=f"Взял заявку в работу: {request.title}",
-        user_id=current_user.id,
-        resource_type="request",
-        resource_id=str(request.id),
-        details={
-            "old_assignee": old_assignee,
-            "new_assignee": current_user.id,
-            "status": request.status
-        },
-        request=http_request
-    )
+    # Берем заявку в работу; исполнитель проверяется в том же UPDATE - если заявку
+    # успели взять после загрузки, проигравший получает 409 даже без version
+    old_assignee = request.assignee_id
+    request = transitions.apply(request, {
+        "assignee_id": current_user.id,
+        "status": RequestStatus.APPROVED.value
+    }, from_statuses=TAKEABLE_STATUSES, expected_version=version, keep_assignee=not transitions.is_admin)
     
-    # Загружаем связанные данные
-    request = db.query(Request).options(
-        joinedload(Request.author),
-        joinedload(Request.assignee),
-        joinedload(Request.comments).joinedload(RequestComment.user)
-    ).filter(Request.id == request.id).first()
+    # Логирование взятия заявки в работу
+    transitions.audit(request, "request_take", f"Взял заявку в работу: {request.title}", {
+        "old_assignee": old_assignee,
+        "new_assignee": current_user.id,
+        "status": request.status
+    })
     
-    return request
+    return transitions.finish(request)
 
 @router.post("/{request_id}/complete", response_model=RequestSchema)
 async def complete_request(
@@ -663,18 +604,13 @@ async def complete_request(
     current_user: UserInfo = Depends(get_current_user)
 ):
     """Завершить заявку"""
-    request = db.query(Request).filter(Request.id == request_id).first()
-    
-    if not request:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Заявка не найдена"
-        )
+    transitions = RequestTransitionService(db, current_user, http_request)
+    request = transitions.load(request_id)
     
     # Проверяем права на завершение (только исполнитель или админ)
     can_complete = (
         request.assignee_id == current_user.id or  # Исполнитель
-        "admin" in (current_user.roles if hasattr(current_user, 'roles') else [])  # Админ
+        transitions.is_admin  # Админ
     )
     
     if not can_complete:
@@ -684,78 +620,53 @@ async def complete_request(
         )
     
     # Проверяем статус заявки
-    if request.status not in [RequestStatus.APPROVED.value, RequestStatus.IN_REVIEW.value]:
+    completable_statuses = [RequestStatus.APPROVED.value, RequestStatus.IN_REVIEW.value]
+    if request.status not in completable_statuses:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Можно завершать только заявки в работе или на рассмотрении"
         )
     
-    # Завершаем заявку
-    old_status = request.status
-    request.status = RequestStatus.COMPLETED.value
-    request.updated_at = datetime.utcnow()
-    
     # Обновляем профиль пользователя на основе полей с update_profile_on_approve=true
-    try:
-        profile_service = ProfileUpdateService(db)
-        result = profile_service.update_profile_on_approve(request.id)
-        if result.get('updated_fields'):
-            print(f"DEBUG: Обновлены поля профиля при завершении заявки: {result['updated_fields']}")
-        if result.get('errors'):
-            print(f"WARNING: Ошибки при обновлении профиля при завершении заявки: {result['errors']}")
-    except Exception as e:
-        print(f"ERROR: Ошибка при обновлении профиля при завершении заявки: {str(e)}")
+    transitions.update_profile(request, "approve")
     
-    db.commit()
-    db.refresh(request)
+    # Завершаем заявку
+    old_status = request.status
+    request = transitions.apply(request, {"status": RequestStatus.COMPLETED.value}, from_statuses=completable_statuses)
     
     # Логирование завершения заявки
-    activity_service = ActivityService(db)
-    activity_service.log_activity(
-        action="request_complete",
-        description=f"Завершена заявка: {request.title}",
-        user_id=current_user.id,
-        resource_type="request",
-        resource_id=str(request.id),
-        details={
-            "old_status": old_status,
-            "new_status": request.status,
-            "completed_by": current_user.id
-        },
-        request=http_request
-    )
+    transitions.audit(request, "request_complete", f"Завершена заявка: {request.title}", {
+        "old_status": old_status,
+        "new_status": request.status,
+        "completed_by": current_user.id
+    })
+    
+    response = transitions.finish(request)
     
     # Отправляем WebSocket уведомление автору заявки о завершении
-    if request.author_id:
+    if response.author_id:
         request_data = {
-            'id': request.id,
-            'title': request.title,
-            'description': request.description,
-            'status': request.status,
+            'id': response.id,
+            'title': response.title,
+            'description': response.description,
+            'status': response.status.value,
             'assignee_name': f"{current_user.first_name} {current_user.last_name}" if current_user.first_name else current_user.email,
-            'completed_at': request.updated_at.isoformat() if request.updated_at else None
+            'completed_at': response.updated_at.isoformat() if response.updated_at else None
         }
         
         try:
             import asyncio
             asyncio.create_task(notify_request_updated(
-                request.id, 
-                [request.author_id], 
+                response.id, 
+                [response.author_id], 
                 request_data, 
                 old_status=old_status, 
                 new_status=RequestStatus.COMPLETED.value
             ))
         except Exception as e:
-            print(f"Ошибка отправки WebSocket уведомления автору заявки {request.author_id}: {e}")
+            print(f"Ошибка отправки WebSocket уведомления автору заявки {response.author_id}: {e}")
     
-    # Загружаем связанные данные
-    request = db.query(Request).options(
-        joinedload(Request.author),
-        joinedload(Request.assignee),
-        joinedload(Request.comments).joinedload(RequestComment.user)
-    ).filter(Request.id == request.id).first()
-    
-    return request
+    return response
 
 @router.post("/{request_id}/reject", response_model=RequestSchema)
 async def reject_request(
@@ -765,18 +676,13 @@ async def reject_request(
     current_user: UserInfo = Depends(get_current_user)
 ):
     """Отклонить заявку"""
-    request = db.query(Request).filter(Request.id == request_id).first()
-    
-    if not request:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Заявка не найдена"
-        )
+    transitions = RequestTransitionService(db, current_user, http_request)
+    request = transitions.load(request_id)
     
     # Проверяем права на отклонение (только исполнитель или админ)
     can_reject = (
         request.assignee_id == current_user.id or  # Исполнитель
-        "admin" in (current_user.roles if hasattr(current_user, 'roles') else [])  # Админ
+        transitions.is_admin  # Админ
     )
     
     if not can_reject:
@@ -786,7 +692,7 @@ async def reject_request(
         )
     
     # Проверяем статус заявки
-    if request.status in [RequestStatus.COMPLETED.value, RequestStatus.REJECTED.value]:
+    if request.status in FINAL_STATUSES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Нельзя отклонить уже завершенную или отклоненную заявку"
@@ -794,59 +700,41 @@ async def reject_request(
     
     # Отклоняем заявку
     old_status = request.status
-    request.status = RequestStatus.REJECTED.value
-    request.updated_at = datetime.utcnow()
-    
-    db.commit()
-    db.refresh(request)
+    request = transitions.apply(request, {"status": RequestStatus.REJECTED.value}, from_statuses=[old_status])
     
     # Логирование отклонения заявки
-    activity_service = ActivityService(db)
-    activity_service.log_activity(
-        action="request_reject",
-        description=f"Отклонена заявка: {request.title}",
-        user_id=current_user.id,
-        resource_type="request",
-        resource_id=str(request.id),
-        details={
-            "old_status": old_status,
-            "new_status": request.status,
-            "rejected_by": current_user.id
-        },
-        request=http_request
-    )
+    transitions.audit(request, "request_reject", f"Отклонена заявка: {request.title}", {
+        "old_status": old_status,
+        "new_status": request.status,
+        "rejected_by": current_user.id
+    })
+    
+    response = transitions.finish(request)
     
     # Отправляем WebSocket уведомление автору заявки об отклонении
-    if request.author_id:
+    if response.author_id:
         request_data = {
-            'id': request.id,
-            'title': request.title,
-            'description': request.description,
-            'status': request.status,
+            'id': response.id,
+            'title': response.title,
+            'description': response.description,
+            'status': response.status.value,
             'assignee_name': f"{current_user.first_name} {current_user.last_name}" if current_user.first_name else current_user.email,
-            'rejected_at': request.updated_at.isoformat() if request.updated_at else None
+            'rejected_at': response.updated_at.isoformat() if response.updated_at else None
         }
         
         try:
             import asyncio
             asyncio.create_task(notify_request_updated(
-                request.id, 
-                [request.author_id], 
+                response.id, 
+                [response.author_id], 
                 request_data, 
                 old_status=old_status, 
                 new_status=RequestStatus.REJECTED.value
             ))
         except Exception as e:
-            print(f"Ошибка отправки WebSocket уведомления автору заявки {request.author_id}: {e}")
-    
-    # Загружаем связанные данные
-    request = db.query(Request).options(
-        joinedload(Request.author),
-        joinedload(Request.assignee),
-        joinedload(Request.comments).joinedload(RequestComment.user)
-    ).filter(Request.id == request.id).first()
+            print(f"Ошибка отправки WebSocket уведомления автору заявки {response.author_id}: {e}")
     
-    return request
+    return response
 
 @router.get("/{request_id}/permissions")
 async def get_request_permissions(
@@ -888,10 +776,9 @@ async def get_request_permissions(
     can_submit = is_author and request.status == RequestStatus.DRAFT.value
     
     # Может ли брать в работу
-    can_take = (
-        (request.possible_assignees and current_user.id in request.possible_assignees) or
-        is_assignee or is_admin
-    ) and request.status == RequestStatus.IN_REVIEW.value
+    can_take = request.status == RequestStatus.IN_REVIEW.value and (
+        is_assignee or is_admin or is_candidate(db, request.id, current_user.id)
+    )
     
     # Может ли завершать заявку
     can_complete = (is_assignee or is_admin) and request.status in [
@@ -970,7 +857,8 @@ async def add_comment(
             "is_internal": comment_data.is_internal,
             "comment_length": len(comment_data.text)
         },
-        request=http_request
+        request=http_request,
+        defer=True
     )
     
     # Загружаем с пользователем
@@ -6,6 +6,7 @@ from ..models.role import Role
 from ..models.user import User
 from ..schemas.role import Role as RoleSchema, RoleCreate, RoleUpdate, UserRoleUpdate
 from ..dependencies import get_current_user, UserInfo
+from ..services.token_versions import token_version_registry
 
 router = APIRouter()
 
@@ -124,7 +125,7 @@ async def delete_role(
         )
     
     # Проверяем, не назначена ли роль пользователям
-    users_with_role = db.query(User).filter(User.roles.contains([role.name])).count()
+    users_with_role = db.query(User).filter(User.has_role(role.name)).count()
     if users_with_role > 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -172,6 +173,7 @@ async def assign_user_roles(
     
     # Назначаем роли
     user.roles = assignment.role_names
+    token_version_registry.revoke(db, user.id)
     db.commit()
     db.refresh(user)
     
@@ -12,32 +12,17 @@ from ..database import get_db
 from ..models.user import User
 from ..models.user_profile import UserProfile
 from ..core.config import settings
-from ..services.auth_service import verify_token
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from ..dependencies import get_current_user_id
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-security = HTTPBearer()
 
 # Временное хранилище кодов подключения (в продакшн лучше использовать Redis)
 connection_codes = {}
 
-async def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)) -> int:
-    """Получение ID текущего пользователя"""
-    token = credentials.credentials
-    email = verify_token(token)
-    if email is None:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    return user.id
-
 @router.post("/telegram/generate-link")
 async def generate_telegram_link(
     current_user_id: int = Depends(get_current_user_id),
@@ -1,14 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, func, text, String, Text, inspect
+from sqlalchemy import or_, and_, func, text, select, String, Text, Integer, inspect, column
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import TextClause
 from pydantic import BaseModel
-from ..database import get_db
+from ..database import get_db, get_async_db
 from ..models.user import User, UserRole
 from ..models.user_profile import UserProfile
 from ..models.department import Department
 from ..models.role import Role
 from ..models.group import Group
-from ..dependencies import get_current_user
+from ..dependencies import get_current_user_async
 from typing import Optional, List
 
 
@@ -41,8 +43,8 @@ def get_searchable_fields(model_class) -> List[str]:
     
     return searchable_fields
 
-def build_dynamic_search_query(search_term: str, db: Session) -> List[int]:
-    """Динамически строим поисковый запрос по всем полям моделей"""
+def build_dynamic_search_query(search_term: str) -> Optional[TextClause]:
+    """Динамически строим поисковый запрос (SELECT id) по всем полям моделей"""
     
     # Получаем все текстовые поля из обеих моделей
     user_fields = get_searchable_fields(User)
@@ -61,9 +63,11 @@ def build_dynamic_search_query(search_term: str, db: Session) -> List[int]:
                 f"(u.gender = 'female' AND :search_term ILIKE '%женск%')",
                 f"(u.gender = 'female' AND :search_term ILIKE '%female%')"
             ])
-        elif field == '_roles':
-            # Специальная обработка для поля ролей (хранится как JSON строка)
-            user_conditions.append(f"u._roles ILIKE :search_term")
+        elif field in ('roles', '_roles'):
+            # Роли ищем по нормализованной таблице user_roles
+            user_conditions.append(
+                "EXISTS (SELECT 1 FROM user_roles ur WHERE ur.user_id = u.id AND ur.role_name ILIKE :search_term)"
+            )
         else:
             user_conditions.append(f"u.{field} ILIKE :search_term")
     
@@ -77,7 +81,7 @@ def build_dynamic_search_query(search_term: str, db: Session) -> List[int]:
     all_conditions = user_conditions + profile_conditions
     
     if not all_conditions:
-        return []
+        return None
     
     conditions_sql = " OR ".join(all_conditions)
     
@@ -90,22 +94,23 @@ def build_dynamic_search_query(search_term: str, db: Session) -> List[int]:
         AND ({conditions_sql})
     """)
     
-    result = db.execute(sql_query, {"search_term": f"%{search_term}%"})
-    user_rows = result.fetchall()
-    user_ids = [row.id for row in user_rows]
-    
-    return user_ids
+    return sql_query.bindparams(search_term=f"%{search_term}%")
 
-def build_field_specific_search_query(search_term: str, field: str, db: Session) -> List[int]:
-    """Поиск по конкретному полю"""
+def build_field_specific_search_query(search_term: str, field: str) -> Optional[TextClause]:
+    """
+    Поиск по конкретному полю.
+    
+    Возвращает SQL-запрос идентификаторов пользователей (используется как
+    подзапрос) или None, если поле не поддерживается.
+    """
     
     if field == 'all':
         # Поиск по всем полям
-        return build_dynamic_search_query(search_term, db)
+        return build_dynamic_search_query(search_term)
     
     # Разбираем поле на таблицу и имя поля
     if '.' not in field:
-        return []
+        return None
     
     table_name, field_name = field.split('.', 1)
     
@@ -128,9 +133,12 @@ def build_field_specific_search_query(search_term: str, field: str, db: Session)
                 SELECT DISTINCT u.id 
                 FROM users u
                 WHERE u.is_active = true 
-                AND u._roles ILIKE :search_term
+                AND EXISTS (
+                    SELECT 1 FROM user_roles ur
+                    WHERE ur.user_id = u.id AND ur.role_name ILIKE :search_term
+                )
             """)
-        else:
+        elif field_name in get_searchable_fields(User):
             # Обычный поиск по полю users
             sql_query = text(f"""
                 SELECT DISTINCT u.id 
@@ -138,8 +146,10 @@ def build_field_specific_search_query(search_term: str, field: str, db: Session)
                 WHERE u.is_active = true 
                 AND u.{field_name} ILIKE :search_term
             """)
+        else:
+            return None
     
-    elif table_name == 'profile':
+    elif table_name == 'profile' and field_name in get_searchable_fields(UserProfile):
         # Поиск в таблице user_profiles
         sql_query = text(f"""
             SELECT DISTINCT u.id 
@@ -150,13 +160,9 @@ def build_field_specific_search_query(search_term: str, field: str, db: Session)
         """)
     
     else:
-        return []
+        return None
     
-    result = db.execute(sql_query, {"search_term": f"%{search_term}%"})
-    user_rows = result.fetchall()
-    user_ids = [row.id for row in user_rows]
-    
-    return user_ids
+    return sql_query.bindparams(search_term=f"%{search_term}%")
 
 @router.get("/search-fields")
 async def get_search_fields():
@@ -279,46 +285,51 @@ async def get_users(
     field: Optional[str] = Query("all", description="Поле для поиска (all - все поля)"),
     page: int = Query(1, ge=1),
     limit: int = Query(50, ge=1, le=100),
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user_async)
 ):
     """
     Получить список пользователей с фильтрацией по ролям и поиском
     """
     try:
         # Начинаем с базового запроса активных пользователей
-        query = db.query(User).filter(User.is_active == True)
+        conditions = [User.is_active == True]
         
-        # Применяем фильтр по роли через SQL
+        # Применяем фильтр по роли через SQL (индекс user_roles)
         if role:
-            query = query.filter(User._roles.like(f'%{role}%'))
+            conditions.append(User.has_role(role))
         
         # Применяем поиск по выбранному полю или всем полям
         if search and search.strip():
             search_term = search.strip()
             
-            # Используем поиск по полю
-            user_ids = build_field_specific_search_query(search_term, field, db)
+            # Поиск выполняется подзапросом в том же запросе, без выгрузки id
+            search_query = build_field_specific_search_query(search_term, field)
             
-            if user_ids:
-                query = query.filter(User.id.in_(user_ids))
+            if search_query is not None:
+                matched_ids = search_query.columns(column("id", Integer)).subquery()
+                conditions.append(User.id.in_(select(matched_ids.c.id)))
             else:
-                # Если ничего не найдено, возвращаем пустой результат
-                query = query.filter(User.id == -1)  # Условие, которое никогда не выполнится
+                # Поле не поддерживается - возвращаем пустой результат
+                conditions.append(User.id == -1)  # Условие, которое никогда не выполнится
         
         # Подсчитываем общее количество
-        total = query.count()
+        total = (await db.execute(select(func.count(User.id)).where(*conditions))).scalar()
         
-        # Применяем пагинацию
+        # Применяем пагинацию; профиль загружаем тем же запросом
         offset = (page - 1) * limit
-        paginated_users = query.offset(offset).limit(limit).all()
+        rows = (await db.execute(
+            select(User, UserProfile)
+            .outerjoin(UserProfile, UserProfile.user_id == User.id)
+            .where(*conditions)
+            .order_by(User.id)
+            .offset(offset)
+            .limit(limit)
+        )).all()
         
         # Формируем ответ
         users_data = []
-        for user in paginated_users:
-            # Получаем основную информацию о социальных сетях
-            profile = db.query(UserProfile).filter(UserProfile.user_id == user.id).first()
-            
+        for user, profile in rows:
             user_data = {
                 "id": user.id,
                 "email": user.email,
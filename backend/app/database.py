@@ -1,11 +1,13 @@
 import os
 from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from alembic.config import Config
 from alembic import command
 import logging
 from .core.config import settings
+from .utils.db_pool import InstrumentedQueuePool, InstrumentedAsyncQueuePool
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -13,16 +15,77 @@ logger = logging.getLogger(__name__)
 
 # Для SQLite добавляем connect_args (используем настройки из config.py)
 connect_args = {"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
+engine_options = {}
+
+if "sqlite" not in settings.DATABASE_URL:
+    # Параметры пула задаются на один процесс uvicorn
+    engine_options = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+        connect_args["options"] = f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
 
 # Создаем движок SQLAlchemy (используем настройки из config.py)
 engine = create_engine(
     settings.DATABASE_URL,
-    connect_args=connect_args
+    connect_args=connect_args,
+    **engine_options
 )
 
 # Создаем локальную сессию
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# =====================================================
+# АСИНХРОННЫЙ ДВИЖОК (asyncpg)
+# =====================================================
+# Используется маршрутами, переведенными на AsyncSession; остальные
+# маршруты продолжают работать через синхронную сессию get_db.
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def get_async_database_url(database_url: str) -> str:
+    """URL для асинхронного драйвера (postgresql:// -> postgresql+asyncpg://)"""
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    url = make_url(database_url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername)).render_as_string(hide_password=False)
+
+async_engine = None
+AsyncSessionLocal = None
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    async_engine_options = {}
+    if "sqlite" not in settings.DATABASE_URL:
+        async_engine_options = {
+            "poolclass": InstrumentedAsyncQueuePool,
+            "pool_size": settings.DB_ASYNC_POOL_SIZE,
+            "max_overflow": settings.DB_ASYNC_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        }
+        if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+            async_engine_options["connect_args"] = {
+                "server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+            }
+
+    async_engine = create_async_engine(get_async_database_url(settings.DATABASE_URL), **async_engine_options)
+    # expire_on_commit=False: после commit объекты остаются доступны без ленивых запросов
+    AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+except ImportError as e:
+    logger.warning(f"⚠️ Асинхронный драйвер БД недоступен: {e}")
+
 # Создаем базовый класс для моделей
 Base = declarative_base()
 
@@ -34,6 +97,25 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """Получение асинхронной сессии базы данных"""
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Асинхронный драйвер БД не установлен (pip install asyncpg)")
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def _describe_pool(pool) -> dict:
+    if isinstance(pool, InstrumentedQueuePool):
+        return pool.stats()
+    return {"pid": os.getpid(), "pool_class": type(pool).__name__, "status": pool.status()}
+
+def get_pool_stats() -> dict:
+    """Метрики пулов соединений текущего процесса (синхронного и асинхронного)"""
+    return {
+        "sync": _describe_pool(engine.pool),
+        "async": _describe_pool(async_engine.pool) if async_engine is not None else None,
+    }
+
 def initialize_database():
     """
     Инициализация базы данных.
@@ -1,11 +1,16 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.security.utils import get_authorization_scheme_param
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from pydantic import BaseModel
 
-from .database import get_db
-from .services.auth_service import verify_token
+from .database import get_db, get_async_db
+from .services.auth_service import decode_access_token
+from .services.user_cache import user_info_cache
+from .services.token_versions import token_version_registry
 from .models.user import User as UserModel
 
 security = HTTPBearer()
@@ -23,40 +28,258 @@ class UserInfo(BaseModel):
     class Config:
         from_attributes = True
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security), 
-    db: Session = Depends(get_db)
-) -> UserInfo:
-    """Зависимость для получения текущего пользователя"""
-    token = credentials.credentials
+def build_user_info(user: UserModel) -> UserInfo:
+    """Формирует UserInfo из ORM-модели пользователя"""
+    return UserInfo(
+        id=user.id,
+        email=user.email,
+        first_name=user.first_name,
+        last_name=user.last_name,
+        middle_name=user.middle_name,
+        roles=user.roles or [],
+        is_active=user.is_active,
+        is_verified=user.is_verified
+    )
+
+def user_info_from_claims(payload: dict) -> Optional[UserInfo]:
+    """
+    Формирует UserInfo из самодостаточного токена без обращения к БД.
+    Возвращает None, если токен обычный или его версия отозвана.
+    """
+    user_id = payload.get("uid")
+    if user_id is None or "ver" not in payload:
+        return None
+    if payload["ver"] != token_version_registry.current(user_id):
+        return None
     
-    # Проверяем токен
-    email = verify_token(token)
-    if email is None:
+    return UserInfo(
+        id=user_id,
+        email=payload["sub"],
+        first_name=payload.get("fn") or "",
+        last_name=payload.get("ln") or "",
+        middle_name=payload.get("mn"),
+        roles=payload.get("roles") or [],
+        is_active=payload.get("act", True),
+        is_verified=payload.get("vrf", True)
+    )
+
+class ResolvedIdentity:
+    """
+    Результат аутентификации запроса.
+
+    Сохраняется в request.state.identity и переиспользуется зависимостями,
+    обработчиками и middleware, поэтому пользователь разрешается не более
+    одного раза за запрос. ORM-объект доступен, только если пользователь
+    загружался из БД в сессии этого запроса.
+    """
+    __slots__ = ("user_info", "user")
+
+    def __init__(self, user_info: UserInfo, user: Optional[UserModel] = None):
+        self.user_info = user_info
+        self.user = user
+
+    @property
+    def user_id(self) -> int:
+        return self.user_info.id
+
+def _extract_bearer_token(request: Request) -> Optional[str]:
+    # Схема без учета регистра, как в HTTPBearer
+    scheme, token = get_authorization_scheme_param(request.headers.get("Authorization"))
+    if scheme.lower() != "bearer":
+        return None
+    return token.strip() or None
+
+def _revoked_token() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Token revoked",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def _resolve_without_db(token: str) -> Tuple[dict, Optional[UserInfo]]:
+    """Проверяет токен и разрешает пользователя без БД (claims -> кэш), если это возможно"""
+    payload = decode_access_token(token)
+    if payload is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Получаем пользователя из БД
-    user = db.query(UserModel).filter(UserModel.email == email).first()
+    # Версия уже известна как отозванная - без обращения к БД
+    user_id = payload.get("uid")
+    if user_id is not None and "ver" in payload:
+        current_version = token_version_registry.current(user_id)
+        if current_version is not None and payload["ver"] < current_version:
+            raise _revoked_token()
+    
+    # Самодостаточный токен с актуальной версией - БД не нужна
+    user_info = user_info_from_claims(payload)
+    if user_info is not None:
+        return payload, user_info
+    
+    # Пользователь уже разрешен по этому токену недавно
+    return payload, user_info_cache.get(token)
+
+def _resolve_loaded_user(token: str, payload: dict, user: Optional[UserModel]) -> UserInfo:
+    """UserInfo пользователя, загруженного из БД по токену"""
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    # Токен выдан до смены пароля или ролей
+    if "ver" in payload and payload["ver"] < (user.token_version or 0):
+        raise _revoked_token()
     
-    return UserInfo(
-        id=user.id,
-        email=user.email,
-        first_name=user.first_name,
-        last_name=user.last_name,
-        middle_name=user.middle_name,
-        roles=user.roles or [],
-        is_active=user.is_active,
-        is_verified=user.is_verified
-    )
+    user_info = build_user_info(user)
+    user_info_cache.set(token, user_info)
+    return user_info
+
+def _resolve_token(token: str, db: Session) -> Tuple[UserInfo, Optional[UserModel]]:
+    """Разрешает пользователя по токену: claims -> кэш -> БД"""
+    payload, user_info = _resolve_without_db(token)
+    if user_info is not None:
+        return user_info, None
+    
+    user = db.query(UserModel).filter(UserModel.email == payload["sub"]).first()
+    return _resolve_loaded_user(token, payload, user), user
+
+async def _resolve_token_async(token: str, db: AsyncSession) -> UserInfo:
+    """То же, что _resolve_token, но пользователь загружается через AsyncSession"""
+    payload, user_info = _resolve_without_db(token)
+    if user_info is not None:
+        return user_info
+    
+    user = (await db.execute(
+        select(UserModel).where(UserModel.email == payload["sub"]).limit(1)
+    )).scalars().first()
+    return _resolve_loaded_user(token, payload, user)
+
+def _memoized_identity(request: Request) -> Optional[ResolvedIdentity]:
+    """Уже разрешенный пользователь запроса (или запомненная ошибка аутентификации)"""
+    state = request.state
+    identity = getattr(state, "identity", None)
+    if identity is not None:
+        return identity
+    error = getattr(state, "auth_error", None)
+    if error is not None:
+        raise error
+    return None
+
+def _request_token(request: Request) -> str:
+    token = _extract_bearer_token(request)
+    if token is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authenticated"
+        )
+    return token
+
+def resolve_identity(request: Request, db: Optional[Session] = None) -> ResolvedIdentity:
+    """
+    Единая точка аутентификации запроса с мемоизацией в request.state.
+    
+    Если сессия БД не передана (middleware), для обращения к БД открывается
+    временная сессия, а ORM-объект пользователя не сохраняется.
+    Ошибка аутентификации также запоминается и повторно выбрасывается.
+    """
+    identity = _memoized_identity(request)
+    if identity is not None:
+        return identity
+    token = _request_token(request)
+    
+    own_session = db is None
+    if own_session:
+        from .database import SessionLocal
+        db = SessionLocal()
+    try:
+        user_info, user = _resolve_token(token, db)
+    except HTTPException as e:
+        request.state.auth_error = e
+        raise
+    finally:
+        if own_session:
+            db.close()
+    
+    identity = ResolvedIdentity(user_info, None if own_session else user)
+    request.state.identity = identity
+    return identity
+
+async def resolve_identity_async(request: Request, db: AsyncSession) -> ResolvedIdentity:
+    """
+    resolve_identity для маршрутов на AsyncSession: при промахе кэша
+    пользователь загружается без блокировки цикла событий. ORM-объект
+    асинхронной сессии в identity не сохраняется.
+    """
+    identity = _memoized_identity(request)
+    if identity is not None:
+        return identity
+    token = _request_token(request)
+    
+    try:
+        user_info = await _resolve_token_async(token, db)
+    except HTTPException as e:
+        request.state.auth_error = e
+        raise
+    
+    identity = ResolvedIdentity(user_info)
+    request.state.identity = identity
+    return identity
+
+def get_request_user_id(request: Request) -> Optional[int]:
+    """ID пользователя запроса без выброса ошибок (для middleware и логирования)"""
+    try:
+        return resolve_identity(request).user_id
+    except HTTPException:
+        return None
+
+async def get_current_identity(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> ResolvedIdentity:
+    """Зависимость: разрешенный пользователь текущего запроса"""
+    return resolve_identity(request, db)
+
+async def get_current_user(identity: ResolvedIdentity = Depends(get_current_identity)) -> UserInfo:
+    """Зависимость для получения текущего пользователя"""
+    return identity.user_info
+
+async def get_current_identity_async(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+) -> ResolvedIdentity:
+    """Зависимость для маршрутов на AsyncSession: пользователь разрешается без синхронной сессии"""
+    return await resolve_identity_async(request, db)
+
+async def get_current_user_async(identity: ResolvedIdentity = Depends(get_current_identity_async)) -> UserInfo:
+    """Асинхронный вариант get_current_user"""
+    return identity.user_info
+
+async def get_current_user_id(identity: ResolvedIdentity = Depends(get_current_identity)) -> int:
+    """Зависимость для получения ID текущего пользователя"""
+    return identity.user_id
+
+async def get_current_user_model(
+    identity: ResolvedIdentity = Depends(get_current_identity),
+    db: Session = Depends(get_db)
+) -> UserModel:
+    """
+    Зависимость для получения ORM-модели текущего пользователя.
+    Если пользователь уже загружен в сессию запроса, повторного запроса нет.
+    """
+    user = identity.user
+    if user is None:
+        user = db.get(UserModel, identity.user_id)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        identity.user = user
+    return user
 
 async def require_admin(current_user: UserInfo = Depends(get_current_user)) -> UserInfo:
     """Зависимость для проверки прав администратора"""
@@ -67,34 +290,24 @@ async def require_admin(current_user: UserInfo = Depends(get_current_user)) -> U
         )
     return current_user
 
+async def require_admin_async(current_user: UserInfo = Depends(get_current_user_async)) -> UserInfo:
+    """Асинхронный вариант require_admin"""
+    if 'admin' not in current_user.roles:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required"
+        )
+    return current_user
+
 async def get_current_user_from_token(token: str) -> Optional[UserInfo]:
-    """Получение пользователя по токену (для middleware)"""
+    """Получение пользователя по токену вне контекста запроса"""
+    from .database import SessionLocal
+    
+    db = SessionLocal()
     try:
-        from .database import SessionLocal
-        
-        # Проверяем токен
-        email = verify_token(token)
-        if email is None:
-            return None
-        
-        # Получаем пользователя из БД
-        db = SessionLocal()
-        try:
-            user = db.query(UserModel).filter(UserModel.email == email).first()
-            if user is None:
-                return None
-            
-            return UserInfo(
-                id=user.id,
-                email=user.email,
-                first_name=user.first_name,
-                last_name=user.last_name,
-                middle_name=user.middle_name,
-                roles=user.roles or [],
-                is_active=user.is_active,
-                is_verified=user.is_verified
-            )
-        finally:
-            db.close()
+        user_info, _ = _resolve_token(token, db)
+        return user_info
     except Exception:
-        return None 
\ No newline at end of file
+        return None
+    finally:
+        db.close()
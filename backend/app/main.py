@@ -28,12 +28,13 @@ from fastapi import FastAPI, HTTPException, Depends, status, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.staticfiles import StaticFiles
 import traceback
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from datetime import datetime
-from .database import engine, Base
+from .database import engine, async_engine, Base
 from .startup import startup_application, check_required_environment
 from .api import auth, profile, dev, users, departments
 from .dependencies import get_current_user, UserInfo
@@ -43,7 +44,14 @@ from .schemas.user import UserRoleUpdate
 from sqlalchemy.orm import Session
 from .database import get_db
 from .middleware.activity_middleware import ActivityLoggingMiddleware
+from .services.token_versions import token_version_registry
+from .services.password_hasher import password_hash_pool
+from .services.activity_buffer import activity_log_buffer
+from .services.activity_rollups import activity_rollup_job
+from .services.assignment_engine import assignment_engine
+from .services.sla_scheduler import sla_scheduler
 from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
 from .models.user import User
 from .models.department import Department
 from .models.role import Role
@@ -71,6 +79,28 @@ app = FastAPI(
 # Добавляем middleware для логирования активности
 app.add_middleware(ActivityLoggingMiddleware)
 
+@app.on_event("startup")
+async def start_background_services():
+    """Запуск фоновых сервисов процесса"""
+    await token_version_registry.start()
+    await activity_log_buffer.start()
+    await activity_rollup_job.start()
+    # Нагрузка исполнителей для автоназначения заявок - один агрегатный запрос
+    await run_in_threadpool(assignment_engine.rebuild)
+    await sla_scheduler.start()
+
+@app.on_event("shutdown")
+async def shutdown_background_services():
+    """Остановка фоновых сервисов процесса"""
+    # Дописываем накопленный журнал активности до закрытия пулов
+    await sla_scheduler.stop()
+    await token_version_registry.stop()
+    await activity_rollup_job.stop()
+    await activity_log_buffer.stop()
+    password_hash_pool.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
+
 # Добавляем обработчик ошибок валидации для диагностики
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -83,7 +113,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     return JSONResponse(
         status_code=422,
         content={
-            "detail": exc.errors(),
+            "detail": jsonable_encoder(exc.errors()),
             "url": str(request.url),
             "method": request.method
         }
@@ -222,6 +252,10 @@ app.include_router(reports.router, prefix="/api", tags=["reports"])
 from .api import activity_logs
 app.include_router(activity_logs.router, prefix="/api/activity-logs", tags=["activity-logs"])
 
+# Метрики для администраторов
+from .api.admin import metrics as admin_metrics
+app.include_router(admin_metrics.router, prefix="/api/admin/metrics", tags=["admin-metrics"])
+
 # Статическая раздача файлов
 import os
 # Определяем абсолютный путь к папке uploads относительно текущего файла main.py
@@ -482,6 +516,7 @@ async def make_user_admin(user_id: int, current_user: UserInfo = Depends(get_cur
     if "admin" not in user_roles:
         user_roles.append("admin")
         user.roles = user_roles
+        token_version_registry.revoke(db, user.id)
         db.commit()
         db.refresh(user)
     
@@ -513,8 +548,7 @@ async def get_users_by_role(role: str, current_user: UserInfo = Depends(get_curr
     if role not in valid_roles:
         raise HTTPException(status_code=400, detail=f"Недопустимая роль. Доступные роли: {valid_roles}")
     
-    users = db.query(UserModel).all()
-    filtered_users = [user for user in users if role in (user.roles or [])]
+    filtered_users = db.query(UserModel).filter(UserModel.has_role(role)).all()
     
     return {"role": role, "users": filtered_users, "count": len(filtered_users)}
 
@@ -543,6 +577,7 @@ async def update_user_roles(user_id: int, role_data: UserRoleUpdate, current_use
     
     # Обновляем роли
     target_user.roles = role_data.roles
+    token_version_registry.revoke(db, target_user.id)
     db.commit()
     db.refresh(target_user)
     
@@ -601,6 +636,7 @@ async def manage_user_role(
     
     # Обновляем роли
     target_user.roles = current_roles
+    token_version_registry.revoke(db, target_user.id)
     db.commit()
     db.refresh(target_user)
     
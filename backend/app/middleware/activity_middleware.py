@@ -1,23 +1,30 @@
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
-from sqlalchemy.orm import Session
-import json
+import asyncio
+import re
 import time
 from typing import Dict, Any, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from fastapi import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from ..database import SessionLocal
 from ..services.activity_service import ActivityService
+from ..services.activity_policy import activity_log_policy
 from ..models.activity_log import ActionType
-from ..dependencies import get_current_user_from_token
+from ..dependencies import get_request_user_id
 
-class ActivityLoggingMiddleware(BaseHTTPMiddleware):
+class ActivityLoggingMiddleware:
     """
-    Middleware для автоматического логирования активности пользователей
+    Middleware для автоматического логирования активности пользователей.
+    
+    Чистый ASGI: ответ (включая потоковые FileResponse и /uploads) проходит
+    без обертки, middleware лишь запоминает статус из http.response.start.
+    Таблицы путей компилируются в регулярные выражения один раз при создании.
+    Что из запросов попадет в журнал, решает политика activity_log_policy
+    (выборка, дедупликация повторов, обязательная запись изменений и ошибок).
     """
     
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
+        self.app = app
         
         # Маппинг путей к типам действий
         self.action_mapping = {
@@ -81,121 +88,148 @@ class ActivityLoggingMiddleware(BaseHTTPMiddleware):
             }
         }
         
-        # Пути, которые не нужно логировать
-        self.exclude_paths = {
+        # Пути, которые не нужно логировать ("/" - только точное совпадение,
+        # остальные - по префиксу)
+        self.exclude_exact = {"/"}
+        self.exclude_prefixes = (
             "/health",
-            "/",
             "/docs",
             "/openapi.json",
             "/redoc",
             "/ws",
-            "/api/activity-logs"  # Исключаем сами логи активности
-        }
+            "/api/activity-logs",  # Исключаем сами логи активности
+            "/api/admin/metrics"   # И опрос метрик
+        )
+        
+        self._compile_routes()
     
-    async def dispatch(self, request: Request, call_next) -> Response:
-        # Засекаем время начала запроса
-        start_time = time.time()
+    def _compile_routes(self):
+        """Строит регулярные выражения для исключений и префиксов action_mapping"""
+        self._exclude_re = re.compile(
+            "|".join(re.escape(prefix) for prefix in self.exclude_prefixes)
+        )
+        
+        # Порядок альтернатив совпадает с порядком словаря - первый подходящий префикс выигрывает
+        self._route_configs = list(self.action_mapping.values())
+        self._route_re = re.compile(
+            "|".join(f"(?P<r{index}>{re.escape(pattern)})" for index, pattern in enumerate(self.action_mapping))
+        )
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        path = scope["path"]
+        method = scope["method"]
+        
+        # Проверяем, нужно ли логировать этот путь (до выполнения запроса)
+        if self._should_exclude_path(path):
+            await self.app(scope, receive, send)
+            return
+        
+        action = self._determine_action(path, method)
+        if not action:
+            await self.app(scope, receive, send)
+            return
         
-        # Выполняем запрос
-        response = await call_next(request)
+        # request.state маршрута хранится в scope["state"] - оттуда берем пользователя
+        scope.setdefault("state", {})
+        status_code = 500
+        start_time = time.perf_counter()
         
-        # Вычисляем время выполнения
-        process_time = time.time() - start_time
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        await self.app(scope, receive, send_wrapper)
+        
+        # Вычисляем время выполнения (до отправки последнего фрагмента ответа)
+        process_time = time.perf_counter() - start_time
         
-        # Логируем активность асинхронно (если нужно)
         try:
-            await self._log_activity(request, response, process_time)
+            await self._log_activity(scope, action, status_code, process_time)
         except Exception as e:
             # Не прерываем запрос из-за ошибки логирования
             print(f"Ошибка логирования активности: {e}")
-        
-        return response
     
-    async def _log_activity(self, request: Request, response: Response, process_time: float):
+    async def _log_activity(self, scope: Scope, action: str, status_code: int, process_time: float):
         """Логирует активность пользователя"""
         
-        path = request.url.path
-        method = request.method
-        
-        # Проверяем, нужно ли логировать этот путь
-        if self._should_exclude_path(path):
-            return
+        request = Request(scope)
+        path = scope["path"]
+        method = scope["method"]
         
-        # Получаем информацию о пользователе
-        user_id = await self._get_user_id_from_request(request)
+        user_id = await self._get_user_id(request)
         
-        # Определяем тип действия
-        action = self._determine_action(path, method)
-        if not action:
+        activity_service = ActivityService()
+        actor = f"user:{user_id}" if user_id is not None else f"ip:{activity_service._get_client_ip(request)}"
+        decision = activity_log_policy.decide(path, method, action, status_code, actor)
+        if not decision.log:
             return
         
         # Извлекаем дополнительные детали
         resource_type, resource_id = self._extract_resource_info(path)
-        description = self._generate_description(action, path, method, response.status_code)
+        description = self._generate_description(action, path, method, status_code)
         
         # Формируем детали запроса
+        query_string = scope.get("query_string", b"").decode("latin-1")
         details = {
             "method": method,
             "path": path,
-            "status_code": response.status_code,
+            "status_code": status_code,
             "process_time": round(process_time, 3),
-            "query_params": dict(request.query_params) if request.query_params else None
+            "query_params": dict(parse_qsl(query_string, keep_blank_values=True)) if query_string else None
         }
+        if decision.sample_rate < 1.0:
+            # Вес записи для оценки полного объема по выборке
+            details["sample_rate"] = decision.sample_rate
         
-        # Создаем сессию базы данных и логируем
-        db = SessionLocal()
-        try:
-            activity_service = ActivityService(db)
-            activity_service.log_activity(
-                action=action,
-                description=description,
-                user_id=user_id,
-                resource_type=resource_type,
-                resource_id=resource_id,
-                details=details,
-                request=request
-            )
-        finally:
-            db.close()
+        # Запись уходит в буфер и сохраняется пакетом в фоне
+        activity_service.log_activity(
+            action=action,
+            description=description,
+            user_id=user_id,
+            resource_type=resource_type,
+            resource_id=resource_id,
+            details=details,
+            request=request,
+            defer=True
+        )
+    
+    async def _get_user_id(self, request: Request) -> Optional[int]:
+        """Пользователь, уже разрешенный зависимостями маршрута"""
+        state = request.scope["state"]
+        identity = state.get("identity")
+        if identity is not None:
+            return identity.user_id
+        if state.get("auth_error") is not None or "authorization" not in request.headers:
+            return None
+        
+        # Маршрут без аутентификации, но с токеном: разрешаем вне event loop
+        return await asyncio.to_thread(get_request_user_id, request)
     
     def _should_exclude_path(self, path: str) -> bool:
         """Проверяет, нужно ли исключить путь из логирования"""
-        for exclude_path in self.exclude_paths:
-            if path.startswith(exclude_path):
-                return True
-        return False
-    
-    async def _get_user_id_from_request(self, request: Request) -> Optional[int]:
-        """Извлекает ID пользователя из запроса"""
-        try:
-            # Попытка получить пользователя из токена
-            authorization = request.headers.get("Authorization")
-            if authorization and authorization.startswith("Bearer "):
-                token = authorization.split(" ")[1]
-                user_info = await get_current_user_from_token(token)
-                return user_info.user_id if hasattr(user_info, 'user_id') else None
-        except:
-            pass
-        return None
+        return path in self.exclude_exact or self._exclude_re.match(path) is not None
     
     def _determine_action(self, path: str, method: str) -> Optional[str]:
         """Определяет тип действия на основе пути и метода"""
         
-        # Ищем точное совпадение
-        if path in self.action_mapping:
-            mapping = self.action_mapping[path]
-            if isinstance(mapping, dict):
-                return mapping.get(method)
+        # Ищем точное совпадение, затем совпадение по началу пути
+        action_config = self.action_mapping.get(path)
+        if action_config is None:
+            match = self._route_re.match(path)
+            if match is not None:
+                action_config = self._route_configs[int(match.lastgroup[1:])]
+        
+        if action_config is not None:
+            if isinstance(action_config, dict):
+                return action_config.get(method)
             else:
-                return mapping
-        
-        # Ищем совпадение по началу пути
-        for route_pattern, action_config in self.action_mapping.items():
-            if path.startswith(route_pattern):
-                if isinstance(action_config, dict):
-                    return action_config.get(method)
-                else:
-                    return action_config
+                return action_config
         
         # Определяем действие по HTTP методу для API путей
         if path.startswith("/api/"):
@@ -1,12 +1,12 @@
 # Database models
-from .user import User, EmailVerification, Gender, UserRole
+from .user import User, UserRoleMembership, EmailVerification, Gender, UserRole
 from .user_profile import UserProfile
 from .department import Department
 from .user_assignment import UserDepartmentAssignment
 
 from .request_template import RequestTemplate, RoutingType
 from .field import FieldType, Field
-from .request import Request, RequestComment, RequestStatus
+from .request import Request, RequestComment, RequestStatus, RequestCandidate
 from .request_file import RequestFile
 from .role import Role
 from .portfolio import PortfolioAchievement, PortfolioFile, AchievementCategory
@@ -14,12 +14,15 @@ from .group import Group
 from .announcement import Announcement, AnnouncementView
 from .report_template import ReportTemplate
 from .report import Report
-from .activity_log import ActivityLog, ActionType
+from .activity_log import ActivityLog, ActionType, UserAgent
+from .activity_rollup import ActivityRollup, ActivityUserSketch, ActivityRollupState
+from .request_sla import RequestEscalation, RequestSlaCounter
 
 __all__ = [
-    "User", "EmailVerification", "UserProfile", "Gender", "UserRole", "Department", 
+    "User", "UserRoleMembership", "EmailVerification", "UserProfile", "Gender", "UserRole", "Department", 
     "UserDepartmentAssignment", "RequestTemplate", "RoutingType", "FieldType", "Field", 
-    "Request", "RequestComment", "RequestStatus", "RequestFile", "Role",
+    "Request", "RequestComment", "RequestStatus", "RequestCandidate", "RequestFile", "Role",
     "PortfolioAchievement", "PortfolioFile", "AchievementCategory", "Group",
-    "Announcement", "AnnouncementView", "ReportTemplate", "Report", "ActivityLog", "ActionType"
+    "Announcement", "AnnouncementView", "ReportTemplate", "Report", "ActivityLog", "ActionType", "UserAgent",
+    "ActivityRollup", "ActivityUserSketch", "ActivityRollupState", "RequestEscalation", "RequestSlaCounter"
 ] 
\ No newline at end of file
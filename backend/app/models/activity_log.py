@@ -1,9 +1,14 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, ForeignKey
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, Text, JSON, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
+from ..core.config import settings
 import enum
 
+# В PostgreSQL таблица секционирована по месяцам (RANGE по created_at), поэтому
+# created_at входит в первичный ключ. SQLite (разработка) секций не поддерживает.
+PARTITIONED = "sqlite" not in settings.DATABASE_URL
+
 class ActionType(enum.Enum):
     LOGIN = "login"
     LOGOUT = "logout"
@@ -41,10 +46,23 @@ class ActionType(enum.Enum):
     DEPARTMENT_UPDATE = "department_update"
     DEPARTMENT_DELETE = "department_delete"
 
+class UserAgent(Base):
+    """Справочник строк User-Agent (в журнале хранится только id)"""
+    __tablename__ = "user_agents"
+
+    id = Column(Integer, primary_key=True)
+    hash = Column(String(32), nullable=False, unique=True)  # md5(value) - ключ поиска
+    value = Column(Text, nullable=False)
+
 class ActivityLog(Base):
     __tablename__ = "activity_logs"
+    __table_args__ = (
+        # Keyset-пагинация журнала: ORDER BY created_at DESC, id DESC
+        Index("ix_activity_logs_created_at_id", "created_at", "id"),
+        {"postgresql_partition_by": "RANGE (created_at)"} if PARTITIONED else {},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)  # nullable для системных действий
     action = Column(String, nullable=False, index=True)  # Тип действия (ActionType)
     resource_type = Column(String, nullable=True, index=True)  # Тип ресурса (user, announcement, request и т.д.)
@@ -52,11 +70,23 @@ class ActivityLog(Base):
     description = Column(Text, nullable=False)  # Описание действия
     details = Column(JSON, nullable=True)  # Дополнительные детали в JSON формате
     ip_address = Column(String, nullable=True)  # IP адрес пользователя
-    user_agent = Column(Text, nullable=True)  # User Agent браузера
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    user_agent_id = Column(Integer, ForeignKey("user_agents.id"), nullable=True)  # User Agent браузера
+    # Поля HTTP-запроса (для записей middleware)
+    method = Column(String(10), nullable=True)
+    status_code = Column(SmallInteger, nullable=True, index=True)
+    duration_ms = Column(Integer, nullable=True, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True, primary_key=PARTITIONED)
     
     # Связи
     user = relationship("User", foreign_keys=[user_id])
+    user_agent_ref = relationship("UserAgent", lazy="joined")
+    
+    # Для ORM запись однозначно определяется id (значения из общей последовательности)
+    __mapper_args__ = {"primary_key": [id]}
+    
+    @property
+    def user_agent(self) -> str:
+        return self.user_agent_ref.value if self.user_agent_ref else None
     
     def __repr__(self):
         return f"<ActivityLog(id={self.id}, user_id={self.user_id}, action={self.action}, resource_type={self.resource_type})>" 
\ No newline at end of file
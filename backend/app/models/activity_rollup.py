@@ -0,0 +1,40 @@
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary, Index
+from ..database import Base
+
+# Гранулярность агрегатов
+GRANULARITY_HOUR = "hour"
+GRANULARITY_DAY = "day"
+
+class ActivityRollup(Base):
+    """Количество действий журнала за час/день в разрезе action, user, resource_type"""
+    __tablename__ = "activity_rollups"
+
+    granularity = Column(String(8), primary_key=True)  # hour | day
+    dimension = Column(String(32), primary_key=True)  # action | user | resource_type
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)  # Начало интервала (UTC)
+    key = Column(String(255), primary_key=True)  # Значение измерения ('' для NULL)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_activity_rollups_granularity_bucket_start", "granularity", "bucket_start"),
+    )
+
+    def __repr__(self):
+        return f"<ActivityRollup({self.granularity} {self.bucket_start} {self.dimension}={self.key}: {self.count})>"
+
+class ActivityUserSketch(Base):
+    """Скетч HyperLogLog уникальных пользователей за час/день"""
+    __tablename__ = "activity_user_sketches"
+
+    granularity = Column(String(8), primary_key=True)
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    registers = Column(LargeBinary, nullable=False)
+
+class ActivityRollupState(Base):
+    """Отметка, до которой агрегаты построены по журналу"""
+    __tablename__ = "activity_rollup_state"
+
+    name = Column(String(50), primary_key=True)
+    watermark = Column(DateTime(timezone=True), nullable=True)  # Все часы раньше отметки посчитаны
+    covered_until = Column(DateTime(timezone=True), nullable=True)  # Момент, по который учтены записи
+    refreshed_at = Column(DateTime(timezone=True), nullable=True)
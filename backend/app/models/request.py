@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, JSON, DateTime, ForeignKey
-from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, Boolean, JSON, DateTime, ForeignKey, Index, DDL, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.sql import func, text
+from sqlalchemy.orm import relationship, deferred
 from ..database import Base
 import enum
 
@@ -14,6 +15,28 @@ class RequestStatus(enum.Enum):
 
 class Request(Base):
     __tablename__ = "requests"
+    __table_args__ = (
+        # Постраничные списки «Мои заявки» / «Назначенные мне» по (created_at, id)
+        Index("ix_requests_author_created_at_id", "author_id", "created_at", "id"),
+        Index("ix_requests_assignee_created_at_id", "assignee_id", "created_at", "id"),
+        # Очередь свободных заявок для «взять следующую»
+        Index(
+            "ix_requests_claim_queue", "template_id", "created_at", "id",
+            postgresql_where=text("status = 'in_review' AND assignee_id IS NULL")
+        ),
+        # Открытые заявки по исполнителям - нагрузка для автоназначения
+        Index(
+            "ix_requests_open_assignee", "assignee_id",
+            postgresql_where=text("status IN ('submitted', 'in_review', 'approved') AND assignee_id IS NOT NULL")
+        ),
+        # Сроки заявок в работе - для планировщика эскалаций
+        Index(
+            "ix_requests_open_deadline", "deadline",
+            postgresql_where=text("status IN ('in_review', 'approved')")
+        ),
+        # Полнотекстовый поиск
+        Index("ix_requests_search_vector", "search_vector", postgresql_using="gin"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     template_id = Column(Integer, ForeignKey("request_templates.id"), nullable=False)
@@ -21,7 +44,7 @@ class Request(Base):
     # Пользователи
     author_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # Автор заявки
     assignee_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # Ответственный
-    possible_assignees = Column(JSON, nullable=True)  # Возможные исполнители (список ID)
+    possible_assignees = Column(JSON, nullable=True)  # Копия request_candidates для ответов API (список ID)
     
     # Основная информация
     title = Column(String(500), nullable=False)  # Заголовок заявки
@@ -37,15 +60,55 @@ class Request(Base):
     submitted_at = Column(DateTime(timezone=True), nullable=True)
     deadline = Column(DateTime(timezone=True), nullable=True)  # Срок выполнения
     
+    # Версия строки для оптимистичной блокировки (увеличивается при каждом переходе)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    
+    # Поисковый вектор (title, description, строковые значения form_data) - заполняет триггер
+    search_vector = deferred(Column(TSVECTOR().with_variant(Text(), "sqlite"), nullable=True))
+    
     # Связи
     template = relationship("RequestTemplate", back_populates="requests")
     author = relationship("User", foreign_keys=[author_id], backref="authored_requests")
     assignee = relationship("User", foreign_keys=[assignee_id], backref="assigned_requests")
     comments = relationship("RequestComment", back_populates="request", cascade="all, delete-orphan")
     files = relationship("RequestFile", back_populates="request", cascade="all, delete-orphan")
+    candidates = relationship("RequestCandidate", back_populates="request", cascade="all, delete-orphan", passive_deletes=True)
+
+# Поисковый вектор пересчитывает триггер при вставке заявки и изменении title,
+# description или form_data любым путем (ORM, UPDATE ... RETURNING, ручной SQL);
+# веса: заголовок A, описание B, строковые значения формы C
+REQUEST_SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'B') ||
+    setweight(jsonb_to_tsvector('russian', coalesce(NEW.form_data::jsonb, '{}'::jsonb), '["string"]'), 'C')
+"""
+
+REQUEST_SEARCH_TRIGGER_DDL = [
+    DDL(f"""
+        CREATE OR REPLACE FUNCTION requests_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {REQUEST_SEARCH_VECTOR_SQL};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """),
+    DDL("""
+        CREATE TRIGGER requests_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF title, description, form_data ON requests
+        FOR EACH ROW EXECUTE FUNCTION requests_search_vector_update()
+    """),
+]
+
+# Таблицы, созданные через create_all (без миграций), тоже получают триггер
+for _ddl in REQUEST_SEARCH_TRIGGER_DDL:
+    event.listen(Request.__table__, "after_create", _ddl.execute_if(dialect="postgresql"))
 
 class RequestComment(Base):
     __tablename__ = "request_comments"
+    __table_args__ = (
+        # Постраничная загрузка комментариев заявки по id
+        Index("ix_request_comments_request_id_id", "request_id", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     request_id = Column(Integer, ForeignKey("requests.id"), nullable=False)
@@ -58,4 +121,18 @@ class RequestComment(Base):
     
     # Связи
     request = relationship("Request", back_populates="comments")
-    user = relationship("User", backref="request_comments") 
\ No newline at end of file
+    user = relationship("User", backref="request_comments")
+
+class RequestCandidate(Base):
+    """Возможный исполнитель заявки (может взять ее в работу)"""
+    __tablename__ = "request_candidates"
+    __table_args__ = (
+        # Выборка «Назначенные мне» идет от пользователя
+        Index("ix_request_candidates_user_id_request_id", "user_id", "request_id"),
+    )
+
+    request_id = Column(Integer, ForeignKey("requests.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    request = relationship("Request", back_populates="candidates")
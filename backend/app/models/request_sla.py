@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
+from sqlalchemy.sql import func
+from ..database import Base
+
+# Уровни эскалации по сроку заявки
+ESCALATION_DUE_SOON = "due_soon"
+ESCALATION_OVERDUE = "overdue"
+
+class RequestEscalation(Base):
+    """Отправленная эскалация по сроку заявки (не больше одной на каждый уровень)"""
+    __tablename__ = "request_escalations"
+
+    request_id = Column(Integer, ForeignKey("requests.id", ondelete="CASCADE"), primary_key=True)
+    level = Column(String(16), primary_key=True)  # due_soon | overdue
+    deadline = Column(DateTime(timezone=True), nullable=False)  # Срок заявки на момент эскалации
+    recipients = Column(JSON, nullable=True)  # ID уведомленных пользователей
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<RequestEscalation(request_id={self.request_id}, level={self.level})>"
+
+class RequestSlaCounter(Base):
+    """Счетчики просроченных и «горящих» заявок для дашборда (пересчитываются планировщиком)"""
+    __tablename__ = "request_sla_counters"
+
+    dimension = Column(String(16), primary_key=True)  # total | template | assignee
+    key = Column(String(32), primary_key=True)  # ID шаблона/исполнителя ('' для total и без исполнителя)
+    overdue = Column(Integer, nullable=False, default=0)
+    due_soon = Column(Integer, nullable=False, default=0)
+    refreshed_at = Column(DateTime(timezone=True), nullable=False)
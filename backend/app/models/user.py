@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Date, Enum, Text
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Date, Enum, Text, ForeignKey, Index, exists
+from sqlalchemy.ext.hybrid import hybrid_method
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
@@ -17,6 +18,17 @@ class UserRole(enum.Enum):
     EMPLOYEE = "employee"
     SCHOOLCHILD = "schoolchild"
 
+class UserRoleMembership(Base):
+    """Членство пользователя в роли (нормализованная копия users.roles для индексных выборок)"""
+    __tablename__ = "user_roles"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    role_name = Column(String(50), primary_key=True)
+
+    __table_args__ = (
+        Index("ix_user_roles_role_name_user_id", "role_name", "user_id"),
+    )
+
 class User(Base):
     __tablename__ = "users"
 
@@ -31,6 +43,7 @@ class User(Base):
     _roles = Column('roles', Text, default='[]', nullable=True)  # JSON строка ролей
     is_verified = Column(Boolean, default=False)
     is_active = Column(Boolean, default=True)
+    token_version = Column(Integer, default=0, server_default='0', nullable=False)  # Версия токенов (для отзыва)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -46,13 +59,32 @@ class User(Base):
     
     @roles.setter
     def roles(self, value):
-        """Установка ролей как список"""
+        """Установка ролей как список (синхронизирует таблицу user_roles)"""
         if value is None:
-            self._roles = '[]'
-        else:
-            self._roles = json.dumps(value)
+            value = []
+        self._roles = json.dumps(value)
+
+        # Сохраняем существующие строки членства, чтобы не пересоздавать их
+        existing = {membership.role_name: membership for membership in self.role_memberships}
+        self.role_memberships = [
+            existing.get(role_name) or UserRoleMembership(role_name=role_name)
+            for role_name in dict.fromkeys(value)
+        ]
+
+    @hybrid_method
+    def has_role(self, role_name):
+        """Проверка роли: у экземпляра - по списку, в запросе - EXISTS по индексу user_roles"""
+        return role_name in self.roles
+
+    @has_role.expression
+    def has_role(cls, role_name):
+        return exists().where(
+            UserRoleMembership.user_id == cls.id,
+            UserRoleMembership.role_name == role_name
+        )
     
     # Связи
+    role_memberships = relationship("UserRoleMembership", cascade="all, delete-orphan", passive_deletes=True)
     profile = relationship("UserProfile", back_populates="user", uselist=False, cascade="all, delete-orphan")
     department_assignments = relationship("UserDepartmentAssignment", foreign_keys="UserDepartmentAssignment.user_id", back_populates="user", cascade="all, delete-orphan")
     portfolio_achievements = relationship("PortfolioAchievement", back_populates="user", cascade="all, delete-orphan")
@@ -40,6 +40,12 @@ class ActionType(str, Enum):
     DEPARTMENT_UPDATE = "department_update"
     DEPARTMENT_DELETE = "department_delete"
 
+class TotalMode(str, Enum):
+    EXACT = "exact"        # Точный COUNT(*)
+    ESTIMATE = "estimate"  # Оценка планировщика PostgreSQL
+    CAPPED = "capped"      # Точно до порога, дальше "N+"
+    NONE = "none"          # Без подсчета
+
 class ActivityLogBase(BaseModel):
     action: str
     resource_type: Optional[str] = None
@@ -48,6 +54,9 @@ class ActivityLogBase(BaseModel):
     details: Optional[Dict[str, Any]] = None
     ip_address: Optional[str] = None
     user_agent: Optional[str] = None
+    method: Optional[str] = None
+    status_code: Optional[int] = None
+    duration_ms: Optional[int] = None
 
 class ActivityLogCreate(ActivityLogBase):
     user_id: Optional[int] = None
@@ -71,12 +80,19 @@ class ActivityLogFilter(BaseModel):
     resource_id: Optional[str] = None
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
+    status_code: Optional[int] = None
+    min_duration_ms: Optional[int] = None
     page: int = Field(1, ge=1)
     size: int = Field(50, ge=1, le=1000)
+    cursor: Optional[str] = None  # Keyset-режим: курсор из next_cursor предыдущей страницы
+    total_mode: TotalMode = TotalMode.CAPPED
 
 class ActivityLogListResponse(BaseModel):
     items: List[ActivityLogResponse]
-    total: int
-    page: int
+    total: Optional[int] = None
+    total_mode: TotalMode = TotalMode.EXACT
+    total_capped: bool = False  # total - нижняя граница ("10000+")
+    page: Optional[int] = None  # None в keyset-режиме
     size: int
-    pages: int 
\ No newline at end of file
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None 
\ No newline at end of file
@@ -32,6 +32,10 @@ class RequestComment(RequestCommentBase):
     class Config:
         from_attributes = True
 
+class RequestCommentPage(BaseModel):
+    items: List[RequestComment]
+    has_more: bool = False  # Есть комментарии после последнего в items
+
 # Схемы для заявок
 class RequestBase(BaseModel):
     title: str
@@ -51,6 +55,7 @@ class RequestUpdate(BaseModel):
 
 class RequestAssign(BaseModel):
     assignee_id: int
+    version: Optional[int] = None  # Версия заявки, которую видел пользователь
 
 class Request(RequestBase):
     id: int
@@ -63,11 +68,13 @@ class Request(RequestBase):
     updated_at: Optional[datetime] = None
     submitted_at: Optional[datetime] = None
     deadline: Optional[datetime] = None
+    version: int = 1
     
     # Связанные объекты
     author: UserBase
     assignee: Optional[UserBase] = None
-    comments: List[RequestComment] = []
+    comments_count: int = 0  # Всего видимых пользователю комментариев
+    comments: List[RequestComment] = []  # Последние комментарии, остальные - через /comments
     files: List[RequestFileResponse] = []
 
     class Config:
@@ -90,4 +97,51 @@ class RequestList(BaseModel):
     assignee: Optional[UserBase] = None
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class RequestDeadlineCounts(BaseModel):
+    overdue: int = 0  # Срок уже прошел
+    urgent: int = 0   # До срока не больше 2 дней
+
+
+class RequestListPage(BaseModel):
+    items: List[RequestList]
+    total: int  # Всего заявок по текущему фильтру
+    size: int
+    next_cursor: Optional[str] = None  # None - страниц больше нет
+    status_counts: Dict[str, int] = {}  # Количество заявок по статусам (без учета фильтра по статусу)
+    deadline_counts: RequestDeadlineCounts = RequestDeadlineCounts()
+
+
+# Полнотекстовый поиск
+class RequestSearchHit(BaseModel):
+    """
+    title_highlight и snippet - HTML-фрагменты: пользовательский текст в них
+    экранирован (&amp; &lt; &gt;), единственная разметка - <mark>...</mark>
+    вокруг совпадений. title - исходный текст без экранирования.
+    """
+    id: int
+    title: str
+    title_highlight: str  # Заголовок с совпадениями в <mark>...</mark> (HTML)
+    snippet: Optional[str] = None  # Фрагменты описания и формы с совпадениями (HTML)
+    rank: float
+    status: RequestStatus
+    template_id: int
+    template_name: str
+    author_id: int
+    assignee_id: Optional[int] = None
+    created_at: datetime
+    deadline: Optional[datetime] = None
+
+
+class RequestSearchFacets(BaseModel):
+    status: Dict[str, int] = {}  # Найдено по статусам
+    template: Dict[str, int] = {}  # Найдено по шаблонам (ключ - id шаблона)
+
+
+class RequestSearchPage(BaseModel):
+    items: List[RequestSearchHit]
+    total: int  # Найдено с учетом фильтров
+    page: int
+    size: int
+    facets: RequestSearchFacets = RequestSearchFacets()  # Без учета фильтров по статусу и шаблону
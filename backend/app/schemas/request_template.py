@@ -1,13 +1,25 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from ..models.request_template import RoutingType
+from ..services.routing_rules import parse_condition
 
-# Схема для правил маршрутизации
-class RoutingRule(BaseModel):
+# Условие правила маршрутизации
+class RoutingCondition(BaseModel):
     field: str                    # Поле формы (например, "faculty")
+    operator: str = "eq"          # eq, in (через запятую), regex, range (min..max)
     value: str                    # Значение поля (например, "technical")
+
+    @validator('value')
+    def validate_condition(cls, v, values):
+        if 'field' in values and 'operator' in values:
+            parse_condition({'field': values['field'], 'operator': values['operator'], 'value': v})
+        return v
+
+# Схема для правил маршрутизации
+class RoutingRule(RoutingCondition):
     assignees: List[int]          # Список ID ответственных
+    conditions: Optional[List[RoutingCondition]] = None  # Дополнительные условия (все через И)
 
 # Схема для правил назначения ролей
 class RoleAssignmentRule(BaseModel):
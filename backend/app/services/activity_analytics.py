@@ -0,0 +1,235 @@
+"""
+Аналитика журнала активности: тепловая карта активности, перцентили времени
+ответа по эндпоинтам и динамика доли ошибок.
+
+Все агрегаты считаются в PostgreSQL (date_trunc, extract, percentile_cont)
+по диапазону created_at - наружу уходят только готовые точки для графиков.
+Количества учитывают вес выборочных записей (1 / sample_rate); перцентили
+времени ответа считаются по самой выборке.
+Результаты кэшируются в процессе на ACTIVITY_ANALYTICS_CACHE_TTL_SECONDS.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Hashable, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from fastapi import HTTPException
+from sqlalchemy import Integer, and_, cast, desc, extract, func, select
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.activity_log import ActivityLog
+from ..utils.ttl_cache import TTLCache
+from .activity_policy import weighted_count
+
+INTERVALS = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+}
+# Не больше точек на график
+MAX_BUCKETS = 1000
+# Максимальный период анализа
+MAX_PERIOD = timedelta(days=366)
+
+analytics_cache = TTLCache(max_size=256, ttl_seconds=settings.ACTIVITY_ANALYTICS_CACHE_TTL_SECONDS)
+
+
+def _endpoint():
+    """Путь запроса с числовыми идентификаторами, замененными на {id}"""
+    return func.regexp_replace(ActivityLog.details["path"].as_string(), r"/\d+", "/{id}", "g")
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Дата без часового пояса (?start_date=2026-10-01) считается UTC"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _resolve_period(start_date: Optional[datetime], end_date: Optional[datetime], default_days: int):
+    # Округление до минуты - чтобы повторные запросы попадали в кэш
+    end = _as_utc(end_date) or datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    start = _as_utc(start_date) or end - timedelta(days=default_days)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="Начало периода должно быть раньше конца")
+    if end - start > MAX_PERIOD:
+        raise HTTPException(status_code=400, detail=f"Период не может превышать {MAX_PERIOD.days} дней")
+    return start, end
+
+
+def _resolve_timezone(tz: str) -> str:
+    try:
+        ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Неизвестный часовой пояс: {tz}")
+    return tz
+
+
+def _cached(key: Hashable, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    cached = analytics_cache.get(key)
+    if cached is not None:
+        return cached
+    result = compute()
+    result["generated_at"] = datetime.now(timezone.utc).isoformat()
+    analytics_cache.set(key, result)
+    return result
+
+
+class ActivityAnalyticsService:
+    def __init__(self, db: Session):
+        self.db = db
+        if db.get_bind().dialect.name != "postgresql":
+            raise HTTPException(status_code=501, detail="Аналитика журнала доступна только для PostgreSQL")
+
+    def _base_conditions(self, start: datetime, end: datetime, action: Optional[str], resource_type: Optional[str]) -> list:
+        conditions = [ActivityLog.created_at >= start, ActivityLog.created_at < end]
+        if action:
+            conditions.append(ActivityLog.action == action)
+        if resource_type:
+            conditions.append(ActivityLog.resource_type == resource_type)
+        return conditions
+
+    def heatmap(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        tz: str = "Europe/Moscow",
+        action: Optional[str] = None,
+        resource_type: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Количество действий по дню недели (1 - понедельник) и часу суток"""
+        start, end = _resolve_period(start_date, end_date, 28)
+        tz = _resolve_timezone(tz)
+
+        def compute():
+            local_time = func.timezone(tz, ActivityLog.created_at)
+            weekday = cast(extract("isodow", local_time), Integer).label("weekday")
+            hour = cast(extract("hour", local_time), Integer).label("hour")
+            rows = self.db.execute(
+                select(weekday, hour, weighted_count().label("count"))
+                .where(*self._base_conditions(start, end, action, resource_type))
+                .group_by(weekday, hour)
+            ).all()
+
+            matrix = [[0] * 24 for _ in range(7)]
+            for weekday_value, hour_value, count in rows:
+                matrix[weekday_value - 1][hour_value] = count
+            return {
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "timezone": tz,
+                "total": sum(map(sum, matrix)),
+                "matrix": matrix,
+            }
+
+        return _cached(("heatmap", start, end, tz, action, resource_type), compute)
+
+    def latency(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        resource_type: Optional[str] = None,
+        limit: int = 20,
+    ) -> Dict[str, Any]:
+        """Перцентили времени ответа (мс) по эндпоинтам, самые нагруженные первыми"""
+        start, end = _resolve_period(start_date, end_date, 1)
+
+        def compute():
+            endpoint = _endpoint().label("endpoint")
+            method = ActivityLog.method.label("method")
+            duration = ActivityLog.duration_ms
+            rows = self.db.execute(
+                select(
+                    method,
+                    endpoint,
+                    weighted_count().label("requests"),
+                    func.avg(duration).label("avg"),
+                    func.percentile_cont(0.5).within_group(duration).label("p50"),
+                    func.percentile_cont(0.95).within_group(duration).label("p95"),
+                    func.percentile_cont(0.99).within_group(duration).label("p99"),
+                    func.max(duration).label("max"),
+                )
+                .where(
+                    *self._base_conditions(start, end, None, resource_type),
+                    duration.isnot(None)
+                )
+                .group_by(method, endpoint)
+                .order_by(desc("requests"))
+                .limit(limit)
+            ).all()
+
+            return {
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "endpoints": [
+                    {
+                        "method": row.method,
+                        "endpoint": row.endpoint,
+                        "count": row.requests,
+                        "avg_ms": round(row.avg, 1),
+                        "p50_ms": round(row.p50, 1),
+                        "p95_ms": round(row.p95, 1),
+                        "p99_ms": round(row.p99, 1),
+                        "max_ms": round(row.max, 1),
+                    }
+                    for row in rows
+                ],
+            }
+
+        return _cached(("latency", start, end, resource_type, limit), compute)
+
+    def errors(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        interval: str = "hour",
+        tz: str = "Europe/Moscow",
+        resource_type: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Доля ответов 4xx/5xx по интервалам времени"""
+        start, end = _resolve_period(start_date, end_date, 1 if interval == "hour" else 30)
+        tz = _resolve_timezone(tz)
+        if interval not in INTERVALS:
+            raise HTTPException(status_code=400, detail=f"Интервал должен быть одним из: {', '.join(INTERVALS)}")
+        if (end - start) / INTERVALS[interval] > MAX_BUCKETS:
+            raise HTTPException(status_code=400, detail=f"Слишком много точек (больше {MAX_BUCKETS}), увеличьте интервал")
+
+        def compute():
+            bucket = func.date_trunc(interval, func.timezone(tz, ActivityLog.created_at)).label("bucket")
+            status_code = ActivityLog.status_code
+            rows = self.db.execute(
+                select(
+                    bucket,
+                    weighted_count().label("total"),
+                    weighted_count(and_(status_code >= 400, status_code < 500)).label("client_errors"),
+                    weighted_count(status_code >= 500).label("server_errors"),
+                )
+                .where(
+                    *self._base_conditions(start, end, None, resource_type),
+                    status_code.isnot(None)
+                )
+                .group_by(bucket)
+                .order_by(bucket)
+            ).all()
+
+            return {
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "interval": interval,
+                "timezone": tz,
+                "buckets": [
+                    {
+                        "bucket": row.bucket.isoformat(),
+                        "total": row.total,
+                        "client_errors": row.client_errors,
+                        "server_errors": row.server_errors,
+                        "error_rate": round((row.client_errors + row.server_errors) / row.total, 4) if row.total else 0.0,
+                    }
+                    for row in rows
+                ],
+            }
+
+        return _cached(("errors", start, end, interval, tz, resource_type), compute)
@@ -0,0 +1,287 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from ..core.config import settings
+from ..utils.latency import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_DROP = "drop"
+OVERFLOW_SPILL = "spill"
+
+
+class ActivityLogBuffer:
+    """
+    Буфер отложенной записи журнала активности.
+
+    Записи копятся в памяти процесса и сбрасываются в activity_logs одним
+    многострочным INSERT - каждые flush_interval_ms или при накоплении
+    batch_size записей. Размер буфера ограничен: при переполнении (и при
+    ошибке записи в БД) записи отбрасываются или, при политике spill,
+    дописываются в NDJSON-файл, который загружается при следующем запуске.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        batch_size: int,
+        flush_interval_ms: int,
+        overflow_policy: str = OVERFLOW_SPILL,
+        spill_dir: Optional[str] = None,
+        enabled: bool = True,
+    ):
+        self.enabled = enabled
+        self.max_size = max(1, max_size)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(10, flush_interval_ms) / 1000
+        self.overflow_policy = overflow_policy if overflow_policy in (OVERFLOW_DROP, OVERFLOW_SPILL) else OVERFLOW_SPILL
+        self.spill_dir = spill_dir
+
+        self._records: deque = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.last_flush_at: Optional[float] = None
+        self._flush_latencies = LatencyWindow(1000)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def spill_path(self) -> Optional[str]:
+        if not self.spill_dir:
+            return None
+        return os.path.join(self.spill_dir, f"activity_spill.{os.getpid()}.ndjson")
+
+    def enqueue(self, record: Dict[str, Any]) -> bool:
+        """
+        Добавляет запись в буфер (не блокирует, безопасно из любого потока).
+        Возвращает False, если запись не попала в буфер.
+        """
+        with self._lock:
+            if len(self._records) >= self.max_size:
+                overflow = True
+            else:
+                overflow = False
+                self._records.append(record)
+                self.enqueued += 1
+                should_wake = len(self._records) >= self.batch_size
+
+        if overflow:
+            self._handle_overflow([record])
+            return False
+
+        if should_wake and self._loop is not None and self._wakeup is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                # Цикл событий уже закрыт - запись сбросится при остановке
+                pass
+        return True
+
+    async def start(self) -> None:
+        """Запускает фоновый сброс буфера (вызывается при старте приложения)"""
+        if not self.enabled or self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="activity-log-flusher")
+        # Догружаем записи, сохраненные на диск при прошлых запусках
+        await asyncio.to_thread(self.replay_spill_files)
+
+    async def stop(self) -> None:
+        """Останавливает фоновый сброс и записывает остаток буфера"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush_all)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await asyncio.to_thread(self.flush_all)
+            except Exception as e:
+                logger.error(f"Ошибка сброса журнала активности: {e}")
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            count = min(self.batch_size, len(self._records))
+            return [self._records.popleft() for _ in range(count)]
+
+    def flush_all(self) -> int:
+        """Сбрасывает в БД все накопленные записи пакетами по batch_size"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._drain()
+                if not batch:
+                    break
+                written += self._write_batch(batch)
+        return written
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> int:
+        from ..database import engine
+        from ..models.activity_log import ActivityLog
+        from .activity_records import prepare_records
+
+        started_at = time.perf_counter()
+        try:
+            with engine.begin() as connection:
+                # executemany с insertmanyvalues - один многострочный INSERT на пакет
+                connection.execute(insert(ActivityLog.__table__), prepare_records(connection, batch))
+        except Exception as e:
+            self.flush_errors += 1
+            logger.error(f"Не удалось записать {len(batch)} записей журнала активности: {e}")
+            self._handle_overflow(batch)
+            return 0
+
+        self._flush_latencies.add(time.perf_counter() - started_at)
+        self.flushes += 1
+        self.written += len(batch)
+        self.last_flush_at = time.time()
+        return len(batch)
+
+    def _handle_overflow(self, records: List[Dict[str, Any]]) -> None:
+        path = self.spill_path
+        if self.overflow_policy != OVERFLOW_SPILL or not path:
+            self.dropped += len(records)
+            return
+
+        try:
+            with self._spill_lock:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "a", encoding="utf-8") as spill_file:
+                    for record in records:
+                        spill_file.write(json.dumps(record, ensure_ascii=False, default=_json_default) + "\n")
+            self.spilled += len(records)
+        except OSError as e:
+            logger.error(f"Не удалось сохранить журнал активности на диск: {e}")
+            self.dropped += len(records)
+
+    def replay_spill_files(self) -> int:
+        """Загружает в БД записи, сохраненные в NDJSON-файлы (в том числе другими воркерами)"""
+        if not self.spill_dir or not os.path.isdir(self.spill_dir):
+            return 0
+
+        replayed = 0
+        oldest: Optional[datetime] = None
+        for path in glob.glob(os.path.join(self.spill_dir, "activity_spill.*.ndjson")):
+            # Переименование атомарно: файл забирает только один воркер
+            claimed_path = f"{path}.replay.{os.getpid()}"
+            try:
+                os.rename(path, claimed_path)
+            except OSError:
+                continue
+
+            batch = []
+            with open(claimed_path, encoding="utf-8") as spill_file:
+                for line in spill_file:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = _restore_record(json.loads(line))
+                    except (ValueError, TypeError):
+                        continue
+                    batch.append(record)
+                    created_at = record.get("created_at")
+                    if isinstance(created_at, datetime) and (oldest is None or created_at < oldest):
+                        oldest = created_at
+                    if len(batch) >= self.batch_size:
+                        replayed += self._write_batch(batch)
+                        batch = []
+            if batch:
+                replayed += self._write_batch(batch)
+            os.remove(claimed_path)
+
+        if replayed:
+            self.replayed += replayed
+            logger.info(f"Загружено {replayed} записей журнала активности из {self.spill_dir}")
+            if oldest is not None:
+                self._invalidate_rollups(oldest)
+        return replayed
+
+    def _invalidate_rollups(self, since: datetime) -> None:
+        """Загруженные записи задним числом - агрегаты статистики пересчитываются с since"""
+        from ..database import engine
+        from .activity_rollups import mark_rollups_stale
+
+        try:
+            with engine.begin() as connection:
+                mark_rollups_stale(connection, since)
+        except Exception as e:
+            logger.error(f"Не удалось отметить агрегаты журнала активности для пересчета: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "pid": os.getpid(),
+            "size": len(self._records),
+            "max_size": self.max_size,
+            "batch_size": self.batch_size,
+            "flush_interval_ms": int(self.flush_interval * 1000),
+            "overflow_policy": self.overflow_policy,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+            "seconds_since_flush": round(time.time() - self.last_flush_at, 1) if self.last_flush_at else None,
+            "flush_latency_ms": self._flush_latencies.summary_ms(),
+        }
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _restore_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    if isinstance(record.get("created_at"), str):
+        record["created_at"] = datetime.fromisoformat(record["created_at"])
+    return record
+
+
+activity_log_buffer = ActivityLogBuffer(
+    max_size=settings.ACTIVITY_LOG_BUFFER_MAX_SIZE,
+    batch_size=settings.ACTIVITY_LOG_BATCH_SIZE,
+    flush_interval_ms=settings.ACTIVITY_LOG_FLUSH_INTERVAL_MS,
+    overflow_policy=settings.ACTIVITY_LOG_OVERFLOW_POLICY,
+    spill_dir=settings.ACTIVITY_LOG_SPILL_DIR,
+    enabled=settings.ACTIVITY_LOG_BUFFER_ENABLED,
+)
@@ -0,0 +1,206 @@
+"""
+Потоковая выгрузка журнала активности в CSV, NDJSON и XLSX.
+
+Записи читаются серверным курсором (stream_results + yield_per) в отдельном
+соединении и отдаются частями, поэтому память процесса не зависит от объема
+выгрузки. XLSX собирается openpyxl в режиме write-only во временном файле,
+который затем отдается частями и удаляется.
+"""
+
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Tuple
+
+from sqlalchemy import desc, select
+
+from ..core.config import settings
+from ..models.activity_log import ActivityLog, UserAgent
+from ..models.user import User
+from ..schemas.activity_log import ActivityLogFilter
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+EXPORT_COLUMNS = [
+    "id", "created_at", "user_id", "user_email", "user_full_name", "action",
+    "resource_type", "resource_id", "description", "method", "status_code", "duration_ms",
+    "ip_address", "user_agent", "details",
+]
+
+# Порог, после которого накопленный текст отдается клиенту
+CHUNK_SIZE = 64 * 1024
+# Лимит строк на лист Excel (1 048 576 вместе с заголовком)
+XLSX_ROWS_PER_SHEET = 1_000_000
+# Ячейки, начинающиеся с этих символов, Excel считает формулами
+FORMULA_PREFIXES = ("=", "+", "-", "@")
+
+
+def _export_query(filters: ActivityLogFilter):
+    from .activity_service import ActivityService
+
+    return (
+        select(
+            ActivityLog.id,
+            ActivityLog.created_at,
+            ActivityLog.user_id,
+            User.email,
+            User.last_name,
+            User.first_name,
+            User.middle_name,
+            ActivityLog.action,
+            ActivityLog.resource_type,
+            ActivityLog.resource_id,
+            ActivityLog.description,
+            ActivityLog.method,
+            ActivityLog.status_code,
+            ActivityLog.duration_ms,
+            ActivityLog.ip_address,
+            UserAgent.value.label("user_agent"),
+            ActivityLog.details,
+        )
+        .outerjoin(User, ActivityLog.user_id == User.id)
+        .outerjoin(UserAgent, ActivityLog.user_agent_id == UserAgent.id)
+        .where(*ActivityService.filter_conditions(filters))
+        .order_by(desc(ActivityLog.created_at), desc(ActivityLog.id))
+    )
+
+
+def iter_export_rows(filters: ActivityLogFilter, batch_size: int = None) -> Iterator[Dict[str, Any]]:
+    """Записи журнала по фильтрам, прочитанные серверным курсором"""
+    from ..database import engine
+
+    batch_size = batch_size or settings.ACTIVITY_LOG_EXPORT_BATCH_SIZE
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=batch_size).execute(
+            _export_query(filters)
+        )
+        for row in result:
+            full_name = None
+            if row.last_name or row.first_name:
+                full_name = " ".join(part for part in (row.last_name, row.first_name, row.middle_name) if part)
+            yield {
+                "id": row.id,
+                "created_at": row.created_at,
+                "user_id": row.user_id,
+                "user_email": row.email,
+                "user_full_name": full_name,
+                "action": row.action,
+                "resource_type": row.resource_type,
+                "resource_id": row.resource_id,
+                "description": row.description,
+                "method": row.method,
+                "status_code": row.status_code,
+                "duration_ms": row.duration_ms,
+                "ip_address": row.ip_address,
+                "user_agent": row.user_agent,
+                "details": row.details,
+            }
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _csv_value(value):
+    """Текст, похожий на формулу, экранируется апострофом (CSV открывают в Excel)"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(rows: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    # BOM - чтобы Excel открыл кириллицу в UTF-8
+    buffer.write("\ufeff")
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow([
+            row["id"],
+            row["created_at"].isoformat() if row["created_at"] else "",
+            *[_csv_value(row[column]) for column in EXPORT_COLUMNS[2:-1]],
+            _csv_value(json.dumps(row["details"], ensure_ascii=False, default=_json_default)) if row["details"] is not None else "",
+        ])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def stream_ndjson(rows: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    chunk: List[str] = []
+    size = 0
+    for row in rows:
+        line = json.dumps(row, ensure_ascii=False, default=_json_default) + "\n"
+        chunk.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield "".join(chunk).encode("utf-8")
+            chunk = []
+            size = 0
+    if chunk:
+        yield "".join(chunk).encode("utf-8")
+
+
+def stream_xlsx(rows: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    def clean(value):
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value, ensure_ascii=False, default=_json_default)
+        if isinstance(value, str):
+            # Явная строковая ячейка: текст вида "=..." не становится формулой
+            cell = WriteOnlyCell(sheet, ILLEGAL_CHARACTERS_RE.sub("", value))
+            cell.data_type = "s"
+            return cell
+        if isinstance(value, datetime):
+            # Excel не хранит часовой пояс - выгружаем в UTC
+            if value.tzinfo is not None:
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            return value
+        return value
+
+    workbook = Workbook(write_only=True)
+    sheet = None
+    sheet_rows = XLSX_ROWS_PER_SHEET
+    for row in rows:
+        if sheet_rows >= XLSX_ROWS_PER_SHEET:
+            sheet = workbook.create_sheet(f"Журнал {len(workbook.worksheets) + 1}")
+            sheet.append(EXPORT_COLUMNS)
+            sheet_rows = 0
+        sheet.append([clean(row[column]) for column in EXPORT_COLUMNS])
+        sheet_rows += 1
+    if sheet is None:
+        workbook.create_sheet("Журнал 1").append(EXPORT_COLUMNS)
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook.save(path)
+        with open(path, "rb") as xlsx_file:
+            while True:
+                chunk = xlsx_file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def export_activity_logs(filters: ActivityLogFilter, export_format: str) -> Tuple[Iterator[bytes], str, str]:
+    """Возвращает (поток байтов, media type, имя файла) для выгрузки"""
+    streams = {"csv": stream_csv, "ndjson": stream_ndjson, "xlsx": stream_xlsx}
+    filename = f"activity_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    return streams[export_format](iter_export_rows(filters)), EXPORT_FORMATS[export_format], filename
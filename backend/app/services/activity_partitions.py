@@ -0,0 +1,283 @@
+"""
+Обслуживание секционированной таблицы activity_logs (PostgreSQL).
+
+Таблица секционирована по месяцам (RANGE по created_at). Модуль создает
+секции заранее, применяет сроки хранения по типам действий и выгружает
+устаревшие секции в сжатые NDJSON-файлы перед удалением.
+"""
+
+import gzip
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "activity_logs"
+DEFAULT_PARTITION = "activity_logs_default"
+PARTITION_RE = re.compile(r"^activity_logs_y(\d{4})m(\d{2})$")
+DELETE_BATCH_SIZE = 10000
+
+
+def partition_name(month: date) -> str:
+    return f"activity_logs_y{month.year:04d}m{month.month:02d}"
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def parse_partition_month(name: str) -> Optional[date]:
+    match = PARTITION_RE.match(name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+@dataclass
+class RetentionPolicy:
+    """Сроки хранения журнала: по умолчанию и для отдельных действий"""
+    default_days: int
+    by_action: Dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def from_settings(cls) -> "RetentionPolicy":
+        return cls(
+            default_days=settings.ACTIVITY_LOG_RETENTION_DAYS,
+            by_action=dict(settings.ACTIVITY_LOG_RETENTION_BY_ACTION),
+        )
+
+    @property
+    def max_days(self) -> int:
+        """Секцию можно удалить целиком, только когда истек самый длинный срок"""
+        return max([self.default_days, *self.by_action.values()])
+
+
+def is_partitioned(db: Session) -> bool:
+    """activity_logs уже переведена на секционирование (миграция применена)"""
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    relkind = db.execute(
+        text("SELECT relkind FROM pg_class WHERE relname = :name AND relkind IN ('p', 'r')"),
+        {"name": PARENT_TABLE}
+    ).scalar()
+    return relkind == "p"
+
+
+def list_partitions(db: Session) -> Dict[str, bool]:
+    """Все месячные секции: имя -> подключена ли к activity_logs"""
+    attached = {
+        row[0] for row in db.execute(text("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = :parent
+        """), {"parent": PARENT_TABLE})
+    }
+    # Отключенные, но еще не выгруженные секции (например, после сбоя архивации)
+    existing = {
+        row[0] for row in db.execute(
+            text("SELECT relname FROM pg_class WHERE relkind = 'r' AND relname LIKE 'activity\\_logs\\_y%'")
+        )
+    }
+    return {
+        name: name in attached
+        for name in sorted(attached | existing)
+        if parse_partition_month(name) is not None
+    }
+
+
+def create_partition(db: Session, month: date) -> None:
+    """
+    Создает секцию месяца. Если обслуживание пропускали и записи месяца уже
+    попали в секцию по умолчанию, CREATE ... PARTITION OF завершился бы ошибкой
+    (ограничение секции по умолчанию было бы нарушено) - тогда секция по
+    умолчанию отключается, записи месяца переносятся в новую секцию и секция
+    по умолчанию подключается обратно. Все в транзакции вызывающего кода.
+    """
+    name = partition_name(month)
+    start, end = f"{month.isoformat()} 00:00:00+00", f"{add_months(month, 1).isoformat()} 00:00:00+00"
+    bounds = {"start": start, "end": end}
+    create_sql = f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} FOR VALUES FROM ('{start}') TO ('{end}')"
+    in_month = "created_at >= CAST(:start AS timestamptz) AND created_at < CAST(:end AS timestamptz)"
+
+    has_default = db.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": DEFAULT_PARTITION}).scalar()
+    stray = has_default and db.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_month})"), bounds
+    ).scalar()
+    if not stray:
+        db.execute(text(create_sql))
+        return
+
+    logger.warning(f"⚠️ Записи за {month:%Y-%m} попали в {DEFAULT_PARTITION} - переносим в {name}")
+    db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}"))
+    db.execute(text(create_sql))
+    moved = db.execute(
+        text(f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {in_month}"), bounds
+    ).rowcount
+    db.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_month}"), bounds)
+    db.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+    logger.info(f"✅ В секцию {name} перенесено записей из {DEFAULT_PARTITION}: {moved}")
+
+
+def ensure_partitions(db: Session, months_ahead: Optional[int] = None, today: Optional[date] = None) -> List[str]:
+    """Создает секции для текущего и следующих месяцев (идемпотентно)"""
+    months_ahead = settings.ACTIVITY_LOG_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+    current = month_start(today or datetime.now(timezone.utc).date())
+
+    created = []
+    if not db.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": DEFAULT_PARTITION}).scalar():
+        # Секция по умолчанию принимает записи вне созданных месяцев
+        db.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"))
+        created.append(DEFAULT_PARTITION)
+
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        name = partition_name(month)
+        exists = db.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}).scalar()
+        if exists:
+            continue
+        create_partition(db, month)
+        created.append(name)
+
+    if created:
+        logger.info(f"✅ Созданы секции журнала активности: {', '.join(created)}")
+    return created
+
+
+def apply_row_retention(db: Session, policy: RetentionPolicy, now: Optional[datetime] = None, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Удаляет записи действий, срок хранения которых короче срока хранения секций.
+    Удаление идет пакетами, чтобы не держать длинных блокировок.
+    """
+    now = now or datetime.now(timezone.utc)
+    max_days = policy.max_days
+    rules = []
+
+    for action, days in policy.by_action.items():
+        if days < max_days:
+            rules.append((action, "action = :action", {"action": action}, days))
+    if policy.default_days < max_days and policy.by_action:
+        # Действия без собственного срока хранятся default_days
+        rules.append((
+            "*",
+            "NOT (action = ANY(:actions))",
+            {"actions": list(policy.by_action)},
+            policy.default_days
+        ))
+    elif policy.default_days < max_days:
+        rules.append(("*", "TRUE", {}, policy.default_days))
+
+    deleted = {}
+    for label, condition, params, days in rules:
+        cutoff = now - timedelta(days=days)
+        if dry_run:
+            deleted[label] = db.execute(
+                text(f"SELECT count(*) FROM {PARENT_TABLE} WHERE {condition} AND created_at < :cutoff"),
+                {**params, "cutoff": cutoff}
+            ).scalar()
+            continue
+
+        total = 0
+        while True:
+            result = db.execute(text(f"""
+                DELETE FROM {PARENT_TABLE} a
+                USING (
+                    SELECT id, created_at FROM {PARENT_TABLE}
+                    WHERE {condition} AND created_at < :cutoff
+                    LIMIT :batch
+                ) expired
+                WHERE a.id = expired.id AND a.created_at = expired.created_at
+            """), {**params, "cutoff": cutoff, "batch": DELETE_BATCH_SIZE})
+            db.commit()
+            total += result.rowcount
+            if result.rowcount < DELETE_BATCH_SIZE:
+                break
+        deleted[label] = total
+
+    return deleted
+
+
+def archive_partition(db: Session, name: str, archive_dir: str) -> int:
+    """Выгружает секцию в <archive_dir>/<name>.ndjson.gz построчно (JSON на строку)"""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.ndjson.gz")
+    tmp_path = f"{path}.tmp"
+
+    rows = 0
+    result = db.execute(
+        # Строка User-Agent подставляется из справочника - архив самодостаточен
+        text(f"""
+            SELECT row_to_json(t)::text FROM (
+                SELECT l.*, ua.value AS user_agent
+                FROM {name} l
+                LEFT JOIN user_agents ua ON ua.id = l.user_agent_id
+                ORDER BY l.created_at, l.id
+            ) t
+        """),
+        execution_options={"stream_results": True, "yield_per": 5000}
+    )
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as archive:
+        for (line,) in result:
+            archive.write(line)
+            archive.write("\n")
+            rows += 1
+    os.replace(tmp_path, path)
+    return rows
+
+
+def expire_partitions(
+    db: Session,
+    policy: RetentionPolicy,
+    archive_dir: Optional[str] = None,
+    archive: bool = True,
+    today: Optional[date] = None,
+    dry_run: bool = False,
+) -> List[Dict[str, object]]:
+    """
+    Отключает, архивирует и удаляет секции, целиком вышедшие за срок хранения.
+    Секция устаревает, когда ее конец раньше now - max_days.
+    """
+    archive_dir = archive_dir or settings.ACTIVITY_LOG_ARCHIVE_DIR
+    cutoff = (today or datetime.now(timezone.utc).date()) - timedelta(days=policy.max_days)
+
+    processed = []
+    for name, attached in list_partitions(db).items():
+        month = parse_partition_month(name)
+        if add_months(month, 1) > cutoff:
+            continue
+
+        report = {"partition": name, "attached": attached, "rows": None, "archived": False}
+        if dry_run:
+            report["rows"] = db.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+            processed.append(report)
+            continue
+
+        if attached:
+            db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+            db.commit()
+
+        if archive:
+            report["rows"] = archive_partition(db, name, archive_dir)
+            report["archived"] = True
+
+        db.execute(text(f"DROP TABLE {name}"))
+        db.commit()
+        logger.info(f"🗄️ Секция {name} удалена (архив: {report['archived']}, строк: {report['rows']})")
+        processed.append(report)
+
+    return processed
@@ -0,0 +1,189 @@
+"""
+Политика записи журнала активности из middleware: выборка (sampling),
+дедупликация повторных просмотров и правила «записывать всегда».
+
+Политика задается JSON (ACTIVITY_LOG_POLICY или файл ACTIVITY_LOG_POLICY_FILE):
+
+    {
+      "always": {"methods": ["POST", "PUT", "PATCH", "DELETE"], "min_status": 400},
+      "rules": [
+        {"name": "announcements-poll", "path": "/api/announcements/current", "dedupe_seconds": 300},
+        {"name": "uploads", "path": "/uploads/", "sample_rate": 0.1},
+        {"name": "views", "action": "view", "method": "GET", "dedupe_seconds": 60}
+      ],
+      "default": {"sample_rate": 1.0, "dedupe_seconds": 0}
+    }
+
+Правила проверяются по порядку, срабатывает первое подходящее (path - префикс
+пути, action и method - точное совпадение). Изменения данных и ответы с
+ошибками записываются всегда. Окно дедупликации считается в пределах воркера.
+
+Записи правил с sample_rate < 1 несут details.sample_rate; агрегаты
+(activity_rollups, activity_analytics) считают их с весом 1 / sample_rate
+через weighted_count(), чтобы объемы не занижались.
+"""
+
+import json
+import logging
+import random
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Integer, case, cast, func
+
+from ..core.config import settings
+from ..models.activity_log import ActivityLog
+from ..utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLICY: Dict[str, Any] = {
+    "always": {"methods": ["POST", "PUT", "PATCH", "DELETE"], "min_status": 400},
+    "rules": [
+        # Опрос SPA каждые несколько секунд
+        {"name": "announcements-poll", "path": "/api/announcements/current", "dedupe_seconds": 300},
+        {"name": "assigned-poll", "path": "/api/requests/assigned", "dedupe_seconds": 300},
+        {"name": "my-requests-poll", "path": "/api/requests/my", "dedupe_seconds": 300},
+        # Статика: одна запись на файл и пользователя за 5 минут
+        {"name": "uploads", "path": "/uploads/", "dedupe_seconds": 300},
+    ],
+    "default": {"sample_rate": 1.0, "dedupe_seconds": 0},
+}
+
+DECISION_LOGGED = "logged"
+DECISION_ALWAYS = "always"
+DECISION_SAMPLED_OUT = "sampled_out"
+DECISION_DEDUPED = "deduped"
+
+
+def sample_weight():
+    """Вес записи журнала: 1 / details.sample_rate для выборочных записей, иначе 1"""
+    rate = ActivityLog.details["sample_rate"].as_float()
+    return case((rate > 0, 1.0 / rate), else_=1.0)
+
+
+def weighted_count(condition=None):
+    """Оценка числа событий по выборке (целое) - замена func.count() в агрегатах журнала"""
+    weight = sample_weight() if condition is None else case((condition, sample_weight()), else_=0.0)
+    return cast(func.round(func.coalesce(func.sum(weight), 0)), Integer)
+
+
+@dataclass
+class PolicyRule:
+    name: str
+    path: Optional[str] = None
+    action: Optional[str] = None
+    method: Optional[str] = None
+    sample_rate: float = 1.0
+    dedupe_seconds: int = 0
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], index: int) -> "PolicyRule":
+        return cls(
+            name=data.get("name") or f"rule-{index}",
+            path=data.get("path"),
+            action=data.get("action"),
+            method=data["method"].upper() if data.get("method") else None,
+            sample_rate=min(1.0, max(0.0, float(data.get("sample_rate", 1.0)))),
+            dedupe_seconds=max(0, int(data.get("dedupe_seconds", 0))),
+        )
+
+    def matches(self, path: str, method: str, action: str) -> bool:
+        return (
+            (self.path is None or path.startswith(self.path))
+            and (self.action is None or action == self.action)
+            and (self.method is None or method == self.method)
+        )
+
+
+@dataclass
+class PolicyDecision:
+    log: bool
+    reason: str
+    rule: str
+    sample_rate: float = 1.0
+
+
+class ActivityLogPolicy:
+    def __init__(self, policy: Dict[str, Any], dedupe_max_keys: int = 100000):
+        always = policy.get("always", {})
+        self.always_methods = {method.upper() for method in always.get("methods", [])}
+        self.always_min_status = always.get("min_status")
+        self.rules: List[PolicyRule] = [
+            PolicyRule.from_dict(rule, index) for index, rule in enumerate(policy.get("rules", []))
+        ]
+        self.default_rule = PolicyRule.from_dict({"name": "default", **policy.get("default", {})}, 0)
+
+        self._recent = TTLCache(max_size=dedupe_max_keys, ttl_seconds=300)
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def decide(self, path: str, method: str, action: str, status_code: int, actor: Optional[str]) -> PolicyDecision:
+        """
+        Решает, записывать ли запрос в журнал.
+        actor - пользователь или IP для окна дедупликации.
+        """
+        if method in self.always_methods or (
+            self.always_min_status is not None and status_code >= self.always_min_status
+        ):
+            return self._count(PolicyDecision(True, DECISION_ALWAYS, "always"))
+
+        rule = next((rule for rule in self.rules if rule.matches(path, method, action)), self.default_rule)
+
+        if rule.sample_rate < 1.0 and random.random() >= rule.sample_rate:
+            return self._count(PolicyDecision(False, DECISION_SAMPLED_OUT, rule.name, rule.sample_rate))
+
+        if rule.dedupe_seconds and actor is not None:
+            key = (actor, method, path, action)
+            if self._recent.get(key) is not None:
+                return self._count(PolicyDecision(False, DECISION_DEDUPED, rule.name, rule.sample_rate))
+            self._recent.set(key, True, ttl_seconds=rule.dedupe_seconds)
+
+        return self._count(PolicyDecision(True, DECISION_LOGGED, rule.name, rule.sample_rate))
+
+    def _count(self, decision: PolicyDecision) -> PolicyDecision:
+        with self._lock:
+            counters = self._counters.setdefault(decision.rule, {})
+            counters[decision.reason] = counters.get(decision.reason, 0) + 1
+        return decision
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_rule = {rule: dict(counters) for rule, counters in self._counters.items()}
+        totals: Dict[str, int] = {}
+        for counters in by_rule.values():
+            for reason, count in counters.items():
+                totals[reason] = totals.get(reason, 0) + count
+        return {
+            "totals": totals,
+            "by_rule": by_rule,
+            "rules": [
+                {
+                    "name": rule.name,
+                    "path": rule.path,
+                    "action": rule.action,
+                    "method": rule.method,
+                    "sample_rate": rule.sample_rate,
+                    "dedupe_seconds": rule.dedupe_seconds,
+                }
+                for rule in [*self.rules, self.default_rule]
+            ],
+            "dedupe_keys": len(self._recent),
+        }
+
+
+def load_policy() -> Dict[str, Any]:
+    """Политика из файла, из переменной окружения или по умолчанию"""
+    try:
+        if settings.ACTIVITY_LOG_POLICY_FILE:
+            with open(settings.ACTIVITY_LOG_POLICY_FILE, encoding="utf-8") as policy_file:
+                return json.load(policy_file)
+        if settings.ACTIVITY_LOG_POLICY:
+            return json.loads(settings.ACTIVITY_LOG_POLICY)
+    except (OSError, ValueError) as e:
+        logger.error(f"❌ Некорректная политика журнала активности, используется политика по умолчанию: {e}")
+    return DEFAULT_POLICY
+
+
+activity_log_policy = ActivityLogPolicy(load_policy(), dedupe_max_keys=settings.ACTIVITY_LOG_DEDUPE_MAX_KEYS)
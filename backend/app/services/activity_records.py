@@ -0,0 +1,117 @@
+"""
+Подготовка записей журнала активности к вставке.
+
+Строка User-Agent заменяется ссылкой на справочник user_agents, а поля
+HTTP-запроса из details (method, status_code, process_time) переносятся
+в типизированные колонки - в details остаются только редкие поля.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import select
+
+from ..models.activity_log import UserAgent
+from ..utils.ttl_cache import TTLCache
+
+# Колонки, которые получает каждая запись пакетной вставки
+RECORD_COLUMNS = (
+    "user_id", "action", "resource_type", "resource_id", "description", "details",
+    "ip_address", "user_agent_id", "method", "status_code", "duration_ms", "created_at",
+)
+
+# id строк User-Agent по md5; набор браузеров небольшой, кэш почти всегда попадает
+_user_agent_ids = TTLCache(max_size=10000, ttl_seconds=24 * 3600)
+
+
+def user_agent_hash(value: str) -> str:
+    return hashlib.md5(value.encode("utf-8")).hexdigest()
+
+
+def compact_details(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Переносит method/status_code/process_time из details в колонки записи"""
+    details = record.get("details")
+    if not isinstance(details, dict):
+        return record
+
+    details = dict(details)
+    if "method" in details:
+        record.setdefault("method", details.pop("method"))
+    if "status_code" in details:
+        record.setdefault("status_code", details.pop("status_code"))
+    if "process_time" in details:
+        process_time = details.pop("process_time")
+        if process_time is not None:
+            record.setdefault("duration_ms", int(round(float(process_time) * 1000)))
+    if details.get("query_params") is None:
+        details.pop("query_params", None)
+    record["details"] = details or None
+    return record
+
+
+def resolve_user_agent_ids(connection, values: Iterable[str]) -> Dict[str, int]:
+    """id справочника для строк User-Agent (недостающие добавляются)"""
+    result: Dict[str, int] = {}
+    missing: Dict[str, str] = {}
+    for value in set(values):
+        if not value:
+            continue
+        digest = user_agent_hash(value)
+        cached = _user_agent_ids.get(digest)
+        if cached is not None:
+            result[value] = cached
+        else:
+            missing[digest] = value
+
+    if missing:
+        if connection.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        connection.execute(
+            insert(UserAgent.__table__).on_conflict_do_nothing(index_elements=["hash"]),
+            [{"hash": digest, "value": value} for digest, value in missing.items()]
+        )
+        for user_agent_id, digest in connection.execute(
+            select(UserAgent.id, UserAgent.hash).where(UserAgent.hash.in_(list(missing)))
+        ):
+            _user_agent_ids.set(digest, user_agent_id)
+            result[missing[digest]] = user_agent_id
+
+    return result
+
+
+def preload_user_agent_id(bind, value: Optional[str]) -> None:
+    """
+    Заносит строку User-Agent в справочник и кэш отдельной короткой транзакцией.
+
+    Вызывается до транзакции, которая потом запишет журнал: prepare_record
+    возьмет id из кэша, не выполняя запросов к user_agents под ее блокировками.
+    """
+    if not value or _user_agent_ids.get(user_agent_hash(value)) is not None:
+        return
+    with bind.begin() as connection:
+        resolve_user_agent_ids(connection, [value])
+
+
+def prepare_records(connection, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Приводит записи (в том числе старого формата из spill-файлов) к колонкам activity_logs"""
+    user_agent_ids = resolve_user_agent_ids(
+        connection, (record.get("user_agent") for record in records)
+    )
+    prepared = []
+    for record in records:
+        record = compact_details(dict(record))
+        user_agent = record.pop("user_agent", None)
+        if user_agent:
+            record["user_agent_id"] = user_agent_ids.get(user_agent)
+        if record.get("created_at") is None:
+            record["created_at"] = datetime.now(timezone.utc)
+        # executemany требует одинакового набора ключей во всех записях
+        prepared.append({column: record.get(column) for column in RECORD_COLUMNS})
+    return prepared
+
+
+def prepare_record(connection, record: Dict[str, Any]) -> Dict[str, Any]:
+    return prepare_records(connection, [record])[0]
@@ -0,0 +1,410 @@
+"""
+Предварительные агрегаты журнала активности для /api/activity-logs/stats.
+
+Фоновая задача периодически пересчитывает почасовые агрегаты (количество
+действий по action, user, resource_type с учетом веса выборочных записей и
+HLL-скетч уникальных пользователей)
+начиная с отметки watermark, затем собирает из них дневные. Последние
+ACTIVITY_ROLLUP_RECOMPUTE_HOURS часов пересчитываются каждый раз, чтобы учесть
+записи, дошедшие из буфера с опозданием. Статистика читается из дневных
+агрегатов и не сканирует activity_logs.
+"""
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import and_, delete, desc, func, insert, literal_column, select, update
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.activity_log import ActivityLog
+from ..models.activity_rollup import (
+    ActivityRollup, ActivityUserSketch, ActivityRollupState, GRANULARITY_HOUR, GRANULARITY_DAY
+)
+from ..models.user import User
+from .activity_policy import weighted_count
+from ..utils.hyperloglog import HyperLogLog
+
+logger = logging.getLogger(__name__)
+
+STATE_NAME = "activity_logs"
+# Ключ advisory-блокировки: пересчет выполняет только один воркер
+ROLLUP_LOCK_KEY = 7316001
+# Сколько дней журнала обрабатывается за один проход (первичное заполнение)
+MAX_DAYS_PER_RUN = 7
+
+DIMENSIONS = {
+    "action": ActivityLog.action,
+    "user": ActivityLog.user_id,
+    "resource_type": ActivityLog.resource_type,
+}
+
+
+def hour_start(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def day_start(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _as_utc(value) -> Optional[datetime]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _hour_bucket(db: Session):
+    """Выражение начала часа для created_at (в UTC)"""
+    if db.get_bind().dialect.name == "postgresql":
+        # Литералы вместо параметров: одинаковое выражение в SELECT и GROUP BY
+        return func.date_trunc(literal_column("'hour'"), func.timezone(literal_column("'UTC'"), ActivityLog.created_at))
+    return func.strftime(literal_column("'%Y-%m-%d %H:00:00'"), ActivityLog.created_at)
+
+
+def _try_lock(db: Session) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return True
+    return bool(db.execute(select(func.pg_try_advisory_xact_lock(ROLLUP_LOCK_KEY))).scalar())
+
+
+def _rebuild_hours(db: Session, start: datetime, end: datetime) -> int:
+    """Пересчитывает почасовые агрегаты и скетчи за [start, end) по журналу"""
+    db.execute(delete(ActivityRollup).where(
+        ActivityRollup.granularity == GRANULARITY_HOUR,
+        ActivityRollup.bucket_start >= start,
+        ActivityRollup.bucket_start < end
+    ))
+    db.execute(delete(ActivityUserSketch).where(
+        ActivityUserSketch.granularity == GRANULARITY_HOUR,
+        ActivityUserSketch.bucket_start >= start,
+        ActivityUserSketch.bucket_start < end
+    ))
+
+    bucket = _hour_bucket(db)
+    in_range = and_(ActivityLog.created_at >= start, ActivityLog.created_at < end)
+
+    rows = []
+    for dimension, column in DIMENSIONS.items():
+        query = (
+            select(bucket.label("bucket"), column.label("key"), weighted_count().label("count"))
+            .where(in_range)
+            .group_by(bucket, column)
+        )
+        if dimension == "user":
+            query = query.where(ActivityLog.user_id.isnot(None))
+        for bucket_value, key, count in db.execute(query):
+            rows.append({
+                "granularity": GRANULARITY_HOUR,
+                "dimension": dimension,
+                "bucket_start": _as_utc(bucket_value),
+                "key": "" if key is None else str(key),
+                "count": count,
+            })
+    if rows:
+        db.execute(insert(ActivityRollup.__table__), rows)
+
+    sketches: Dict[datetime, HyperLogLog] = defaultdict(HyperLogLog)
+    user_query = (
+        select(bucket.label("bucket"), ActivityLog.user_id)
+        .where(in_range, ActivityLog.user_id.isnot(None))
+        .distinct()
+    )
+    for bucket_value, user_id in db.execute(user_query):
+        sketches[_as_utc(bucket_value)].add(user_id)
+    if sketches:
+        db.execute(insert(ActivityUserSketch.__table__), [
+            {"granularity": GRANULARITY_HOUR, "bucket_start": bucket_value, "registers": sketch.to_bytes()}
+            for bucket_value, sketch in sketches.items()
+        ])
+
+    return len(rows)
+
+
+def _rebuild_days(db: Session, start: datetime, end: datetime) -> int:
+    """Собирает дневные агрегаты за дни, пересекающиеся с [start, end), из почасовых"""
+    day_from = day_start(start)
+    day_to = day_start(end - timedelta(microseconds=1)) + timedelta(days=1)
+
+    db.execute(delete(ActivityRollup).where(
+        ActivityRollup.granularity == GRANULARITY_DAY,
+        ActivityRollup.bucket_start >= day_from,
+        ActivityRollup.bucket_start < day_to
+    ))
+    db.execute(delete(ActivityUserSketch).where(
+        ActivityUserSketch.granularity == GRANULARITY_DAY,
+        ActivityUserSketch.bucket_start >= day_from,
+        ActivityUserSketch.bucket_start < day_to
+    ))
+
+    counts: Dict[tuple, int] = defaultdict(int)
+    for dimension, bucket_value, key, count in db.execute(
+        select(ActivityRollup.dimension, ActivityRollup.bucket_start, ActivityRollup.key, ActivityRollup.count)
+        .where(
+            ActivityRollup.granularity == GRANULARITY_HOUR,
+            ActivityRollup.bucket_start >= day_from,
+            ActivityRollup.bucket_start < day_to
+        )
+    ):
+        counts[(dimension, day_start(_as_utc(bucket_value)), key)] += count
+    if counts:
+        db.execute(insert(ActivityRollup.__table__), [
+            {"granularity": GRANULARITY_DAY, "dimension": dimension, "bucket_start": bucket_value, "key": key, "count": count}
+            for (dimension, bucket_value, key), count in counts.items()
+        ])
+
+    sketches: Dict[datetime, HyperLogLog] = defaultdict(HyperLogLog)
+    for bucket_value, registers in db.execute(
+        select(ActivityUserSketch.bucket_start, ActivityUserSketch.registers)
+        .where(
+            ActivityUserSketch.granularity == GRANULARITY_HOUR,
+            ActivityUserSketch.bucket_start >= day_from,
+            ActivityUserSketch.bucket_start < day_to
+        )
+    ):
+        sketches[day_start(_as_utc(bucket_value))].merge(HyperLogLog(registers=registers))
+    if sketches:
+        db.execute(insert(ActivityUserSketch.__table__), [
+            {"granularity": GRANULARITY_DAY, "bucket_start": bucket_value, "registers": sketch.to_bytes()}
+            for bucket_value, sketch in sketches.items()
+        ])
+
+    return len(counts)
+
+
+def refresh_rollups(db: Session, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Один проход пересчета агрегатов от отметки watermark до текущего часа.
+    Возвращает caught_up=False, если журнал обработан не до конца
+    (первичное заполнение идет порциями по MAX_DAYS_PER_RUN дней).
+    """
+    now = now or datetime.now(timezone.utc)
+    if not _try_lock(db):
+        db.rollback()
+        return {"skipped": True, "caught_up": True}
+
+    state = db.get(ActivityRollupState, STATE_NAME)
+    if state is None:
+        state = ActivityRollupState(name=STATE_NAME)
+        db.add(state)
+
+    current_hour = hour_start(now)
+    hourly_cutoff = now - timedelta(days=settings.ACTIVITY_ROLLUP_HOURLY_RETENTION_DAYS)
+
+    if state.watermark is None:
+        oldest = _as_utc(db.execute(select(func.min(ActivityLog.created_at))).scalar())
+        backfill_from = day_start(now - timedelta(days=settings.ACTIVITY_ROLLUP_BACKFILL_DAYS))
+        start = max(day_start(oldest), backfill_from) if oldest else current_hour
+    else:
+        start = _as_utc(state.watermark) - timedelta(hours=settings.ACTIVITY_ROLLUP_RECOMPUTE_HOURS)
+    if day_start(start) < hourly_cutoff:
+        # Часть почасовых агрегатов первого дня уже удалена, а дневной агрегат
+        # собирается из них целиком - пересчитываем этот день по журналу с начала
+        start = day_start(start)
+
+    end = min(current_hour + timedelta(hours=1), start + timedelta(days=MAX_DAYS_PER_RUN))
+    hour_rows = _rebuild_hours(db, start, end)
+    day_rows = _rebuild_days(db, start, end)
+
+    caught_up = end > current_hour
+    state.watermark = min(end, current_hour)
+    state.covered_until = now if caught_up else end
+    state.refreshed_at = now
+
+    # Почасовые агрегаты нужны только для пересборки последних дней
+    db.execute(delete(ActivityRollup).where(
+        ActivityRollup.granularity == GRANULARITY_HOUR,
+        ActivityRollup.bucket_start < hourly_cutoff
+    ))
+    db.execute(delete(ActivityUserSketch).where(
+        ActivityUserSketch.granularity == GRANULARITY_HOUR,
+        ActivityUserSketch.bucket_start < hourly_cutoff
+    ))
+    db.commit()
+
+    return {
+        "skipped": False,
+        "caught_up": caught_up,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "hour_rows": hour_rows,
+        "day_rows": day_rows,
+    }
+
+
+def mark_rollups_stale(connection, since: datetime) -> None:
+    """Сдвигает watermark назад, чтобы пересчитать агрегаты с момента since"""
+    connection.execute(
+        update(ActivityRollupState.__table__)
+        .where(ActivityRollupState.name == STATE_NAME, ActivityRollupState.watermark > since)
+        .values(watermark=since)
+    )
+
+
+def get_rollup_stats(db: Session, days: int, now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+    """
+    Статистика за последние дни из дневных агрегатов.
+    Возвращает None, если агрегаты еще ни разу не строились.
+    """
+    state = db.get(ActivityRollupState, STATE_NAME)
+    if state is None or state.covered_until is None:
+        return None
+
+    now = now or datetime.now(timezone.utc)
+    period_start = day_start(now - timedelta(days=days))
+    in_period = and_(
+        ActivityRollup.granularity == GRANULARITY_DAY,
+        ActivityRollup.bucket_start >= period_start
+    )
+    total_count = func.sum(ActivityRollup.count).label("count")
+
+    action_counts = db.execute(
+        select(ActivityRollup.key, total_count)
+        .where(in_period, ActivityRollup.dimension == "action")
+        .group_by(ActivityRollup.key)
+        .order_by(desc("count"))
+    ).all()
+
+    top_users = db.execute(
+        select(ActivityRollup.key, total_count)
+        .where(in_period, ActivityRollup.dimension == "user")
+        .group_by(ActivityRollup.key)
+        .order_by(desc("count"))
+        .limit(10)
+    ).all()
+    user_ids = [int(key) for key, _ in top_users]
+    users = {
+        user.id: user
+        for user in db.execute(
+            select(User.id, User.first_name, User.last_name, User.email).where(User.id.in_(user_ids))
+        )
+    } if user_ids else {}
+
+    unique_users = HyperLogLog()
+    for (registers,) in db.execute(
+        select(ActivityUserSketch.registers).where(
+            ActivityUserSketch.granularity == GRANULARITY_DAY,
+            ActivityUserSketch.bucket_start >= period_start
+        )
+    ):
+        unique_users.merge(HyperLogLog(registers=registers))
+
+    covered_until = _as_utc(state.covered_until)
+    top_users_response = []
+    for key, count in top_users:
+        user = users.get(int(key))
+        top_users_response.append({
+            "user_id": int(key),
+            "full_name": f"{user.last_name} {user.first_name}" if user and user.first_name and user.last_name else "Неизвестно",
+            "email": user.email if user else None,
+            "actions_count": int(count),
+        })
+
+    return {
+        "period_days": days,
+        "period_start": period_start.isoformat(),
+        "total_actions": int(sum(count for _, count in action_counts)),
+        "unique_users": unique_users.count(),
+        "top_actions": [{"action": action, "count": int(count)} for action, count in action_counts[:10]],
+        "top_users": top_users_response,
+        "freshness": {
+            "source": "rollups",
+            "covered_until": covered_until.isoformat(),
+            "refreshed_at": _as_utc(state.refreshed_at).isoformat() if state.refreshed_at else None,
+            "lag_seconds": max(0, int((now - covered_until).total_seconds())),
+        },
+    }
+
+
+class ActivityRollupJob:
+    """Фоновый пересчет агрегатов журнала активности в каждом воркере"""
+
+    def __init__(self, interval_seconds: int, enabled: bool = True):
+        self.enabled = enabled
+        self.interval = max(1, interval_seconds)
+        self._task: Optional[asyncio.Task] = None
+
+        self.runs = 0
+        self.skipped = 0
+        self.errors = 0
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.last_run_at: Optional[float] = None
+        self.last_duration_ms: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if not self.enabled or self.running:
+            return
+        self._task = asyncio.create_task(self._run(), name="activity-rollups")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                result = await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Ошибка пересчета агрегатов журнала активности: {e}")
+                result = None
+            # Первичное заполнение продолжается без паузы
+            if result is None or result.get("caught_up", True):
+                await asyncio.sleep(self.interval)
+
+    def run_once(self) -> Dict[str, Any]:
+        from ..database import SessionLocal
+
+        started_at = time.perf_counter()
+        db = SessionLocal()
+        try:
+            result = refresh_rollups(db)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        self.runs += 1
+        if result.get("skipped"):
+            self.skipped += 1
+        self.last_run = result
+        self.last_run_at = time.time()
+        self.last_duration_ms = round((time.perf_counter() - started_at) * 1000, 1)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "last_run": self.last_run,
+            "seconds_since_run": round(time.time() - self.last_run_at, 1) if self.last_run_at else None,
+            "last_duration_ms": self.last_duration_ms,
+        }
+
+
+activity_rollup_job = ActivityRollupJob(
+    interval_seconds=settings.ACTIVITY_ROLLUP_INTERVAL_SECONDS,
+    enabled=settings.ACTIVITY_ROLLUP_ENABLED,
+)
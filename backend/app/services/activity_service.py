@@ -1,16 +1,25 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_, or_
-from fastapi import Request
-from typing import Optional, Dict, Any, List
-from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, and_, or_, select, func, tuple_
+from fastapi import Request, HTTPException
+from typing import Optional, Dict, Any, List, Union
+from datetime import datetime, timezone
 import math
 
 from ..models.activity_log import ActivityLog, ActionType
 from ..models.user import User
-from ..schemas.activity_log import ActivityLogCreate, ActivityLogFilter, ActivityLogResponse, ActivityLogListResponse
+from ..schemas.activity_log import ActivityLogCreate, ActivityLogFilter, ActivityLogResponse, ActivityLogListResponse, TotalMode
+from ..core.config import settings
+from ..utils.pagination import encode_keyset_cursor, decode_keyset_cursor
+from ..utils.query_estimate import estimate_rows
+from .activity_buffer import activity_log_buffer
+from .activity_rollups import get_rollup_stats
+from .activity_records import prepare_record
 
 class ActivityService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Optional[Union[Session, AsyncSession]] = None):
+        # Методы с суффиксом _async работают с AsyncSession, остальные - с Session.
+        # Без сессии доступна только отложенная запись (log_activity(defer=True))
         self.db = db
     
     def log_activity(
@@ -23,28 +32,63 @@ class ActivityService:
         details: Optional[Dict[str, Any]] = None,
         ip_address: Optional[str] = None,
         user_agent: Optional[str] = None,
-        request: Optional[Request] = None
-    ) -> ActivityLog:
+        request: Optional[Request] = None,
+        defer: bool = False,
+        commit: bool = True
+    ) -> Optional[ActivityLog]:
         """
-        Записывает действие в журнал активности
+        Записывает действие в журнал активности.
+        
+        При defer=True запись ставится в буфер и сохраняется пакетом в фоне,
+        не открывая транзакцию в текущем запросе (возвращается None).
+        При commit=False запись добавляется в сессию и сохраняется вместе
+        с изменениями вызывающего кода - в его транзакции.
         """
         # Если передан request объект, извлекаем IP и User-Agent
         if request:
             ip_address = ip_address or self._get_client_ip(request)
             user_agent = user_agent or request.headers.get("User-Agent")
         
-        activity_log = ActivityLog(
-            user_id=user_id,
-            action=action,
-            resource_type=resource_type,
-            resource_id=str(resource_id) if resource_id else None,
-            description=description,
-            details=details,
-            ip_address=ip_address,
-            user_agent=user_agent
-        )
+        record = {
+            "user_id": user_id,
+            "action": action,
+            "resource_type": resource_type,
+            "resource_id": str(resource_id) if resource_id else None,
+            "description": description,
+            "details": details,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "created_at": datetime.now(timezone.utc)
+        }
+        
+        if defer and activity_log_buffer.running:
+            # Справочник User-Agent и колонки запроса заполняются при пакетной записи
+            activity_log_buffer.enqueue(record)
+            return None
+        
+        if self.db is None:
+            # Буфер не запущен (скрипты, тесты) - пишем сразу в отдельной сессии
+            from ..database import SessionLocal
+            db = SessionLocal()
+            try:
+                return ActivityService(db).log_activity(
+                    action=action,
+                    description=description,
+                    user_id=user_id,
+                    resource_type=resource_type,
+                    resource_id=resource_id,
+                    details=details,
+                    ip_address=ip_address,
+                    user_agent=user_agent
+                )
+            finally:
+                db.close()
+        
+        activity_log = ActivityLog(**prepare_record(self.db.connection(), record))
         
         self.db.add(activity_log)
+        if not commit:
+            return activity_log
         self.db.commit()
         self.db.refresh(activity_log)
         
@@ -52,75 +96,132 @@ class ActivityService:
     
     def get_activity_logs(self, filters: ActivityLogFilter) -> ActivityLogListResponse:
         """
-        Получает журнал активности с фильтрацией и пагинацией
-        """
-        query = self.db.query(ActivityLog).join(User, ActivityLog.user_id == User.id, isouter=True)
-        
-        # Применяем фильтры
-        if filters.user_id:
-            query = query.filter(ActivityLog.user_id == filters.user_id)
+        Получает журнал активности с фильтрацией и пагинацией.
         
-        if filters.action:
-            query = query.filter(ActivityLog.action == filters.action)
-        
-        if filters.resource_type:
-            query = query.filter(ActivityLog.resource_type == filters.resource_type)
-        
-        if filters.resource_id:
-            query = query.filter(ActivityLog.resource_id == filters.resource_id)
+        Два режима: keyset по (created_at, id) с курсором next_cursor - для
+        любой глубины, и постраничный - только в пределах
+        ACTIVITY_LOG_MAX_PAGE_OFFSET записей. Общее количество считается
+        по filters.total_mode: точно, оценкой планировщика, до порога или никак.
+        """
+        conditions = self.filter_conditions(filters)
         
-        if filters.start_date:
-            query = query.filter(ActivityLog.created_at >= filters.start_date)
+        query = (
+            select(ActivityLog)
+            .where(*conditions)
+            .order_by(desc(ActivityLog.created_at), desc(ActivityLog.id))
+        )
         
-        if filters.end_date:
-            query = query.filter(ActivityLog.created_at <= filters.end_date)
+        if filters.cursor:
+            try:
+                cursor_created_at, cursor_id = decode_keyset_cursor(filters.cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            query = query.where(
+                tuple_(ActivityLog.created_at, ActivityLog.id) < tuple_(cursor_created_at, cursor_id)
+            )
+            page = None
+        else:
+            offset = (filters.page - 1) * filters.size
+            if offset + filters.size > settings.ACTIVITY_LOG_MAX_PAGE_OFFSET:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Постраничный просмотр доступен для первых {settings.ACTIVITY_LOG_MAX_PAGE_OFFSET} записей, "
+                           f"используйте cursor"
+                )
+            query = query.offset(offset)
+            page = filters.page
         
-        # Подсчитываем общее количество записей
-        total = query.count()
+        # Лишняя запись показывает, есть ли следующая страница
+        activity_logs = self.db.execute(query.limit(filters.size + 1)).scalars().all()
+        has_more = len(activity_logs) > filters.size
+        activity_logs = activity_logs[:filters.size]
         
-        # Применяем пагинацию и сортировку
-        query = query.order_by(desc(ActivityLog.created_at))
-        offset = (filters.page - 1) * filters.size
-        query = query.offset(offset).limit(filters.size)
+        next_cursor = None
+        if has_more and activity_logs:
+            last = activity_logs[-1]
+            next_cursor = encode_keyset_cursor(last.created_at, last.id)
         
-        activity_logs = query.all()
+        # Имена пользователей - одним запросом на страницу
+        user_ids = {log.user_id for log in activity_logs if log.user_id}
+        users = {
+            user.id: user
+            for user in self.db.execute(
+                select(User.id, User.first_name, User.last_name, User.middle_name, User.email)
+                .where(User.id.in_(user_ids))
+            )
+        } if user_ids else {}
         
-        # Формируем ответ с дополнительной информацией о пользователях
         items = []
         for log in activity_logs:
-            log_dict = {
-                "id": log.id,
-                "user_id": log.user_id,
-                "action": log.action,
-                "resource_type": log.resource_type,
-                "resource_id": log.resource_id,
-                "description": log.description,
-                "details": log.details,
-                "ip_address": log.ip_address,
-                "user_agent": log.user_agent,
-                "created_at": log.created_at,
-                "user_full_name": None,
-                "user_email": None
-            }
-            
-            if log.user:
-                log_dict["user_full_name"] = f"{log.user.last_name} {log.user.first_name}"
-                if log.user.middle_name:
-                    log_dict["user_full_name"] += f" {log.user.middle_name}"
-                log_dict["user_email"] = log.user.email
-            
-            items.append(ActivityLogResponse(**log_dict))
-        
-        pages = math.ceil(total / filters.size)
+            response = self._to_response(log)
+            user = users.get(log.user_id)
+            if user:
+                response.user_full_name = f"{user.last_name} {user.first_name}"
+                if user.middle_name:
+                    response.user_full_name += f" {user.middle_name}"
+                response.user_email = user.email
+            items.append(response)
+        
+        total, total_mode, total_capped = self._count_activity_logs(conditions, filters.total_mode)
         
         return ActivityLogListResponse(
             items=items,
             total=total,
-            page=filters.page,
+            total_mode=total_mode,
+            total_capped=total_capped,
+            page=page,
             size=filters.size,
-            pages=pages
+            pages=math.ceil(total / filters.size) if total is not None else None,
+            next_cursor=next_cursor
         )
     
+    @staticmethod
+    def filter_conditions(filters: ActivityLogFilter) -> list:
+        """Условия WHERE для фильтров журнала (общие для просмотра и выгрузки)"""
+        conditions = []
+        if filters.user_id:
+            conditions.append(ActivityLog.user_id == filters.user_id)
+        if filters.action:
+            conditions.append(ActivityLog.action == filters.action)
+        if filters.resource_type:
+            conditions.append(ActivityLog.resource_type == filters.resource_type)
+        if filters.resource_id:
+            conditions.append(ActivityLog.resource_id == filters.resource_id)
+        if filters.start_date:
+            conditions.append(ActivityLog.created_at >= filters.start_date)
+        if filters.end_date:
+            conditions.append(ActivityLog.created_at <= filters.end_date)
+        if filters.status_code:
+            conditions.append(ActivityLog.status_code == filters.status_code)
+        if filters.min_duration_ms is not None:
+            conditions.append(ActivityLog.duration_ms >= filters.min_duration_ms)
+        return conditions
+    
+    def _count_activity_logs(self, conditions: list, mode: TotalMode):
+        """Возвращает (total, фактический режим, total - нижняя граница)"""
+        if mode == TotalMode.NONE:
+            return None, mode, False
+        
+        if mode == TotalMode.EXACT:
+            total = self.db.execute(
+                select(func.count()).select_from(ActivityLog).where(*conditions)
+            ).scalar()
+            return total, mode, False
+        
+        if mode == TotalMode.ESTIMATE:
+            estimate = estimate_rows(self.db, select(ActivityLog.id).where(*conditions))
+            if estimate is not None:
+                return estimate, mode, False
+            # Не PostgreSQL - считаем до порога
+            mode = TotalMode.CAPPED
+        
+        cap = settings.ACTIVITY_LOG_COUNT_CAP
+        limited = select(ActivityLog.id).where(*conditions).limit(cap + 1).subquery()
+        total = self.db.execute(select(func.count()).select_from(limited)).scalar()
+        if total > cap:
+            return cap, mode, True
+        return total, mode, False
+    
     def get_user_activities(self, user_id: int, limit: int = 100) -> List[ActivityLogResponse]:
         """
         Получает последние действия конкретного пользователя
@@ -130,26 +231,62 @@ class ActivityService:
         
         activity_logs = query.all()
         
-        items = []
-        for log in activity_logs:
-            items.append(ActivityLogResponse(
-                id=log.id,
-                user_id=log.user_id,
-                action=log.action,
-                resource_type=log.resource_type,
-                resource_id=log.resource_id,
-                description=log.description,
-                details=log.details,
-                ip_address=log.ip_address,
-                user_agent=log.user_agent,
-                created_at=log.created_at
-            ))
-        
-        return items
+        return [self._to_response(log) for log in activity_logs]
+    
+    async def get_user_activities_async(self, user_id: int, limit: int = 100) -> List[ActivityLogResponse]:
+        """
+        Получает последние действия конкретного пользователя (асинхронная сессия)
+        """
+        result = await self.db.execute(
+            select(ActivityLog)
+            .where(ActivityLog.user_id == user_id)
+            .order_by(desc(ActivityLog.created_at))
+            .limit(limit)
+        )
+        
+        return [self._to_response(log) for log in result.scalars().all()]
+    
+    @staticmethod
+    def _to_response(log: ActivityLog) -> ActivityLogResponse:
+        return ActivityLogResponse(
+            id=log.id,
+            user_id=log.user_id,
+            action=log.action,
+            resource_type=log.resource_type,
+            resource_id=log.resource_id,
+            description=log.description,
+            details=log.details,
+            ip_address=log.ip_address,
+            user_agent=log.user_agent,
+            method=log.method,
+            status_code=log.status_code,
+            duration_ms=log.duration_ms,
+            created_at=log.created_at
+        )
     
     def get_activity_stats(self, days: int = 30) -> Dict[str, Any]:
         """
-        Получает статистику активности за последние дни
+        Получает статистику активности за последние дни.
+        
+        Читает предварительные агрегаты (см. activity_rollups); по журналу
+        считает только до первого построения агрегатов.
+        """
+        stats = get_rollup_stats(self.db, days)
+        if stats is not None:
+            return stats
+        
+        stats = self._get_activity_stats_raw(days)
+        stats["freshness"] = {
+            "source": "raw",
+            "covered_until": datetime.now(timezone.utc).isoformat(),
+            "refreshed_at": None,
+            "lag_seconds": 0
+        }
+        return stats
+    
+    def _get_activity_stats_raw(self, days: int) -> Dict[str, Any]:
+        """
+        Статистика активности напрямую по журналу
         """
         from datetime import datetime, timedelta
         
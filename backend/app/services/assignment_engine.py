@@ -0,0 +1,165 @@
+"""
+Автоназначение исполнителей заявок с учетом нагрузки (routing_type
+auto_assign и round_robin).
+
+В памяти процесса хранятся три компактные карты:
+    user_id -> число открытых заявок (submitted/in_review/approved с исполнителем);
+    user_id -> доля ставки (сумма workload_percentage активных назначений, до 100);
+    template_id -> позиция курсора ротации.
+
+Карты заполняются при старте одним агрегатным запросом по частичному индексу
+ix_requests_open_assignee и перечитываются не реже чем раз в
+ASSIGNMENT_REBUILD_SECONDS - так учитываются изменения, сделанные другими
+воркерами или в обход RequestTransitionService. Между перестроениями счетчики
+поддерживаются переходами заявок после commit.
+
+Выбирается кандидат с наименьшей загрузкой (открытые заявки / доля ставки);
+при равной загрузке - следующий по курсору ротации шаблона. Кандидаты с
+нулевой ставкой получают заявки, только если других нет.
+"""
+
+import logging
+import threading
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models import Request, RequestStatus, UserDepartmentAssignment
+
+logger = logging.getLogger(__name__)
+
+# Статусы, в которых заявка занимает исполнителя
+OPEN_STATUSES = (
+    RequestStatus.SUBMITTED.value,
+    RequestStatus.IN_REVIEW.value,
+    RequestStatus.APPROVED.value,
+)
+# Доля ставки пользователя без назначений в подразделения
+FULL_CAPACITY = 100
+
+
+class AssignmentEngine:
+    def __init__(self, rebuild_seconds: float):
+        self.rebuild_seconds = rebuild_seconds
+        self._open_counts: Dict[int, int] = {}
+        self._capacities: Dict[int, int] = {}
+        self._cursors: Dict[int, int] = {}
+        self._built_at: float = 0.0
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+
+        self.rebuilds = 0
+        self.rebuild_errors = 0
+        self.picks = 0
+
+    def rebuild(self, db: Optional[Session] = None) -> None:
+        """Перечитывает открытые заявки по исполнителям и доли ставок из БД"""
+        from ..database import SessionLocal
+
+        if not self._rebuild_lock.acquire(blocking=False):
+            # Карты уже перестраивает другой поток - используем текущие
+            return
+
+        own_session = db is None
+        if own_session:
+            db = SessionLocal()
+        try:
+            open_counts = dict(db.execute(
+                select(Request.assignee_id, func.count())
+                .where(Request.status.in_(OPEN_STATUSES), Request.assignee_id.isnot(None))
+                .group_by(Request.assignee_id)
+            ).all())
+
+            today = date.today()
+            capacities = {
+                user_id: min(int(total or 0), FULL_CAPACITY)
+                for user_id, total in db.execute(
+                    select(UserDepartmentAssignment.user_id, func.sum(UserDepartmentAssignment.workload_percentage))
+                    .where(
+                        UserDepartmentAssignment.assignment_date <= today,
+                        or_(UserDepartmentAssignment.end_date.is_(None), UserDepartmentAssignment.end_date >= today),
+                    )
+                    .group_by(UserDepartmentAssignment.user_id)
+                ).all()
+            }
+
+            with self._lock:
+                self._open_counts = open_counts
+                self._capacities = capacities
+            self.rebuilds += 1
+        except Exception as e:
+            self.rebuild_errors += 1
+            logger.error(f"Ошибка перестроения нагрузки исполнителей: {e}")
+        finally:
+            # Даже при ошибке не повторяем запрос на каждом назначении
+            self._built_at = time.monotonic()
+            if own_session:
+                db.close()
+            self._rebuild_lock.release()
+
+    def pick(self, template_id: int, candidate_ids: Sequence[int]) -> Optional[int]:
+        """
+        Исполнитель для новой заявки шаблона из списка кандидатов.
+        Счетчик выбранного увеличивается только после commit (см. track).
+        """
+        candidates: List[int] = list(dict.fromkeys(candidate_ids))
+        if not candidates:
+            return None
+        if time.monotonic() - self._built_at >= self.rebuild_seconds:
+            self.rebuild()
+
+        with self._lock:
+            available = [user_id for user_id in candidates if self._capacity(user_id) > 0] or candidates
+            start = self._cursors.get(template_id, 0) % len(available)
+
+            chosen_index, best_load = start, None
+            for offset in range(len(available)):
+                index = (start + offset) % len(available)
+                user_id = available[index]
+                load = self._open_counts.get(user_id, 0) / max(self._capacity(user_id), 1)
+                if best_load is None or load < best_load:
+                    chosen_index, best_load = index, load
+
+            self._cursors[template_id] = chosen_index + 1
+            self.picks += 1
+            return available[chosen_index]
+
+    def track(self, old_assignee_id: Optional[int], old_status: str,
+              new_assignee_id: Optional[int], new_status: str) -> None:
+        """Учитывает зафиксированный переход заявки в счетчиках открытых заявок"""
+        was_open = old_assignee_id is not None and old_status in OPEN_STATUSES
+        is_open = new_assignee_id is not None and new_status in OPEN_STATUSES
+        if was_open == is_open and old_assignee_id == new_assignee_id:
+            return
+        with self._lock:
+            if was_open:
+                remaining = self._open_counts.get(old_assignee_id, 0) - 1
+                if remaining > 0:
+                    self._open_counts[old_assignee_id] = remaining
+                else:
+                    self._open_counts.pop(old_assignee_id, None)
+            if is_open:
+                self._open_counts[new_assignee_id] = self._open_counts.get(new_assignee_id, 0) + 1
+
+    def _capacity(self, user_id: int) -> int:
+        return self._capacities.get(user_id, FULL_CAPACITY)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tracked_assignees": len(self._open_counts),
+            "open_requests": sum(self._open_counts.values()),
+            "reduced_capacity_users": sum(1 for value in self._capacities.values() if value < FULL_CAPACITY),
+            "templates_in_rotation": len(self._cursors),
+            "rebuild_seconds": self.rebuild_seconds,
+            "seconds_since_rebuild": round(time.monotonic() - self._built_at, 1) if self._built_at else None,
+            "rebuilds": self.rebuilds,
+            "rebuild_errors": self.rebuild_errors,
+            "picks": self.picks,
+        }
+
+
+assignment_engine = AssignmentEngine(rebuild_seconds=settings.ASSIGNMENT_REBUILD_SECONDS)
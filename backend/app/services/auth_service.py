@@ -5,14 +5,12 @@ import string
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
-from fastapi import HTTPException, Depends, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import HTTPException, status
 from ..models.user import User, EmailVerification
 from ..models.user_profile import UserProfile
 from ..schemas.user import UserRegistration
 from ..core.config import settings
-
-security = HTTPBearer()
+from .password_hasher import password_hash_pool
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -22,6 +20,14 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password, hashed_password):
+    """Проверка пароля в пуле bcrypt, не блокируя event loop"""
+    return await password_hash_pool.verify(plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    """Хеширование пароля в пуле bcrypt, не блокируя event loop"""
+    return await password_hash_pool.hash(password)
+
 def generate_verification_code():
     return ''.join(random.choices(string.digits, k=6))
 
@@ -35,15 +41,42 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str):
+def build_access_token_claims(user: User) -> dict:
+    """
+    Формирует полезную нагрузку токена доступа.
+
+    При включенном JWT_SELF_CONTAINED_CLAIMS в токен добавляются id, роли,
+    ФИО и версия токенов пользователя, что позволяет авторизовать запрос без БД.
+    """
+    claims = {"sub": user.email}
+    if settings.JWT_SELF_CONTAINED_CLAIMS:
+        claims.update({
+            "uid": user.id,
+            "roles": user.roles or [],
+            "ver": user.token_version or 0,
+            "fn": user.first_name,
+            "ln": user.last_name,
+            "mn": user.middle_name,
+            "act": bool(user.is_active),
+            "vrf": bool(user.is_verified)
+        })
+    return claims
+
+def decode_access_token(token: str) -> Optional[dict]:
+    """Проверяет подпись и срок действия токена, возвращает полезную нагрузку"""
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
-        return email
     except JWTError:
         return None
+    if payload.get("sub") is None:
+        return None
+    return payload
+
+def verify_token(token: str):
+    payload = decode_access_token(token)
+    if payload is None:
+        return None
+    return payload["sub"]
 
 async def send_verification_code(email: str, db: Session):
     # Проверяем, не запрашивал ли пользователь код слишком часто (защита от спама)
@@ -126,7 +159,7 @@ def verify_code(email: str, code: str, db: Session, mark_as_used: bool = True):
             print(f"[DEBUG] Code: {v.code}, Expires: {v.expires_at}, Used: {v.is_used}, Current time: {datetime.utcnow()}")
         return False
 
-def authenticate_user(email: str, password: str, db: Session):
+async def authenticate_user(email: str, password: str, db: Session):
     print(f"[DEBUG] Authenticating user: {email}")
     user = db.query(User).filter(User.email == email).first()
     if not user:
@@ -134,14 +167,14 @@ def authenticate_user(email: str, password: str, db: Session):
         return False
     
     print(f"[DEBUG] User found, verifying password...")
-    if not verify_password(password, user.password_hash):
+    if not await verify_password_async(password, user.password_hash):
         print(f"[DEBUG] Password verification failed for: {email}")
         return False
     
     print(f"[DEBUG] Authentication successful for: {email}")
     return user
 
-def create_user(user_data: UserRegistration, db: Session):
+async def create_user(user_data: UserRegistration, db: Session):
     print(f"[DEBUG] Creating user with email: {user_data.email}")
     print(f"[DEBUG] Verification code: {user_data.verification_code}")
     
@@ -157,7 +190,7 @@ def create_user(user_data: UserRegistration, db: Session):
         return None
     
     # Создаем пользователя
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     
     # Преобразуем строковую дату в date объект
     try:
@@ -206,29 +239,3 @@ def create_user(user_data: UserRegistration, db: Session):
         # Не прерываем создание пользователя, профиль можно создать позже
     
     return db_user
-
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Зависимость для получения текущего пользователя"""
-    from ..database import get_db
-    db = next(get_db())
-    
-    token = credentials.credentials
-    
-    # Проверяем токен
-    email = verify_token(token)
-    if email is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    # Получаем пользователя из БД
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
-    return user 
\ No newline at end of file
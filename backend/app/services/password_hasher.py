@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from fastapi import HTTPException, status
+
+from ..core.config import settings
+from ..utils.latency import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHashPool:
+    """
+    Ограниченный пул потоков для bcrypt (хеширование и проверка паролей).
+
+    bcrypt освобождает GIL, поэтому вычисления в отдельных потоках не блокируют
+    event loop. Число одновременно ожидающих операций ограничено: при
+    переполнении очереди запрос сразу получает 503, а не ждет бесконечно.
+    """
+
+    def __init__(self, workers: int, queue_limit: int, latency_window: int = 1000):
+        self.workers = max(1, workers)
+        self.queue_limit = max(0, queue_limit)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._hash_latencies = LatencyWindow(latency_window)
+        self._wait_latencies = LatencyWindow(latency_window)
+
+    @property
+    def queue_depth(self) -> int:
+        """Операции, ожидающие свободного потока"""
+        return max(0, self._pending - self.workers)
+
+    async def _run(self, func: Callable, *args) -> Any:
+        with self._lock:
+            if self._pending >= self.workers + self.queue_limit:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Сервер перегружен, повторите попытку через несколько секунд",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+            self.submitted += 1
+
+        enqueued_at = time.perf_counter()
+
+        def task():
+            started_at = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                finished_at = time.perf_counter()
+                self._wait_latencies.add(started_at - enqueued_at)
+                self._hash_latencies.add(finished_at - started_at)
+
+        # Счетчик уменьшается по завершении самой задачи, а не ожидающего ее
+        # запроса: при отмене запроса (клиент отключился) bcrypt продолжает
+        # работать в потоке и должен учитываться в ограничении очереди
+        future = self._executor.submit(task)
+        future.add_done_callback(self._finished)
+        return await asyncio.wrap_future(future)
+
+    def _finished(self, future) -> None:
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        from .auth_service import get_password_hash
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        from .auth_service import verify_password
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": min(self._pending, self.workers),
+            "queue_depth": self.queue_depth,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "hash_latency_ms": self._hash_latencies.summary_ms(),
+            "queue_wait_ms": self._wait_latencies.summary_ms(),
+        }
+
+
+password_hash_pool = PasswordHashPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_limit=settings.PASSWORD_HASH_QUEUE_LIMIT,
+)
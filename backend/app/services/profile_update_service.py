@@ -25,8 +25,13 @@ logger = logging.getLogger(__name__)
 class ProfileUpdateService:
     """Сервис для обновления профиля пользователя."""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, commit: bool = True):
+        """
+        commit=False - изменения профиля остаются в транзакции вызывающего кода
+        (внутри SAVEPOINT: ошибка откатывает только их).
+        """
         self.db = db
+        self.commit = commit
     
     def update_profile_on_submit(self, request_id: int, form_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -117,11 +122,14 @@ class ProfileUpdateService:
         Returns:
             Dict с результатом обновления
         """
+        savepoint = None if self.commit else self.db.begin_nested()
         try:
             # Получаем пользователя
             user = self.db.query(User).filter(User.id == user_id).first()
             if not user:
                 logger.error(f"Пользователь {user_id} не найден")
+                if savepoint is not None:
+                    savepoint.commit()
                 return {"success": False, "error": "Пользователь не найден"}
             
             # Получаем или создаем профиль пользователя
@@ -252,7 +260,10 @@ class ProfileUpdateService:
                 profile.updated_at = datetime.utcnow()
             
             # Сохраняем изменения
-            self.db.commit()
+            if savepoint is not None:
+                savepoint.commit()
+            else:
+                self.db.commit()
             
             result = {
                 "success": True,
@@ -271,7 +282,10 @@ class ProfileUpdateService:
             
         except Exception as e:
             logger.error(f"Критическая ошибка при обновлении профиля: {str(e)}")
-            self.db.rollback()
+            if savepoint is not None:
+                savepoint.rollback()
+            else:
+                self.db.rollback()
             return {
                 "success": False,
                 "error": f"Критическая ошибка при обновлении профиля: {str(e)}"
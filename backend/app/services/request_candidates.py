@@ -0,0 +1,74 @@
+"""
+Возможные исполнители заявок (таблица request_candidates).
+
+Кандидаты определяются при отправке заявки - по правилам маршрутизации
+шаблона или его default_assignees. Выборка «Назначенные мне», проверки прав
+и WebSocket-рассылка читают таблицу по индексу (user_id, request_id);
+колонка requests.possible_assignees остается копией списка для ответов API.
+"""
+
+from typing import Iterable, List
+
+from sqlalchemy import delete, exists, insert, select
+from sqlalchemy.orm import Session
+
+from ..models import Request, RequestCandidate, User
+
+
+def candidate_clause(user_id: int):
+    """Условие «пользователь - возможный исполнитель заявки» для WHERE по requests"""
+    return exists().where(
+        RequestCandidate.request_id == Request.id,
+        RequestCandidate.user_id == user_id,
+    )
+
+
+def is_candidate_query(request_id: int, user_id: int):
+    """SELECT EXISTS(...) - для синхронной и асинхронной сессии"""
+    return select(
+        exists().where(
+            RequestCandidate.request_id == request_id,
+            RequestCandidate.user_id == user_id,
+        )
+    )
+
+
+def is_candidate(db: Session, request_id: int, user_id: int) -> bool:
+    return bool(db.execute(is_candidate_query(request_id, user_id)).scalar())
+
+
+def get_candidate_ids(db: Session, request_id: int) -> List[int]:
+    return list(db.execute(
+        select(RequestCandidate.user_id)
+        .where(RequestCandidate.request_id == request_id)
+        .order_by(RequestCandidate.user_id)
+    ).scalars())
+
+
+def set_candidates(db: Session, request: Request, user_ids: Iterable) -> List[int]:
+    """
+    Заменяет список возможных исполнителей заявки.
+    Несуществующие пользователи отбрасываются; изменения фиксирует вызывающий код.
+    """
+    requested = []
+    for user_id in user_ids or []:
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            continue
+        if user_id not in requested:
+            requested.append(user_id)
+
+    existing = set()
+    if requested:
+        existing = set(db.execute(select(User.id).where(User.id.in_(requested))).scalars())
+    candidate_ids = [user_id for user_id in requested if user_id in existing]
+
+    db.execute(delete(RequestCandidate).where(RequestCandidate.request_id == request.id))
+    if candidate_ids:
+        db.execute(
+            insert(RequestCandidate),
+            [{"request_id": request.id, "user_id": user_id} for user_id in candidate_ids]
+        )
+    request.possible_assignees = candidate_ids or None
+    return candidate_ids
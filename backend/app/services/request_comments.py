@@ -0,0 +1,91 @@
+"""
+Комментарии заявок.
+
+Карточка заявки содержит только число видимых комментариев и последние
+DETAIL_COMMENTS_LIMIT из них; остальная переписка догружается постранично
+через GET /api/requests/{id}/comments?after_id= по индексу
+(request_id, id). Внутренние комментарии (is_internal) отсекаются в SQL,
+если пользователь видит заявку только как ее автор.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from ..models import Request, RequestComment
+from .request_candidates import is_candidate
+
+# Последние комментарии в ответе с заявкой
+DETAIL_COMMENTS_LIMIT = 20
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def _conditions(request_id: int, include_internal: bool) -> list:
+    conditions = [RequestComment.request_id == request_id]
+    if not include_internal:
+        conditions.append(RequestComment.is_internal.isnot(True))
+    return conditions
+
+
+def comments_count_query(request_id: int, include_internal: bool):
+    return select(func.count()).select_from(RequestComment).where(*_conditions(request_id, include_internal))
+
+
+def latest_comments_query(request_id: int, include_internal: bool, limit: int = DETAIL_COMMENTS_LIMIT):
+    """Последние комментарии (от новых к старым) - для синхронной и асинхронной сессии"""
+    return (
+        select(RequestComment)
+        .options(joinedload(RequestComment.user))
+        .where(*_conditions(request_id, include_internal))
+        .order_by(RequestComment.id.desc())
+        .limit(limit)
+    )
+
+
+def comments_page_query(request_id: int, include_internal: bool, after_id: Optional[int], size: int):
+    """Комментарии после after_id по возрастанию; на один больше size - чтобы узнать, есть ли еще"""
+    query = (
+        select(RequestComment)
+        .options(joinedload(RequestComment.user))
+        .where(*_conditions(request_id, include_internal))
+        .order_by(RequestComment.id)
+        .limit(size + 1)
+    )
+    if after_id is not None:
+        query = query.where(RequestComment.id > after_id)
+    return query
+
+
+def comments_page(comments: List[RequestComment], size: int) -> Dict[str, Any]:
+    return {"items": comments[:size], "has_more": len(comments) > size}
+
+
+def attach_latest_comments(request: Request, count: int, latest: List[RequestComment]) -> None:
+    """Кладет в заявку число комментариев и последние из них в хронологическом порядке"""
+    # set_committed_value: связь не считается измененной и не загружается целиком
+    set_committed_value(request, "comments", list(reversed(latest)))
+    request.comments_count = count
+
+
+def sees_internal_comments(request: Request, user_id: int, is_admin: bool, is_possible_assignee: bool) -> bool:
+    """Внутренние комментарии скрыты от автора, если он не исполнитель, не кандидат и не админ"""
+    return (
+        is_admin
+        or request.author_id != user_id
+        or request.assignee_id == user_id
+        or is_possible_assignee
+    )
+
+
+def load_latest_comments(db: Session, request: Request, user_id: int, is_admin: bool) -> None:
+    """Синхронный вариант: проверка видимости и загрузка последних комментариев"""
+    include_internal = sees_internal_comments(
+        request, user_id, is_admin,
+        is_possible_assignee=request.author_id == user_id and is_candidate(db, request.id, user_id)
+    )
+    count = db.execute(comments_count_query(request.id, include_internal)).scalar()
+    latest = list(db.execute(latest_comments_query(request.id, include_internal)).scalars())
+    attach_latest_comments(request, count, latest)
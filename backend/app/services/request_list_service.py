@@ -0,0 +1,157 @@
+"""
+Списки заявок «Мои заявки» и «Назначенные мне».
+
+Выбираются только колонки, нужные карточке списка (без form_data, описания и
+комментариев), автор, исполнитель и шаблон подтягиваются JOIN-ами в том же
+запросе, а ответ собирается прямо из строк результата без ORM-объектов.
+Страницы выдаются по курсору (created_at, id); счетчики по статусам и срокам
+считаются одним агрегатным запросом.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException, status as http_status
+from sqlalchemy import desc, func, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from ..models import Request, RequestStatus, RequestTemplate, User
+from ..utils.pagination import decode_keyset_cursor, encode_keyset_cursor
+from .request_candidates import candidate_clause
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Порог «срочной» заявки - как на странице «Назначенные мне»
+URGENT_WINDOW = timedelta(days=2)
+
+Author = aliased(User, name="author")
+Assignee = aliased(User, name="assignee")
+
+
+def _user(user_id: Optional[int], email, first_name, last_name) -> Optional[Dict[str, Any]]:
+    if user_id is None:
+        return None
+    return {"id": user_id, "email": email, "first_name": first_name, "last_name": last_name}
+
+
+def _parse_status(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    try:
+        return RequestStatus(value).value
+    except ValueError:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=f"Недопустимый статус: {value}"
+        )
+
+
+async def _counts(db: AsyncSession, scope) -> Dict[str, Any]:
+    """Количество заявок по статусам и срокам - одним GROUP BY"""
+    now = datetime.now(timezone.utc)
+    rows = await db.execute(
+        select(
+            Request.status,
+            func.count(),
+            func.count().filter(Request.deadline <= now),
+            func.count().filter(Request.deadline > now, Request.deadline <= now + URGENT_WINDOW),
+        )
+        .where(scope)
+        .group_by(Request.status)
+    )
+    status_counts: Dict[str, int] = {}
+    overdue = urgent = 0
+    for status_value, total, overdue_count, urgent_count in rows:
+        status_counts[status_value] = total
+        overdue += overdue_count
+        urgent += urgent_count
+    return {"status_counts": status_counts, "deadline_counts": {"overdue": overdue, "urgent": urgent}}
+
+
+async def list_requests(
+    db: AsyncSession,
+    scope,
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    size: int = DEFAULT_PAGE_SIZE,
+) -> Dict[str, Any]:
+    """
+    Страница списка заявок.
+    scope - условие выборки (автор или исполнитель), status - фильтр по статусу.
+    """
+    status_value = _parse_status(status)
+
+    conditions = [scope]
+    if status_value:
+        conditions.append(Request.status == status_value)
+    if cursor:
+        try:
+            created_at, last_id = decode_keyset_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail=str(e))
+        conditions.append(tuple_(Request.created_at, Request.id) < tuple_(created_at, last_id))
+
+    query = (
+        select(
+            Request.id,
+            Request.title,
+            Request.template_id,
+            RequestTemplate.name.label("template_name"),
+            Request.author_id,
+            Request.assignee_id,
+            Request.possible_assignees,
+            Request.status,
+            Request.created_at,
+            Request.deadline,
+            Author.email.label("author_email"),
+            Author.first_name.label("author_first_name"),
+            Author.last_name.label("author_last_name"),
+            Assignee.email.label("assignee_email"),
+            Assignee.first_name.label("assignee_first_name"),
+            Assignee.last_name.label("assignee_last_name"),
+        )
+        .join(RequestTemplate, RequestTemplate.id == Request.template_id)
+        .join(Author, Author.id == Request.author_id)
+        .outerjoin(Assignee, Assignee.id == Request.assignee_id)
+        .where(*conditions)
+        .order_by(desc(Request.created_at), desc(Request.id))
+        .limit(size + 1)
+    )
+    rows = (await db.execute(query)).all()
+
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_keyset_cursor(rows[-1].created_at, rows[-1].id)
+
+    items: List[Dict[str, Any]] = [
+        {
+            "id": row.id,
+            "title": row.title,
+            "template_id": row.template_id,
+            "template_name": row.template_name,
+            "author_id": row.author_id,
+            "assignee_id": row.assignee_id,
+            "possible_assignees": row.possible_assignees,
+            "status": row.status,
+            "created_at": row.created_at,
+            "deadline": row.deadline,
+            "author": _user(row.author_id, row.author_email, row.author_first_name, row.author_last_name),
+            "assignee": _user(row.assignee_id, row.assignee_email, row.assignee_first_name, row.assignee_last_name),
+        }
+        for row in rows
+    ]
+
+    counts = await _counts(db, scope)
+    if status_value:
+        total = counts["status_counts"].get(status_value, 0)
+    else:
+        total = sum(counts["status_counts"].values())
+
+    return {"items": items, "total": total, "size": size, "next_cursor": next_cursor, **counts}
+
+
+def assigned_scope(user_id: int):
+    """Заявки, назначенные пользователю или ожидающие его среди возможных исполнителей"""
+    return or_(Request.assignee_id == user_id, candidate_clause(user_id))
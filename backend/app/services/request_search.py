@@ -0,0 +1,250 @@
+"""
+Полнотекстовый поиск заявок.
+
+Поиск идет по колонке requests.search_vector (конфигурация russian: заголовок,
+описание и строковые значения form_data), которую поддерживает триггер, по
+GIN-индексу ix_requests_search_vector. Один запрос возвращает страницу
+результатов по релевантности (ts_rank_cd) с подсветкой совпадений
+(ts_headline, маркеры <mark>...</mark> поверх HTML-экранированного текста), общее число найденных и фасеты по
+статусам и шаблонам. Фасеты считаются без учета фильтров по статусу и
+шаблону, чтобы по ним можно было переключаться.
+
+На SQLite (разработка) поиск упрощен: подстрока в заголовке и описании,
+без ранжирования и подсветки.
+"""
+
+import html
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException, status as http_status
+from sqlalchemy import func, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import Request, RequestStatus, RequestTemplate
+from .request_list_service import assigned_scope
+
+SEARCH_CONFIG = "russian"
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+# Дальше первых страниц по релевантности не листают
+MAX_PAGE = 50
+
+HEADLINE_TITLE_OPTIONS = "HighlightAll=true, StartSel=<mark>, StopSel=</mark>"
+HEADLINE_SNIPPET_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5"
+# Текст экранируется (& < >) до ts_headline: разметкой в ответе остаются только <mark>
+HTML_ESCAPE_OPEN = "replace(replace(replace("
+HTML_ESCAPE_CLOSE = ", '&', '&amp;'), '<', '&lt;'), '>', '&gt;')"
+
+SEARCH_SQL = """
+WITH tsq AS (
+    SELECT websearch_to_tsquery('{config}', :q) AS query
+),
+matched AS (
+    SELECT r.id, r.status, r.template_id, ts_rank_cd(r.search_vector, tsq.query) AS rank
+    FROM requests r, tsq
+    WHERE r.search_vector @@ tsq.query {scope}
+),
+facets AS (
+    SELECT coalesce(json_agg(json_build_object(
+        'facet', f.facet, 'status', f.status, 'template_id', f.template_id, 'count', f.count
+    )), '[]'::json) AS facets
+    FROM (
+        SELECT CASE WHEN grouping(status) = 0 THEN 'status' ELSE 'template' END AS facet,
+               status, template_id, count(*) AS count
+        FROM matched
+        GROUP BY GROUPING SETS ((status), (template_id))
+    ) f
+),
+filtered AS (
+    SELECT id, rank FROM matched WHERE true {filters}
+),
+page AS (
+    SELECT id, rank FROM filtered ORDER BY rank DESC, id DESC LIMIT :limit OFFSET :offset
+)
+SELECT
+    facets.facets,
+    (SELECT count(*) FROM filtered) AS total,
+    p.rank,
+    r.id, r.title, r.status, r.template_id, t.name AS template_name,
+    r.author_id, r.assignee_id, r.created_at, r.deadline,
+    ts_headline('{config}', {escape_open}r.title{escape_close}, tsq.query, '{title_options}') AS title_highlight,
+    ts_headline('{config}', {escape_open}concat_ws(' ', r.description, (
+        SELECT string_agg(v #>> '{{}}', ' ')
+        FROM jsonb_path_query(r.form_data::jsonb, 'strict $.** ? (@.type() == "string")') AS v
+    )){escape_close}, tsq.query, '{snippet_options}') AS snippet
+FROM facets
+CROSS JOIN tsq
+LEFT JOIN page p ON true
+LEFT JOIN requests r ON r.id = p.id
+LEFT JOIN request_templates t ON t.id = r.template_id
+ORDER BY p.rank DESC, p.id DESC
+"""
+
+
+def _parse_status(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    try:
+        return RequestStatus(value).value
+    except ValueError:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=f"Недопустимый статус: {value}"
+        )
+
+
+def _scope_sql(scope: Optional[str], is_admin: bool) -> str:
+    """Какие заявки видит пользователь: свои, назначенные ему или (админ) все"""
+    assigned = (
+        "r.assignee_id = :user_id OR EXISTS ("
+        "SELECT 1 FROM request_candidates c WHERE c.request_id = r.id AND c.user_id = :user_id)"
+    )
+    if scope == "my":
+        return "AND r.author_id = :user_id"
+    if scope == "assigned":
+        return f"AND ({assigned})"
+    if is_admin:
+        return ""
+    return f"AND (r.author_id = :user_id OR {assigned})"
+
+
+def _scope_clause(scope: Optional[str], is_admin: bool, user_id: int):
+    assigned = assigned_scope(user_id)
+    if scope == "my":
+        return Request.author_id == user_id
+    if scope == "assigned":
+        return assigned
+    if is_admin:
+        return None
+    return or_(Request.author_id == user_id, assigned)
+
+
+def _facets(rows) -> Dict[str, Dict[str, int]]:
+    result: Dict[str, Dict[str, int]] = {"status": {}, "template": {}}
+    for facet in rows or []:
+        if facet["facet"] == "status":
+            result["status"][facet["status"]] = facet["count"]
+        else:
+            result["template"][str(facet["template_id"])] = facet["count"]
+    return result
+
+
+async def search_requests(
+    db: AsyncSession,
+    q: str,
+    user_id: int,
+    is_admin: bool,
+    scope: Optional[str] = None,
+    status: Optional[str] = None,
+    template_id: Optional[int] = None,
+    page: int = 1,
+    size: int = DEFAULT_PAGE_SIZE,
+) -> Dict[str, Any]:
+    """Страница результатов поиска с подсветкой и фасетами"""
+    status_value = _parse_status(status)
+    q = q.strip()
+    if not q:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail="Пустой поисковый запрос"
+        )
+
+    if db.get_bind().dialect.name != "postgresql":
+        return await _search_fallback(db, q, user_id, is_admin, scope, status_value, template_id, page, size)
+
+    filters = []
+    params: Dict[str, Any] = {"q": q, "user_id": user_id, "limit": size, "offset": (page - 1) * size}
+    if status_value:
+        filters.append("AND status = :status")
+        params["status"] = status_value
+    if template_id is not None:
+        filters.append("AND template_id = :template_id")
+        params["template_id"] = template_id
+
+    sql = SEARCH_SQL.format(
+        config=SEARCH_CONFIG,
+        scope=_scope_sql(scope, is_admin),
+        filters=" ".join(filters),
+        title_options=HEADLINE_TITLE_OPTIONS,
+        snippet_options=HEADLINE_SNIPPET_OPTIONS,
+        escape_open=HTML_ESCAPE_OPEN,
+        escape_close=HTML_ESCAPE_CLOSE,
+    )
+    rows = (await db.execute(text(sql), params)).mappings().all()
+
+    first = rows[0] if rows else {}
+    items = [
+        {
+            "id": row["id"],
+            "title": row["title"],
+            "title_highlight": row["title_highlight"],
+            "snippet": row["snippet"],
+            "rank": float(row["rank"]),
+            "status": row["status"],
+            "template_id": row["template_id"],
+            "template_name": row["template_name"],
+            "author_id": row["author_id"],
+            "assignee_id": row["assignee_id"],
+            "created_at": row["created_at"],
+            "deadline": row["deadline"],
+        }
+        for row in rows if row["id"] is not None
+    ]
+    return {
+        "items": items,
+        "total": first.get("total") or 0,
+        "page": page,
+        "size": size,
+        "facets": _facets(first.get("facets")),
+    }
+
+
+async def _search_fallback(db, q, user_id, is_admin, scope, status_value, template_id, page, size) -> Dict[str, Any]:
+    pattern = f"%{q}%"
+    conditions = [or_(Request.title.ilike(pattern), Request.description.ilike(pattern))]
+    scope_clause = _scope_clause(scope, is_admin, user_id)
+    if scope_clause is not None:
+        conditions.append(scope_clause)
+
+    facets: Dict[str, Dict[str, int]] = {"status": {}, "template": {}}
+    for column, name in ((Request.status, "status"), (Request.template_id, "template")):
+        for value, count in await db.execute(select(column, func.count()).where(*conditions).group_by(column)):
+            facets[name][str(value)] = count
+
+    if status_value:
+        conditions.append(Request.status == status_value)
+    if template_id is not None:
+        conditions.append(Request.template_id == template_id)
+
+    total = (await db.execute(select(func.count()).select_from(Request).where(*conditions))).scalar()
+    rows = (await db.execute(
+        select(
+            Request.id, Request.title, Request.description, Request.status, Request.template_id,
+            RequestTemplate.name.label("template_name"), Request.author_id, Request.assignee_id,
+            Request.created_at, Request.deadline,
+        )
+        .join(RequestTemplate, RequestTemplate.id == Request.template_id)
+        .where(*conditions)
+        .order_by(Request.id.desc())
+        .limit(size)
+        .offset((page - 1) * size)
+    )).all()
+
+    items: List[Dict[str, Any]] = [
+        {
+            "id": row.id,
+            "title": row.title,
+            "title_highlight": html.escape(row.title, quote=False),
+            "snippet": html.escape((row.description or "")[:200], quote=False),
+            "rank": 0.0,
+            "status": row.status,
+            "template_id": row.template_id,
+            "template_name": row.template_name,
+            "author_id": row.author_id,
+            "assignee_id": row.assignee_id,
+            "created_at": row.created_at,
+            "deadline": row.deadline,
+        }
+        for row in rows
+    ]
+    return {"items": items, "total": total, "page": page, "size": size, "facets": facets}
@@ -0,0 +1,217 @@
+"""
+Переходы заявок между статусами: отправка, взятие в работу, завершение,
+отклонение, назначение исполнителя и редактирование.
+
+Заявка вместе с данными для ответа загружается один раз. Изменение делается
+одним UPDATE ... RETURNING, в WHERE которого проверяется исходный статус
+(и версия строки, если клиент ее передал): если заявку успели изменить,
+возвращается 409. Каждый переход увеличивает requests.version. Запись
+журнала активности добавляется в ту же транзакцию, а ответ собирается из
+уже загруженных объектов до commit - без повторного чтения заявки.
+User-Agent клиента заносится в справочник заранее, отдельной транзакцией:
+запись журнала берет его id из кэша и не добавляет запросов между UPDATE
+и commit.
+После commit смены исполнителя и статуса учитываются в счетчиках нагрузки
+assignment_engine.
+"""
+
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+from fastapi import HTTPException, Request as FastAPIRequest, status
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from ..dependencies import UserInfo
+from ..models import Request, RequestStatus, User
+from ..schemas import Request as RequestSchema
+from .activity_records import preload_user_agent_id
+from .activity_service import ActivityService
+from .assignment_engine import assignment_engine
+from .profile_update_service import ProfileUpdateService
+from .request_candidates import candidate_clause
+from .request_comments import load_latest_comments
+
+logger = logging.getLogger(__name__)
+
+
+# Сколько раз «взять следующую» пробует другую заявку после конфликта
+CLAIM_ATTEMPTS = 5
+# Колонки, возвращаемые UPDATE ... RETURNING (поисковый вектор ответу не нужен)
+RETURNING_COLUMNS = [column for column in Request.__table__.c if column.key != "search_vector"]
+
+
+class RequestTransitionService:
+    def __init__(self, db: Session, current_user: UserInfo, http_request: Optional[FastAPIRequest] = None):
+        self.db = db
+        self.current_user = current_user
+        self.http_request = http_request
+        if http_request is not None:
+            preload_user_agent_id(db.get_bind(), http_request.headers.get("User-Agent"))
+        self.is_admin = "admin" in (getattr(current_user, "roles", None) or [])
+        # (старый исполнитель, старый статус, новый исполнитель, новый статус) до commit
+        self._workload_changes = []
+
+    def load(self, request_id: int) -> Request:
+        """Заявка со всем, что попадает в ответ (автор, исполнитель, шаблон, последние комментарии, файлы)"""
+        request = self.db.execute(
+            select(Request).options(
+                joinedload(Request.author),
+                joinedload(Request.assignee),
+                joinedload(Request.template),
+                selectinload(Request.files),
+            ).where(Request.id == request_id)
+        ).scalars().first()
+
+        if not request:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Заявка не найдена"
+            )
+        load_latest_comments(self.db, request, self.current_user.id, self.is_admin)
+        return request
+
+    def apply(
+        self,
+        request: Request,
+        values: Dict[str, Any],
+        from_statuses: Optional[Iterable[str]] = None,
+        assignee: Optional[User] = None,
+        expected_version: Optional[int] = None,
+        keep_assignee: bool = False,
+    ) -> Request:
+        """
+        Записывает values одним UPDATE ... RETURNING и переносит результат в request.
+        from_statuses - статусы, из которых переход допустим, expected_version -
+        версия, которую видел клиент, keep_assignee - исполнитель не должен
+        смениться с момента загрузки (все условия проверяются атомарно).
+        """
+        if expected_version is not None and expected_version != request.version:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Заявка уже изменена другим пользователем, обновите страницу"
+            )
+
+        statement = update(Request.__table__).where(Request.id == request.id)
+        if from_statuses is not None:
+            statement = statement.where(Request.status.in_(list(from_statuses)))
+        if expected_version is not None:
+            statement = statement.where(Request.version == expected_version)
+        if keep_assignee:
+            statement = statement.where(
+                Request.assignee_id.is_(None) if request.assignee_id is None
+                else Request.assignee_id == request.assignee_id
+            )
+
+        row = self.db.execute(
+            statement.values(
+                **values,
+                updated_at=func.now(),
+                version=Request.__table__.c.version + 1
+            ).returning(*RETURNING_COLUMNS)
+        ).first()
+        if row is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Заявка уже изменена другим пользователем, обновите страницу"
+            )
+
+        old_state = (request.assignee_id, request.status)
+        # Значения из RETURNING становятся «сохраненными» - повторного UPDATE при commit не будет
+        for key, value in row._asdict().items():
+            set_committed_value(request, key, value)
+        if "assignee_id" in values:
+            if request.assignee_id is None:
+                assignee = None
+            elif assignee is None or assignee.id != request.assignee_id:
+                assignee = self.db.get(User, request.assignee_id)
+            set_committed_value(request, "assignee", assignee)
+        self._workload_changes.append((*old_state, request.assignee_id, request.status))
+        return request
+
+    def claim_next(self, template_id: Optional[int] = None) -> Optional[Request]:
+        """
+        Берет в работу самую старую свободную заявку, доступную пользователю.
+
+        Строка выбирается с FOR UPDATE SKIP LOCKED: параллельные сотрудники
+        не ждут друг друга и не получают одну и ту же заявку. None - очередь пуста.
+        """
+        query = (
+            select(Request.id)
+            .where(
+                Request.status == RequestStatus.IN_REVIEW.value,
+                Request.assignee_id.is_(None),
+                candidate_clause(self.current_user.id),
+            )
+            .order_by(Request.created_at, Request.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        if template_id is not None:
+            query = query.where(Request.template_id == template_id)
+
+        for _ in range(CLAIM_ATTEMPTS):
+            request_id = self.db.execute(query).scalar()
+            if request_id is None:
+                return None
+
+            # В PostgreSQL строка уже заблокирована и UPDATE пройдет; условие в WHERE
+            # страхует СУБД без SKIP LOCKED - там проигравший берет следующую заявку
+            request = self.load(request_id)
+            try:
+                request = self.apply(request, {
+                    "assignee_id": self.current_user.id,
+                    "status": RequestStatus.APPROVED.value,
+                }, from_statuses=[RequestStatus.IN_REVIEW.value])
+                break
+            except HTTPException as e:
+                if e.status_code != status.HTTP_409_CONFLICT:
+                    raise
+                self.db.expire(request)
+        else:
+            return None
+
+        self.audit(request, "request_take", f"Взял заявку в работу: {request.title}", {
+            "old_assignee": None,
+            "new_assignee": self.current_user.id,
+            "status": request.status,
+            "via": "claim_next",
+        })
+        return request
+
+    def update_profile(self, request: Request, trigger: str) -> None:
+        """Обновление профиля автора по полям шаблона - в той же транзакции"""
+        try:
+            profile_service = ProfileUpdateService(self.db, commit=False)
+            if trigger == "submit":
+                result = profile_service.update_profile_on_submit(request.id, request.form_data)
+            else:
+                result = profile_service.update_profile_on_approve(request.id)
+            if result.get('updated_fields'):
+                logger.debug("Обновлены поля профиля (%s): %s", trigger, result['updated_fields'])
+            if result.get('errors'):
+                logger.warning("Ошибки при обновлении профиля (%s): %s", trigger, result['errors'])
+        except Exception as e:
+            logger.error("Ошибка при обновлении профиля (%s): %s", trigger, e)
+
+    def audit(self, request: Request, action: str, description: str, details: Dict[str, Any]) -> None:
+        ActivityService(self.db).log_activity(
+            action=action,
+            description=description,
+            user_id=self.current_user.id,
+            resource_type="request",
+            resource_id=str(request.id),
+            details=details,
+            request=self.http_request,
+            commit=False
+        )
+
+    def finish(self, request: Request) -> RequestSchema:
+        """Собирает ответ из загруженных данных и фиксирует транзакцию"""
+        response = RequestSchema.model_validate(request)
+        self.db.commit()
+        for change in self._workload_changes:
+            assignment_engine.track(*change)
+        self._workload_changes.clear()
+        return response
@@ -0,0 +1,232 @@
+"""
+Правила условной маршрутизации шаблонов заявок (routing_rules).
+
+Правило - условие на поле формы и список ответственных:
+    {"field": "faculty", "value": "technical", "assignees": [1, 2]}
+    {"field": "faculty", "operator": "in", "value": "technical, economic", ...}
+    {"field": "group", "operator": "regex", "value": "^ИТ-\\d+", ...}
+    {"field": "course", "operator": "range", "value": "3..4", ...}
+Дополнительные условия в "conditions" ({"field", "operator", "value"})
+объединяются с основным через И. Срабатывает первое подходящее правило
+в порядке списка; сравнение строк без учета регистра.
+
+Правила шаблона компилируются в таблицу решений: опорное условие eq/in
+каждого правила раскладывается в словарь (поле, значение) -> номера правил,
+поэтому при отправке заявки проверяются только правила, чей ключ совпал со
+значением формы, и правила без eq/in (range/regex) с меньшими номерами.
+Остальные условия правила проверяются только после опорного. Таблица
+кэшируется по (id шаблона, updated_at) и сбрасывается при изменении шаблона.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..utils.ttl_cache import TTLCache
+
+OPERATORS = ("eq", "in", "regex", "range")
+# Чем меньше, тем раньше условие становится опорным (ключом таблицы решений)
+ANCHOR_PRIORITY = {"eq": 0, "in": 0, "range": 1, "regex": 2}
+# Скомпилированные таблицы меняются только вместе с шаблоном - TTL лишь страхует память
+ROUTING_CACHE_MAX_SIZE = 1024
+ROUTING_CACHE_TTL_SECONDS = 3600
+
+
+def normalize(value: Any) -> str:
+    return str(value).strip().lower()
+
+
+def _to_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(str(value).strip().replace(",", "."))
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_condition(condition: Dict[str, Any]) -> Tuple[str, str, Any]:
+    """
+    Разбирает условие в (поле, оператор, операнд).
+    ValueError - если условие записано неверно (используется и при валидации схемы).
+    """
+    field = str(condition.get("field") or "").strip()
+    if not field:
+        raise ValueError("Не указано поле условия")
+    operator = condition.get("operator") or "eq"
+    if operator not in OPERATORS:
+        raise ValueError(f"Неизвестный оператор условия: {operator}")
+    raw = condition.get("value")
+    raw = "" if raw is None else str(raw)
+
+    if operator == "eq":
+        return field, operator, normalize(raw)
+    if operator == "in":
+        values = frozenset(normalize(part) for part in raw.split(",") if part.strip())
+        if not values:
+            raise ValueError(f"Пустой список значений для поля {field}")
+        return field, operator, values
+    if operator == "regex":
+        try:
+            return field, operator, re.compile(raw, re.IGNORECASE)
+        except re.error as e:
+            raise ValueError(f"Неверное регулярное выражение для поля {field}: {e}")
+
+    # range: "min..max", любая граница может быть пустой
+    low, separator, high = raw.partition("..")
+    bounds = []
+    for bound in (low, high):
+        if not bound.strip():
+            bounds.append(None)
+            continue
+        number = _to_number(bound)
+        if number is None:
+            raise ValueError(f"Неверная граница диапазона для поля {field}: {bound}")
+        bounds.append(number)
+    if not separator or bounds == [None, None]:
+        raise ValueError(f"Диапазон для поля {field} записывается как min..max")
+    return field, operator, tuple(bounds)
+
+
+class FormValues:
+    """
+    Значения полей формы, разобранные для проверки условий: каждое поле
+    нормализуется и переводится в число не больше одного раза за отправку.
+    У множественного выбора проверяется каждый элемент.
+    """
+
+    def __init__(self, form_data: Optional[Dict[str, Any]]):
+        self.form_data = form_data or {}
+        self._raw: Dict[str, List[Any]] = {}
+        self._normalized: Dict[str, List[str]] = {}
+        self._numbers: Dict[str, List[float]] = {}
+
+    def raw(self, field: str) -> List[Any]:
+        values = self._raw.get(field)
+        if values is None:
+            value = self.form_data.get(field)
+            values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+            self._raw[field] = values
+        return values
+
+    def normalized(self, field: str) -> List[str]:
+        values = self._normalized.get(field)
+        if values is None:
+            values = self._normalized[field] = [normalize(value) for value in self.raw(field)]
+        return values
+
+    def numbers(self, field: str) -> List[float]:
+        values = self._numbers.get(field)
+        if values is None:
+            values = self._numbers[field] = [
+                number for number in (_to_number(value) for value in self.raw(field) if value is not None)
+                if number is not None
+            ]
+        return values
+
+    def matches(self, field: str, operator: str, operand: Any) -> bool:
+        if operator == "eq":
+            return operand in self.normalized(field)
+        if operator == "in":
+            return any(value in operand for value in self.normalized(field))
+        if operator == "regex":
+            return any(operand.search(str(value)) for value in self.raw(field) if value is not None)
+        low, high = operand
+        return any((low is None or number >= low) and (high is None or number <= high)
+                   for number in self.numbers(field))
+
+
+class RoutingTable:
+    """Скомпилированные правила маршрутизации одного шаблона"""
+
+    def __init__(self, rules: Optional[List[Dict[str, Any]]]):
+        # Для каждого правила: ответственные и условия помимо опорного
+        self.assignees: List[List[Any]] = []
+        self.checks: List[List[Tuple[str, str, Any]]] = []
+        # Опорные условия eq/in: (поле, значение) -> номера правил
+        self.index: Dict[Tuple[str, str], List[int]] = {}
+        self.index_fields: List[str] = []
+        # Правила без eq/in по возрастанию номера: (номер, опорное условие range/regex)
+        self.scan: List[Tuple[int, Tuple[str, str, Any]]] = []
+
+        for rule in rules or []:
+            try:
+                conditions = [parse_condition(rule)]
+                conditions += [parse_condition(extra) for extra in rule.get("conditions") or []]
+            except (AttributeError, ValueError):
+                # Испорченное правило не должно ломать маршрутизацию остальных
+                continue
+
+            number = len(self.assignees)
+            self.assignees.append(list(rule.get("assignees") or []))
+
+            # Опорным берется самое избирательное условие: eq/in, затем range, затем regex
+            anchor = min(conditions, key=lambda c: ANCHOR_PRIORITY[c[1]])
+            self.checks.append([c for c in conditions if c is not anchor])
+
+            field, operator, operand = anchor
+            if operator in ("eq", "in"):
+                for value in ([operand] if operator == "eq" else operand):
+                    self.index.setdefault((field, value), []).append(number)
+                if field not in self.index_fields:
+                    self.index_fields.append(field)
+            else:
+                self.scan.append((number, anchor))
+
+    def match(self, form_data: Dict[str, Any]) -> Optional[List[Any]]:
+        """Ответственные первого сработавшего правила или None"""
+        if not self.assignees:
+            return None
+        form = FormValues(form_data)
+
+        hits = set()
+        for field in self.index_fields:
+            for value in form.normalized(field):
+                hits.update(self.index.get((field, value), ()))
+        hits = sorted(hits)
+
+        # Слияние по номеру правила: правила из scan проверяются, только пока
+        # их номер меньше очередного попадания по индексу
+        scan, position = self.scan, 0
+        for number in hits + [len(self.assignees)]:
+            while position < len(scan) and scan[position][0] < number:
+                scan_number, anchor = scan[position]
+                position += 1
+                if form.matches(*anchor) and self._passes(form, scan_number):
+                    return self.assignees[scan_number]
+            if number < len(self.assignees) and self._passes(form, number):
+                return self.assignees[number]
+        return None
+
+    def _passes(self, form: FormValues, number: int) -> bool:
+        return all(form.matches(*check) for check in self.checks[number])
+
+    def __len__(self) -> int:
+        return len(self.assignees)
+
+
+routing_table_cache = TTLCache(max_size=ROUTING_CACHE_MAX_SIZE, ttl_seconds=ROUTING_CACHE_TTL_SECONDS)
+
+
+def get_routing_table(template) -> RoutingTable:
+    """Таблица решений шаблона из кэша; перекомпилируется, если шаблон изменен"""
+    key = (template.id, template.updated_at)
+    table = routing_table_cache.get(key)
+    if table is None:
+        table = RoutingTable(template.routing_rules)
+        routing_table_cache.set(key, table)
+    return table
+
+
+def invalidate_routing_table(template_id: int) -> None:
+    """Сбрасывает скомпилированные таблицы шаблона (после изменения или удаления)"""
+    routing_table_cache.delete_where(lambda key, _: key[0] == template_id)
+
+
+def apply_routing_rules(template, form_data) -> Optional[List[Any]]:
+    """
+    Применяет правила маршрутизации к данным формы
+    Возвращает список подходящих ответственных или None
+    """
+    if not template.routing_rules:
+        return None
+    return get_routing_table(template).match(form_data)
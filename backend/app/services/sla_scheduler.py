@@ -0,0 +1,380 @@
+"""
+Планировщик сроков заявок (SLA).
+
+Фоновая задача каждые SLA_SCAN_INTERVAL_SECONDS ищет заявки в работе
+(in_review/approved), у которых срок истекает в ближайшие SLA_DUE_SOON_HOURS
+часов или уже истек. Поиск идет по частичному индексу ix_requests_open_deadline
+пакетами по SLA_BATCH_SIZE заявок; по каждой заявке и уровню (due_soon,
+overdue) эскалация записывается в request_escalations один раз. Уведомления
+получают исполнитель (или возможные исполнители, если заявку еще не взяли),
+а по просроченным - еще и SLA_ESCALATION_USER_IDS: через WebSocket и Telegram.
+Заявки, просроченные дольше SLA_ESCALATION_MAX_AGE_HOURS (например, накопившиеся
+до включения планировщика), отмечаются эскалированными без уведомлений.
+В том же проходе пересчитываются счетчики request_sla_counters для дашборда.
+
+Проход выполняет только один воркер - тот, кто получил advisory-блокировку
+(остальные пропускают проход). WebSocket-уведомления доходят до пользователей,
+подключенных к этому воркеру; Telegram - всем, у кого он привязан.
+"""
+
+import asyncio
+import html
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, exists, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models import Request, RequestCandidate, RequestStatus, UserProfile
+from ..models.request_sla import (
+    ESCALATION_DUE_SOON, ESCALATION_OVERDUE, RequestEscalation, RequestSlaCounter
+)
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory-блокировки: проход выполняет только один воркер
+SLA_LOCK_KEY = 7316002
+# Статусы, в которых срок заявки контролируется (совпадает с условием индекса)
+SLA_STATUSES = (RequestStatus.IN_REVIEW.value, RequestStatus.APPROVED.value)
+REQUEST_URL = "https://my.melsu.ru/requests/{request_id}"
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _try_lock(db: Session) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return True
+    return bool(db.execute(select(func.pg_try_advisory_xact_lock(SLA_LOCK_KEY))).scalar())
+
+
+def _escalate(db: Session, level: str, upper: datetime, lower: Optional[datetime], limit: int) -> List[Dict[str, Any]]:
+    """Заявки со сроком в (lower, upper] без эскалации этого уровня - не больше limit"""
+    conditions = [
+        Request.status.in_(SLA_STATUSES),
+        Request.deadline <= upper,
+        ~exists().where(RequestEscalation.request_id == Request.id, RequestEscalation.level == level),
+    ]
+    if lower is not None:
+        conditions.append(Request.deadline > lower)
+
+    rows = db.execute(
+        select(Request.id, Request.title, Request.deadline, Request.assignee_id)
+        .where(*conditions)
+        .order_by(Request.deadline, Request.id)
+        .limit(limit)
+    ).all()
+    if not rows:
+        return []
+
+    # Незанятые заявки получают все возможные исполнители
+    candidates: Dict[int, List[int]] = defaultdict(list)
+    unassigned = [row.id for row in rows if row.assignee_id is None]
+    if unassigned:
+        for request_id, user_id in db.execute(
+            select(RequestCandidate.request_id, RequestCandidate.user_id)
+            .where(RequestCandidate.request_id.in_(unassigned))
+        ):
+            candidates[request_id].append(user_id)
+
+    escalations = []
+    for row in rows:
+        recipients = [row.assignee_id] if row.assignee_id is not None else candidates[row.id]
+        if level == ESCALATION_OVERDUE:
+            recipients = recipients + [uid for uid in settings.SLA_ESCALATION_USER_IDS if uid not in recipients]
+        escalations.append({
+            "request_id": row.id,
+            "title": row.title,
+            "level": level,
+            "deadline": _as_utc(row.deadline),
+            "recipients": recipients,
+        })
+
+    db.execute(insert(RequestEscalation.__table__), [
+        {
+            "request_id": item["request_id"],
+            "level": level,
+            "deadline": item["deadline"],
+            "recipients": item["recipients"],
+        }
+        for item in escalations
+    ])
+    return escalations
+
+
+def _mark_stale(db: Session, cutoff: datetime) -> int:
+    """
+    Отмечает эскалацию overdue без уведомлений у заявок, просроченных раньше cutoff:
+    иначе первый проход после включения планировщика разослал бы уведомления
+    по всем давно просроченным заявкам сразу.
+    """
+    stale = (
+        select(Request.id, literal(ESCALATION_OVERDUE), Request.deadline)
+        .where(
+            Request.status.in_(SLA_STATUSES),
+            Request.deadline <= cutoff,
+            ~exists().where(RequestEscalation.request_id == Request.id, RequestEscalation.level == ESCALATION_OVERDUE),
+        )
+    )
+    return db.execute(
+        insert(RequestEscalation.__table__).from_select(["request_id", "level", "deadline"], stale)
+    ).rowcount
+
+
+def _refresh_counters(db: Session, now: datetime, due_soon_until: datetime) -> Dict[str, int]:
+    """Пересчитывает счетчики просроченных и «горящих» заявок (по тому же индексу)"""
+    rows = db.execute(
+        select(
+            Request.template_id,
+            Request.assignee_id,
+            func.count().filter(Request.deadline <= now),
+            func.count().filter(Request.deadline > now),
+        )
+        .where(Request.status.in_(SLA_STATUSES), Request.deadline <= due_soon_until)
+        .group_by(Request.template_id, Request.assignee_id)
+    ).all()
+
+    counters: Dict[tuple, List[int]] = defaultdict(lambda: [0, 0])
+    counters[("total", "")] = [0, 0]  # Общий счетчик есть всегда, даже нулевой
+    for template_id, assignee_id, overdue, due_soon in rows:
+        for key in (("total", ""), ("template", str(template_id)), ("assignee", "" if assignee_id is None else str(assignee_id))):
+            counters[key][0] += overdue
+            counters[key][1] += due_soon
+
+    db.execute(delete(RequestSlaCounter))
+    db.execute(insert(RequestSlaCounter.__table__), [
+        {"dimension": dimension, "key": key, "overdue": overdue, "due_soon": due_soon, "refreshed_at": now}
+        for (dimension, key), (overdue, due_soon) in counters.items()
+    ])
+    overdue, due_soon = counters[("total", "")]
+    return {"overdue": overdue, "due_soon": due_soon}
+
+
+def _telegram_chats(db: Session, user_ids) -> Dict[int, str]:
+    if not user_ids:
+        return {}
+    return dict(db.execute(
+        select(UserProfile.user_id, UserProfile.telegram_id)
+        .where(UserProfile.user_id.in_(list(user_ids)), UserProfile.telegram_id.isnot(None))
+    ).all())
+
+
+def scan_deadlines(db: Session, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Один проход планировщика: эскалации очередного пакета заявок и пересчет
+    счетчиков в одной транзакции. caught_up=False - обработаны не все заявки.
+    """
+    now = now or datetime.now(timezone.utc)
+    if not _try_lock(db):
+        db.rollback()
+        return {"skipped": True, "caught_up": True, "escalations": [], "telegram_chats": {}}
+
+    due_soon_until = now + timedelta(hours=settings.SLA_DUE_SOON_HOURS)
+    batch_size = max(1, settings.SLA_BATCH_SIZE)
+
+    suppressed = 0
+    if settings.SLA_ESCALATION_MAX_AGE_HOURS > 0:
+        suppressed = _mark_stale(db, now - timedelta(hours=settings.SLA_ESCALATION_MAX_AGE_HOURS))
+
+    overdue = _escalate(db, ESCALATION_OVERDUE, upper=now, lower=None, limit=batch_size)
+    due_soon = _escalate(db, ESCALATION_DUE_SOON, upper=due_soon_until, lower=now, limit=batch_size)
+    counters = _refresh_counters(db, now, due_soon_until)
+
+    escalations = overdue + due_soon
+    chats = {}
+    if settings.SLA_TELEGRAM_ENABLED:
+        chats = _telegram_chats(db, {uid for item in escalations for uid in item["recipients"]})
+    db.commit()
+
+    return {
+        "skipped": False,
+        "caught_up": len(overdue) < batch_size and len(due_soon) < batch_size,
+        "escalated_overdue": len(overdue),
+        "escalated_due_soon": len(due_soon),
+        "suppressed_stale": suppressed,
+        "counters": counters,
+        "escalations": escalations,
+        "telegram_chats": chats,
+    }
+
+
+def get_sla_counters(db: Session) -> Dict[str, Any]:
+    """Счетчики для дашборда из request_sla_counters (без сканирования заявок)"""
+    rows = db.execute(select(RequestSlaCounter)).scalars().all()
+    result: Dict[str, Any] = {"overdue": 0, "due_soon": 0, "by_template": [], "by_assignee": [], "refreshed_at": None}
+    for row in rows:
+        if row.dimension == "total":
+            result["overdue"] = row.overdue
+            result["due_soon"] = row.due_soon
+            refreshed_at = _as_utc(row.refreshed_at)
+            result["refreshed_at"] = refreshed_at.isoformat() if refreshed_at else None
+        elif row.dimension == "template":
+            result["by_template"].append({"template_id": int(row.key), "overdue": row.overdue, "due_soon": row.due_soon})
+        else:
+            result["by_assignee"].append({
+                "assignee_id": int(row.key) if row.key else None, "overdue": row.overdue, "due_soon": row.due_soon
+            })
+    for key in ("by_template", "by_assignee"):
+        result[key].sort(key=lambda item: (-item["overdue"], -item["due_soon"]))
+    result["due_soon_hours"] = settings.SLA_DUE_SOON_HOURS
+    return result
+
+
+def _message(item: Dict[str, Any], as_html: bool = False) -> Dict[str, str]:
+    deadline = item["deadline"].strftime("%d.%m.%Y %H:%M") if item["deadline"] else "—"
+    # Для Telegram (parse_mode=HTML) заголовок заявки экранируется - иначе < или & отклонит API
+    title = html.escape(item["title"] or "", quote=False) if as_html else item["title"]
+    if item["level"] == ESCALATION_OVERDUE:
+        return {"title": "⏰ Заявка просрочена", "text": f"Истек срок заявки «{title}» ({deadline} UTC)"}
+    return {"title": "⌛ Срок заявки истекает", "text": f"Срок заявки «{title}» истекает {deadline} UTC"}
+
+
+class SlaScheduler:
+    """Фоновая проверка сроков заявок в каждом воркере (проход выполняет лидер)"""
+
+    def __init__(self, interval_seconds: int, enabled: bool = True):
+        self.enabled = enabled
+        self.interval = max(1, interval_seconds)
+        self._task: Optional[asyncio.Task] = None
+
+        self.runs = 0
+        self.skipped = 0
+        self.errors = 0
+        self.escalations = 0
+        self.suppressed = 0
+        self.websocket_sent = 0
+        self.telegram_sent = 0
+        self.telegram_failed = 0
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.last_run_at: Optional[float] = None
+        self.last_duration_ms: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if not self.enabled or self.running:
+            return
+        self._task = asyncio.create_task(self._run(), name="sla-scheduler")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                result = await self.run_once()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Ошибка проверки сроков заявок: {e}")
+                result = None
+            # Накопившиеся эскалации разбираются без паузы
+            if result is None or result.get("caught_up", True):
+                await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> Dict[str, Any]:
+        started_at = time.perf_counter()
+        result = await asyncio.to_thread(self._scan)
+        await self._notify(result.pop("escalations"), result.pop("telegram_chats"))
+
+        self.runs += 1
+        if result.get("skipped"):
+            self.skipped += 1
+        self.suppressed += result.get("suppressed_stale", 0)
+        self.last_run = result
+        self.last_run_at = time.time()
+        self.last_duration_ms = round((time.perf_counter() - started_at) * 1000, 1)
+        return result
+
+    def _scan(self) -> Dict[str, Any]:
+        from ..database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            return scan_deadlines(db)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def _notify(self, escalations: List[Dict[str, Any]], chats: Dict[int, str]) -> None:
+        if not escalations:
+            return
+        from ..api.websocket import manager
+        from .telegram_service import telegram_service
+
+        self.escalations += len(escalations)
+        for item in escalations:
+            message = _message(item)
+            payload = {
+                "type": "request_deadline",
+                "title": message["title"],
+                "message": message["text"],
+                "request_id": item["request_id"],
+                "level": item["level"],
+                "deadline": item["deadline"].isoformat() if item["deadline"] else None,
+                "timestamp": datetime.now().isoformat(),
+            }
+            url = REQUEST_URL.format(request_id=item["request_id"])
+            telegram_message = _message(item, as_html=True)
+            telegram_text = (
+                f"<b>{telegram_message['title']}</b>\n\n{telegram_message['text']}"
+                f"\n\n🔗 <a href='{url}'>Открыть в системе</a>"
+            )
+            for user_id in item["recipients"]:
+                if await manager.send_personal_message(payload, user_id):
+                    self.websocket_sent += 1
+                chat_id = chats.get(user_id)
+                if not chat_id:
+                    continue
+                # Эскалация уже записана - повторной отправки не будет, неудачи видны в stats()
+                if await telegram_service.send_message(chat_id, telegram_text):
+                    self.telegram_sent += 1
+                else:
+                    self.telegram_failed += 1
+                    logger.warning(
+                        f"Не доставлено в Telegram: эскалация {item['level']} заявки {item['request_id']}, "
+                        f"пользователь {user_id}"
+                    )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "interval_seconds": self.interval,
+            "due_soon_hours": settings.SLA_DUE_SOON_HOURS,
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "escalations": self.escalations,
+            "suppressed_stale": self.suppressed,
+            "websocket_sent": self.websocket_sent,
+            "telegram_sent": self.telegram_sent,
+            "telegram_failed": self.telegram_failed,
+            "last_run": self.last_run,
+            "seconds_since_run": round(time.time() - self.last_run_at, 1) if self.last_run_at else None,
+            "last_duration_ms": self.last_duration_ms,
+        }
+
+
+sla_scheduler = SlaScheduler(
+    interval_seconds=settings.SLA_SCAN_INTERVAL_SECONDS,
+    enabled=settings.SLA_SCHEDULER_ENABLED,
+)
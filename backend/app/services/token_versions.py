@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from .user_cache import user_info_cache
+
+logger = logging.getLogger(__name__)
+
+
+class TokenVersionRegistry:
+    """
+    Компактная карта user_id -> token_version для проверки самодостаточных JWT.
+
+    Хранятся только пользователи с ненулевой версией (у большинства она 0).
+    Карту перечитывает из таблицы users фоновая задача (в отдельном потоке,
+    не блокируя цикл событий) раз в TOKEN_VERSION_REFRESH_SECONDS. В воркере,
+    вызвавшем revoke(), отзыв действует сразу после commit транзакции; в
+    остальных воркерах старые токены принимаются еще до
+    TOKEN_VERSION_REFRESH_SECONDS - до следующего перечитывания. Токен с
+    версией ниже текущей отклоняется (401).
+
+    Если карта не загружена или давно не обновлялась (фоновая задача не
+    запущена или БД недоступна), current() возвращает None и токены проходят
+    обычную проверку по таблице users.
+    """
+
+    # Во сколько периодов обновления карта считается устаревшей
+    STALE_AFTER_PERIODS = 3
+    # Ключ session.info с версиями, которые применяются после commit
+    PENDING_KEY = "revoked_token_versions"
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = max(1.0, refresh_seconds)
+        self._versions: Dict[int, int] = {}
+        self._refreshed_at: float = 0.0
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.stale_lookups = 0
+
+    def current(self, user_id: int) -> Optional[int]:
+        """Текущая версия токенов пользователя; None - карта устарела, нужна проверка по БД"""
+        if not self._refreshed_at or time.monotonic() - self._refreshed_at > self.refresh_seconds * self.STALE_AFTER_PERIODS:
+            self.stale_lookups += 1
+            return None
+        return self._versions.get(user_id, 0)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run(), name="token-versions")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.to_thread(self.refresh)
+            await asyncio.sleep(self.refresh_seconds)
+
+    def refresh(self) -> None:
+        """Перечитывает ненулевые версии из БД"""
+        from ..database import SessionLocal
+
+        if not self._lock.acquire(blocking=False):
+            # Карту уже обновляет другой поток - используем текущую
+            return
+
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                text("SELECT id, token_version FROM users WHERE token_version > 0")
+            ).fetchall()
+            self._versions = {user_id: version for user_id, version in rows}
+            self._refreshed_at = time.monotonic()
+            self.refreshes += 1
+        except Exception as e:
+            self.refresh_errors += 1
+            logger.error(f"Ошибка обновления версий токенов: {e}")
+        finally:
+            db.close()
+            self._lock.release()
+
+    def revoke(self, db: Session, user_id: int) -> int:
+        """
+        Увеличивает версию токенов пользователя в транзакции вызывающего кода.
+
+        Фиксирует изменение вызывающий код (db.commit()). После commit ранее
+        выданные токены в этом воркере отклоняются сразу, в остальных - после
+        следующего перечитывания карты (до TOKEN_VERSION_REFRESH_SECONDS).
+        При откате транзакции отзыв не применяется.
+        """
+        new_version = db.execute(
+            text("UPDATE users SET token_version = COALESCE(token_version, 0) + 1 WHERE id = :user_id RETURNING token_version"),
+            {"user_id": user_id}
+        ).scalar()
+        if new_version is not None:
+            db.info.setdefault(self.PENDING_KEY, {})[user_id] = new_version
+        return new_version or 0
+
+    def _apply_revoked(self, versions: Dict[int, int]) -> None:
+        for user_id, version in versions.items():
+            if version > self._versions.get(user_id, 0):
+                self._versions[user_id] = version
+            user_info_cache.invalidate_user(user_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.JWT_SELF_CONTAINED_CLAIMS,
+            "tracked_users": len(self._versions),
+            "refresh_seconds": self.refresh_seconds,
+            "running": self.running,
+            "seconds_since_refresh": round(time.monotonic() - self._refreshed_at, 1) if self._refreshed_at else None,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "stale_lookups": self.stale_lookups,
+        }
+
+
+token_version_registry = TokenVersionRegistry(refresh_seconds=settings.TOKEN_VERSION_REFRESH_SECONDS)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_revoked_after_commit(session: Session) -> None:
+    versions = session.info.pop(TokenVersionRegistry.PENDING_KEY, None)
+    if versions:
+        token_version_registry._apply_revoked(versions)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_revoked_after_rollback(session: Session) -> None:
+    session.info.pop(TokenVersionRegistry.PENDING_KEY, None)
@@ -0,0 +1,52 @@
+import logging
+from typing import Any, Dict, Optional
+
+from ..core.config import settings
+from ..utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class UserInfoCache:
+    """
+    Кэш разрешенных по JWT пользователей (UserInfo), ключ - токен.
+
+    Токен по-прежнему проверяется при каждом запросе (подпись и срок действия),
+    кэш лишь избавляет от запроса SELECT ... FROM users WHERE email = ?.
+    При изменении ролей/статуса пользователя записи сбрасываются через invalidate_user().
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, enabled: bool = True):
+        self.enabled = enabled
+        self._cache = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+
+    def get(self, token: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        return self._cache.get(token)
+
+    def set(self, token: str, user_info: Any) -> None:
+        if not self.enabled:
+            return
+        self._cache.set(token, user_info)
+
+    def invalidate_user(self, user_id: int) -> int:
+        """Сбрасывает все закэшированные токены пользователя"""
+        removed = self._cache.delete_where(lambda _token, info: getattr(info, "id", None) == user_id)
+        if removed:
+            logger.debug(f"Сброшено {removed} записей кэша пользователя {user_id}")
+        return removed
+
+    def clear(self) -> None:
+        """Сбрасывает кэш целиком (например, при изменении/удалении роли)"""
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, **self._cache.stats()}
+
+
+user_info_cache = UserInfoCache(
+    max_size=settings.USER_CACHE_MAX_SIZE,
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS,
+    enabled=settings.USER_CACHE_ENABLED,
+)
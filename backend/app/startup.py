@@ -40,7 +40,8 @@ def auto_create_tables():
         from .models import (
             user, role, field, department, request_template, 
             request, portfolio, group, announcement, user_assignment,
-            user_profile, request_file, report_template, report, activity_log
+            user_profile, request_file, report_template, report, activity_log,
+            activity_rollup
         )
         
         # Создаем все таблицы
@@ -364,6 +365,83 @@ def init_system_roles(db: Session) -> dict:
     
     return stats
 
+def sync_user_role_memberships(db: Session) -> dict:
+    """
+    Синхронизация таблицы user_roles с JSON-полем users.roles.
+
+    Догоняет строки, измененные в обход модели (SQL-скрипты, старые версии приложения).
+    Воркеры запускают синхронизацию одновременно, поэтому строки добавляются
+    через ON CONFLICT DO NOTHING, а в статистику попадают только реально
+    добавленные и удаленные.
+    """
+    import json
+    from .models.user import UserRoleMembership
+
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    stats = {'created': 0, 'updated': 0, 'skipped': 0, 'errors': 0}
+
+    logger.info("🔧 Синхронизация членства в ролях (user_roles)...")
+
+    existing = {}
+    for user_id, role_name in db.execute(text("SELECT user_id, role_name FROM user_roles")):
+        existing.setdefault(user_id, set()).add(role_name)
+
+    for user_id, roles_json in db.execute(text("SELECT id, roles FROM users")):
+        try:
+            roles = json.loads(roles_json) if roles_json else []
+            expected = {str(role) for role in roles} if isinstance(roles, list) else set()
+        except (json.JSONDecodeError, TypeError):
+            logger.error(f"❌ Некорректный JSON ролей у пользователя {user_id}")
+            stats['errors'] += 1
+            continue
+
+        current = existing.get(user_id, set())
+        missing = expected - current
+        stale = current - expected
+
+        if missing:
+            stats['created'] += db.execute(
+                insert(UserRoleMembership.__table__)
+                .values([{'user_id': user_id, 'role_name': role_name} for role_name in missing])
+                .on_conflict_do_nothing()
+            ).rowcount
+        if stale:
+            stats['updated'] += db.query(UserRoleMembership).filter(
+                UserRoleMembership.user_id == user_id,
+                UserRoleMembership.role_name.in_(stale)
+            ).delete(synchronize_session=False)
+
+        if not missing and not stale:
+            stats['skipped'] += 1
+
+    if stats['created'] or stats['updated']:
+        logger.info(f"✅ user_roles: добавлено {stats['created']}, удалено {stats['updated']}")
+
+    return stats
+
+def init_activity_log_partitions(db: Session) -> dict:
+    """Создание месячных секций журнала активности на ближайшие месяцы."""
+    from .services.activity_partitions import is_partitioned, ensure_partitions
+
+    stats = {'created': 0, 'updated': 0, 'skipped': 0, 'errors': 0}
+
+    try:
+        if not is_partitioned(db):
+            stats['skipped'] += 1
+            return stats
+        stats['created'] = len(ensure_partitions(db))
+        db.commit()
+    except Exception as e:
+        logger.error(f"❌ Ошибка создания секций журнала активности: {e}")
+        db.rollback()
+        stats['errors'] += 1
+
+    return stats
+
 def init_field_types(db: Session) -> dict:
     """Инициализация типов полей."""
     stats = {'created': 0, 'updated': 0, 'skipped': 0, 'errors': 0}
@@ -602,6 +680,8 @@ def startup_application():
     - Автоматическое создание таблиц из моделей
     - Проверку подключения к базе данных
     - Инициализацию системных ролей
+    - Синхронизацию таблицы user_roles
+    - Создание секций журнала активности
     - Инициализацию типов полей
     - Инициализацию базовых департаментов
     - Инициализацию шаблонов заявок
@@ -632,6 +712,12 @@ def startup_application():
             # Инициализируем системные роли
             roles_stats = init_system_roles(db)
             
+            # Синхронизируем нормализованное членство в ролях
+            memberships_stats = sync_user_role_memberships(db)
+            
+            # Создаем секции журнала активности заранее
+            partitions_stats = init_activity_log_partitions(db)
+            
             # Инициализируем типы полей
             fields_stats = init_field_types(db)
             
@@ -645,9 +731,9 @@ def startup_application():
             db.commit()
             
             # Выводим общую статистику
-            total_created = roles_stats['created'] + fields_stats['created'] + depts_stats['created'] + templates_stats['created']
-            total_updated = roles_stats['updated'] + fields_stats['updated'] + depts_stats['updated'] + templates_stats['updated']
-            total_errors = roles_stats['errors'] + fields_stats['errors'] + depts_stats['errors'] + templates_stats['errors']
+            total_created = roles_stats['created'] + memberships_stats['created'] + fields_stats['created'] + depts_stats['created'] + templates_stats['created']
+            total_updated = roles_stats['updated'] + memberships_stats['updated'] + fields_stats['updated'] + depts_stats['updated'] + templates_stats['updated']
+            total_errors = roles_stats['errors'] + memberships_stats['errors'] + partitions_stats['errors'] + fields_stats['errors'] + depts_stats['errors'] + templates_stats['errors']
             
             logger.info("📊 Общая статистика инициализации:")
             logger.info(f"   🔧 Таблиц проверено/создано: {tables_result.get('tables_count', 0)}")
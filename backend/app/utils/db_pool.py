@@ -0,0 +1,60 @@
+import os
+import time
+from typing import Any, Dict
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from .latency import LatencyWindow
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool с учетом времени ожидания соединения и таймаутов.
+
+    Время ожидания включает установку нового соединения, если свободного
+    в пуле нет, - именно эту задержку видит обработчик запроса.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self._wait_latencies = LatencyWindow(1000)
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        self._wait_latencies.add(time.perf_counter() - started_at)
+        self.checkouts += 1
+        return connection
+
+    def recreate(self):
+        # engine.dispose() пересоздает пул - счетчики процесса сохраняем
+        pool = super().recreate()
+        pool.checkouts = self.checkouts
+        pool.timeouts = self.timeouts
+        pool._wait_latencies = self._wait_latencies
+        return pool
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "pool_size": self.size(),
+            "max_overflow": self._max_overflow,
+            "timeout_seconds": self._timeout,
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(0, self.overflow()),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "checkout_wait_ms": self._wait_latencies.summary_ms(),
+        }
+
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """Тот же учет ожиданий для пула асинхронного движка (asyncpg)"""
@@ -0,0 +1,55 @@
+import hashlib
+import math
+from typing import Iterable, Optional
+
+
+class HyperLogLog:
+    """
+    Скетч HyperLogLog для приближенного подсчета уникальных значений.
+
+    Скетчи за разные интервалы объединяются поэлементным максимумом регистров,
+    поэтому число уникальных пользователей за год считается слиянием дневных
+    скетчей без обращения к исходным записям. При p=12 скетч занимает 4 КБ,
+    стандартная ошибка около 1.6%.
+    """
+
+    def __init__(self, p: int = 12, registers: Optional[bytes] = None):
+        self.p = p
+        self.m = 1 << p
+        if registers is not None and len(registers) != self.m:
+            raise ValueError(f"Ожидалось {self.m} регистров, получено {len(registers)}")
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+
+    @classmethod
+    def from_values(cls, values: Iterable, p: int = 12) -> "HyperLogLog":
+        sketch = cls(p)
+        for value in values:
+            sketch.add(value)
+        return sketch
+
+    def add(self, value) -> None:
+        digest = hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest()
+        hashed = int.from_bytes(digest, "big")
+        index = hashed >> (64 - self.p)
+        rest = (hashed << self.p) & 0xFFFFFFFFFFFFFFFF
+        rank = 64 - self.p + 1 if rest == 0 else 64 - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.p != self.p:
+            raise ValueError("Нельзя объединить скетчи с разной точностью")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            # Поправка для малых множеств (linear counting)
+            estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
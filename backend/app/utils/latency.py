@@ -0,0 +1,37 @@
+import threading
+from collections import deque
+from typing import Dict
+
+
+class LatencyWindow:
+    """
+    Скользящее окно последних измерений длительности (в секундах)
+    с расчетом перцентилей для метрик.
+    """
+
+    def __init__(self, maxlen: int = 1000):
+        self._values = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        self._values.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    @staticmethod
+    def _percentile(sorted_values, fraction: float) -> float:
+        if not sorted_values:
+            return 0.0
+        index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+        return sorted_values[index]
+
+    def summary_ms(self) -> Dict[str, float]:
+        """p50/p95/max в миллисекундах"""
+        with self._lock:
+            values = sorted(self._values)
+        return {
+            "p50": round(self._percentile(values, 0.5) * 1000, 1),
+            "p95": round(self._percentile(values, 0.95) * 1000, 1),
+            "max": round((values[-1] if values else 0.0) * 1000, 1),
+        }
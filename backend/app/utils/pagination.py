@@ -0,0 +1,41 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Tuple
+
+
+def encode_cursor(payload: Dict[str, Any]) -> str:
+    """Непрозрачный курсор для keyset-пагинации (base64url от JSON)"""
+    raw = json.dumps(payload, separators=(",", ":"), default=_json_default).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Разбирает курсор; ValueError, если курсор поврежден"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Некорректный курсор") from e
+    if not isinstance(payload, dict):
+        raise ValueError("Некорректный курсор")
+    return payload
+
+
+def encode_keyset_cursor(created_at: datetime, item_id: int) -> str:
+    """Курсор по паре (created_at, id) - позиция последней выданной записи"""
+    return encode_cursor({"t": created_at, "i": item_id})
+
+
+def decode_keyset_cursor(cursor: str) -> Tuple[datetime, int]:
+    payload = decode_cursor(cursor)
+    try:
+        return datetime.fromisoformat(payload["t"]), int(payload["i"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError("Некорректный курсор") from e
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Тип {type(value).__name__} не поддерживается в курсоре")
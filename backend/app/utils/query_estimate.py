@@ -0,0 +1,32 @@
+import json
+from typing import Optional
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+
+class _ExplainJson(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) для произвольного SELECT с параметрами"""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(_ExplainJson, "postgresql")
+def _compile_explain_json(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def estimate_rows(db: Session, statement) -> Optional[int]:
+    """
+    Оценка количества строк запроса по плану PostgreSQL (без выполнения).
+    Для других СУБД возвращает None.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    plan = db.execute(_ExplainJson(statement)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Потокобезопасный in-process кэш с ограничением по времени жизни (TTL)
+    и по количеству записей (LRU-вытеснение).
+
+    Ведет счетчики попаданий/промахов для мониторинга.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max(1, int(max_size))
+        self.ttl_seconds = float(ttl_seconds)
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Возвращает значение по ключу или None, если записи нет или она устарела"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """Сохраняет значение; при переполнении вытесняет самые давние записи"""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = (self._clock() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> bool:
+        """Удаляет запись по ключу"""
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+                return True
+            return False
+
+    def delete_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Удаляет все записи, для которых predicate(key, value) истинен"""
+        with self._lock:
+            keys = [key for key, (_, value) in self._data.items() if predicate(key, value)]
+            for key in keys:
+                del self._data[key]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self) -> None:
+        """Полностью очищает кэш"""
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики кэша для метрик"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
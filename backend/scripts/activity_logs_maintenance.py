@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Обслуживание журнала активности (секционированная таблица activity_logs).
+
+Выполняет по порядку:
+1. Создание месячных секций на ближайшие месяцы
+2. Удаление записей действий с коротким сроком хранения (ACTIVITY_LOG_RETENTION_BY_ACTION)
+3. Отключение секций старше самого длинного срока хранения, выгрузку их
+   в сжатые NDJSON-файлы (ACTIVITY_LOG_ARCHIVE_DIR) и удаление
+
+Рекомендуется запускать по расписанию (cron, раз в сутки).
+
+Использование:
+    python scripts/activity_logs_maintenance.py
+    python scripts/activity_logs_maintenance.py --dry-run
+    python scripts/activity_logs_maintenance.py --no-archive
+    python scripts/activity_logs_maintenance.py --archive-dir /mnt/archive/activity_logs --months-ahead 6
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в путь
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.core.config import settings
+from app.database import SessionLocal
+from app.services.activity_partitions import (
+    RetentionPolicy,
+    apply_row_retention,
+    ensure_partitions,
+    expire_partitions,
+    is_partitioned,
+    list_partitions,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обслуживание секций и сроков хранения журнала активности")
+    parser.add_argument("--dry-run", action="store_true", help="Только показать, что будет удалено")
+    parser.add_argument("--no-archive", action="store_true", help="Удалять устаревшие секции без выгрузки в файлы")
+    parser.add_argument("--archive-dir", default=settings.ACTIVITY_LOG_ARCHIVE_DIR, help="Каталог для архивов секций")
+    parser.add_argument("--months-ahead", type=int, default=settings.ACTIVITY_LOG_PARTITIONS_AHEAD,
+                        help="На сколько месяцев вперед создавать секции")
+    args = parser.parse_args()
+
+    policy = RetentionPolicy.from_settings()
+    db = SessionLocal()
+    try:
+        if not is_partitioned(db):
+            print("❌ Таблица activity_logs не секционирована (примените миграции: alembic upgrade head)")
+            return 1
+
+        print(f"📋 Срок хранения по умолчанию: {policy.default_days} дн.")
+        for action, days in sorted(policy.by_action.items()):
+            print(f"   • {action}: {days} дн.")
+
+        if args.dry_run:
+            print("🔍 Режим просмотра: изменения не вносятся")
+        else:
+            created = ensure_partitions(db, months_ahead=args.months_ahead)
+            db.commit()
+            print(f"✅ Создано секций: {len(created)} {', '.join(created)}")
+
+        deleted = apply_row_retention(db, policy, dry_run=args.dry_run)
+        for label, count in deleted.items():
+            action = "остальные действия" if label == "*" else label
+            verb = "К удалению" if args.dry_run else "Удалено"
+            print(f"🧹 {verb} записей ({action}): {count}")
+
+        expired = expire_partitions(
+            db,
+            policy,
+            archive_dir=args.archive_dir,
+            archive=not args.no_archive,
+            dry_run=args.dry_run,
+        )
+        if not expired:
+            print("✅ Устаревших секций нет")
+        for report in expired:
+            if args.dry_run:
+                print(f"🗄️ К удалению секция {report['partition']} ({report['rows']} строк)")
+            elif report["archived"]:
+                print(f"🗄️ Секция {report['partition']} выгружена ({report['rows']} строк) в {args.archive_dir} и удалена")
+            else:
+                print(f"🗑️ Секция {report['partition']} удалена без архивации")
+
+        print(f"📊 Секций в таблице: {sum(1 for attached in list_partitions(db).values() if attached)}")
+        return 0
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Ошибка обслуживания журнала активности: {e}")
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк потоковой выгрузки журнала активности (CSV / NDJSON / XLSX).
+
+Выгружает журнал тем же кодом, что и GET /api/activity-logs/export, в /dev/null
+(или в файл) и следит за пиковым RSS процесса. Если пик превышает
+--rss-limit-mb, скрипт завершается с кодом 1 - так проверяется, что память
+не растет вместе с объемом выгрузки.
+
+Тестовые записи можно создать флагом --seed (PostgreSQL: generate_series);
+они помечаются описанием BENCHMARK_MARKER и удаляются флагом --cleanup.
+
+Использование:
+    python scripts/benchmark_activity_export.py --seed 5000000
+    python scripts/benchmark_activity_export.py --format ndjson --rss-limit-mb 300
+    python scripts/benchmark_activity_export.py --format xlsx --output /tmp/activity.xlsx
+    python scripts/benchmark_activity_export.py --cleanup
+"""
+
+import argparse
+import os
+import resource
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в путь
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import delete, insert, text
+
+from app.database import engine
+from app.models.activity_log import ActivityLog
+from app.schemas.activity_log import ActivityLogFilter
+from app.services.activity_export import export_activity_logs
+
+BENCHMARK_MARKER = "benchmark_activity_export"
+
+
+def current_rss_mb() -> float:
+    """Текущий RSS процесса (Linux: /proc/self/statm)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        # Не Linux - максимум за время жизни процесса
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage / 1024 / 1024 if sys.platform == "darwin" else usage / 1024
+
+
+class RssSampler(threading.Thread):
+    """Фоновый замер пикового RSS"""
+
+    def __init__(self, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_mb = current_rss_mb()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+            time.sleep(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+
+def seed(rows: int):
+    print(f"🌱 Создаем {rows} тестовых записей журнала...")
+    started_at = time.perf_counter()
+    with engine.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            connection.execute(text("""
+                INSERT INTO activity_logs (user_id, action, resource_type, resource_id, description,
+                                           details, ip_address, method, status_code, duration_ms, created_at)
+                SELECT NULL, (ARRAY['view', 'create', 'update', 'download'])[1 + n % 4],
+                       'requests', (n % 100000)::text, :marker,
+                       json_build_object('path', '/api/requests/' || (n % 100000)),
+                       '10.0.' || (n % 250) || '.' || (n % 200),
+                       'GET', 200, n % 500,
+                       now() - (n || ' seconds')::interval
+                FROM generate_series(1, :rows) AS n
+            """), {"marker": BENCHMARK_MARKER, "rows": rows})
+        else:
+            batch = []
+            for n in range(rows):
+                batch.append({
+                    "action": "view",
+                    "resource_type": "requests",
+                    "resource_id": str(n % 100000),
+                    "description": BENCHMARK_MARKER,
+                    "details": {"path": f"/api/requests/{n % 100000}"},
+                    "ip_address": "10.0.0.1",
+                    "method": "GET",
+                    "status_code": 200,
+                    "duration_ms": n % 500,
+                })
+                if len(batch) >= 10000:
+                    connection.execute(insert(ActivityLog.__table__), batch)
+                    batch = []
+            if batch:
+                connection.execute(insert(ActivityLog.__table__), batch)
+    print(f"✅ Готово за {time.perf_counter() - started_at:.1f} с")
+
+
+def cleanup():
+    with engine.begin() as connection:
+        deleted = connection.execute(
+            delete(ActivityLog.__table__).where(ActivityLog.description == BENCHMARK_MARKER)
+        ).rowcount
+    print(f"🧹 Удалено тестовых записей: {deleted}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк потоковой выгрузки журнала активности")
+    parser.add_argument("--format", choices=["csv", "ndjson", "xlsx"], default="csv")
+    parser.add_argument("--output", default=os.devnull, help="Куда писать выгрузку (по умолчанию /dev/null)")
+    parser.add_argument("--rss-limit-mb", type=float, default=256, help="Допустимый пиковый RSS, МБ")
+    parser.add_argument("--seed", type=int, default=0, metavar="ROWS", help="Сначала создать ROWS тестовых записей")
+    parser.add_argument("--cleanup", action="store_true", help="Удалить тестовые записи и выйти")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup()
+        return 0
+    if args.seed:
+        seed(args.seed)
+
+    stream, media_type, filename = export_activity_logs(ActivityLogFilter(), args.format)
+
+    baseline_mb = current_rss_mb()
+    sampler = RssSampler()
+    sampler.start()
+
+    started_at = time.perf_counter()
+    written = 0
+    with open(args.output, "wb") as output:
+        for chunk in stream:
+            output.write(chunk)
+            written += len(chunk)
+    elapsed = time.perf_counter() - started_at
+    sampler.stop()
+
+    print(f"📊 Формат: {args.format} ({media_type}), файл: {filename}")
+    print(f"   ⏱️  Время: {elapsed:.1f} с, объем: {written / 1024 / 1024:.1f} МБ ({written / 1024 / 1024 / elapsed:.1f} МБ/с)")
+    print(f"   🧠 RSS: до выгрузки {baseline_mb:.0f} МБ, пик {sampler.peak_mb:.0f} МБ, лимит {args.rss_limit_mb:.0f} МБ")
+
+    if sampler.peak_mb > args.rss_limit_mb:
+        print("❌ Пиковый RSS превысил лимит")
+        return 1
+    print("✅ Память в пределах лимита")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
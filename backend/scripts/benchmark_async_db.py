@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк: синхронная сессия внутри async-обработчика против AsyncSession (asyncpg).
+
+Оба режима выполняются в одном event loop - так же, как один воркер uvicorn
+обслуживает конкурентные запросы. В синхронном режиме каждый запрос к БД
+блокирует цикл событий, в асинхронном - запросы выполняются параллельно
+в пределах пула соединений.
+
+Использование:
+    python scripts/benchmark_async_db.py
+    python scripts/benchmark_async_db.py --requests 2000 --concurrency 50
+    python scripts/benchmark_async_db.py --sleep-ms 5      # имитация медленного запроса (pg_sleep)
+    python scripts/benchmark_async_db.py --mode async
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в путь
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import select, text
+
+from app.database import SessionLocal, AsyncSessionLocal, engine, async_engine
+from app.models.request import Request
+from app.utils.latency import LatencyWindow
+
+
+def build_statement(args):
+    """Запрос, выполняемый каждым «обработчиком»"""
+    if args.sleep_ms > 0:
+        return text("SELECT pg_sleep(:seconds)").bindparams(seconds=args.sleep_ms / 1000)
+    # Аналог выборки /api/requests/my
+    return (
+        select(Request.id, Request.title, Request.status, Request.created_at)
+        .where(Request.author_id == args.user_id)
+        .order_by(Request.created_at.desc())
+        .limit(50)
+    )
+
+
+async def sync_handler(statement):
+    db = SessionLocal()
+    try:
+        db.execute(statement).fetchall()
+    finally:
+        db.close()
+
+
+async def async_handler(statement):
+    async with AsyncSessionLocal() as db:
+        (await db.execute(statement)).fetchall()
+
+
+async def run(handler, statement, total: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = LatencyWindow(total)
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            started_at = time.perf_counter()
+            try:
+                await handler(statement)
+            except Exception:
+                errors += 1
+            latencies.add(time.perf_counter() - started_at)
+
+    # Прогрев пула соединений
+    await asyncio.gather(*(handler(statement) for _ in range(min(concurrency, 5))))
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started_at
+
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": latencies.summary_ms(),
+        "errors": errors,
+    }
+
+
+def print_result(title: str, result: dict):
+    latency = result["latency_ms"]
+    print(f"📊 {title}")
+    print(f"   ⏱️  Время: {result['elapsed_s']} с, пропускная способность: {result['rps']} запр/с")
+    print(f"   📈 Задержка: p50={latency['p50']} мс, p95={latency['p95']} мс, max={latency['max']} мс")
+    if result["errors"]:
+        print(f"   ❌ Ошибок: {result['errors']}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Сравнение sync/async доступа к БД в одном воркере")
+    parser.add_argument("--requests", type=int, default=1000, help="Количество запросов в каждом режиме")
+    parser.add_argument("--concurrency", type=int, default=20, help="Одновременных запросов")
+    parser.add_argument("--user-id", type=int, default=1, help="Автор заявок для выборки")
+    parser.add_argument("--sleep-ms", type=float, default=0, help="Вместо выборки выполнять pg_sleep (мс)")
+    parser.add_argument("--mode", choices=["both", "sync", "async"], default="both")
+    args = parser.parse_args()
+
+    if args.mode != "sync" and AsyncSessionLocal is None:
+        print("❌ Асинхронный драйвер не установлен (pip install asyncpg)")
+        return 1
+
+    statement = build_statement(args)
+    print(f"🚀 Запросов: {args.requests}, конкурентность: {args.concurrency}, пул: {engine.pool.status()}")
+
+    results = {}
+    if args.mode in ("both", "sync"):
+        results["sync"] = await run(sync_handler, statement, args.requests, args.concurrency)
+        print_result("Синхронная сессия (get_db)", results["sync"])
+    if args.mode in ("both", "async"):
+        results["async"] = await run(async_handler, statement, args.requests, args.concurrency)
+        print_result("Асинхронная сессия (get_async_db)", results["async"])
+
+    if len(results) == 2 and results["sync"]["rps"]:
+        print(f"⚡ Ускорение async/sync: x{results['async']['rps'] / results['sync']['rps']:.2f}")
+
+    if async_engine is not None:
+        await async_engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
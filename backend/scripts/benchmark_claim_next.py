@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк очереди заявок: «взять следующую» (FOR UPDATE SKIP LOCKED) против
+гонки за одну и ту же заявку через /take.
+
+Создает шаблон, --workers сотрудников и --requests свободных заявок, в которых
+все сотрудники - возможные исполнители, и запускает по потоку на сотрудника:
+
+    claim - RequestTransitionService.claim_next() (как POST /api/requests/claim-next);
+    take  - каждый читает самую старую свободную заявку и берет ее с проверкой
+            версии (как POST /api/requests/{id}/take?version=...), проигравшие
+            получают 409 и пробуют снова.
+
+Печатает заявок в секунду, число конфликтов и проверяет, что каждая заявка
+досталась ровно одному сотруднику. Требует PostgreSQL. Тестовые данные
+удаляются в конце (флаг --keep оставляет их).
+
+Использование:
+    python scripts/benchmark_claim_next.py
+    python scripts/benchmark_claim_next.py --mode take --workers 50 --requests 2000
+"""
+
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в путь
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from fastapi import HTTPException
+from sqlalchemy import String, cast, create_engine, delete, func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.dependencies import build_user_info
+from app.models import ActivityLog, Request, RequestCandidate, RequestStatus, RequestTemplate, User
+from app.services.request_transitions import RequestTransitionService
+
+BENCHMARK_MARKER = "benchmark_claim_next"
+
+
+def seed(session_factory, workers: int, requests: int):
+    with session_factory() as db:
+        template = RequestTemplate(name=BENCHMARK_MARKER, description=BENCHMARK_MARKER)
+        db.add(template)
+        users = [
+            User(
+                email=f"{BENCHMARK_MARKER}_{n}@example.invalid",
+                password_hash="!",
+                first_name="Бенчмарк",
+                last_name=str(n),
+                is_verified=True,
+                roles=["employee"],
+            )
+            for n in range(workers)
+        ]
+        db.add_all(users)
+        db.flush()
+
+        author_id = users[0].id
+        request_ids = db.execute(
+            insert(Request).returning(Request.id),
+            [
+                {
+                    "template_id": template.id,
+                    "author_id": author_id,
+                    "title": f"{BENCHMARK_MARKER} #{n}",
+                    "form_data": {},
+                    "status": RequestStatus.IN_REVIEW.value,
+                    "possible_assignees": [user.id for user in users],
+                }
+                for n in range(requests)
+            ]
+        ).scalars().all()
+        db.execute(
+            insert(RequestCandidate),
+            [{"request_id": request_id, "user_id": user.id} for request_id in request_ids for user in users]
+        )
+        db.commit()
+        return template.id, [build_user_info(user) for user in users], request_ids
+
+
+def cleanup(session_factory):
+    with session_factory() as db:
+        template_ids = db.execute(
+            select(RequestTemplate.id).where(RequestTemplate.name == BENCHMARK_MARKER)
+        ).scalars().all()
+        if not template_ids:
+            return
+        request_ids = select(Request.id).where(Request.template_id.in_(template_ids))
+        db.execute(delete(ActivityLog).where(
+            ActivityLog.resource_type == "request",
+            ActivityLog.resource_id.in_(
+                select(cast(Request.id, String)).where(Request.template_id.in_(template_ids))
+            )
+        ))
+        db.execute(delete(RequestCandidate).where(RequestCandidate.request_id.in_(request_ids)))
+        db.execute(delete(Request).where(Request.template_id.in_(template_ids)))
+        db.execute(delete(RequestTemplate).where(RequestTemplate.id.in_(template_ids)))
+        db.execute(delete(User).where(User.email.like(f"{BENCHMARK_MARKER}_%")))
+        db.commit()
+
+
+def claim_worker(session_factory, user_info, template_id, stats):
+    with session_factory() as db:
+        while True:
+            transitions = RequestTransitionService(db, user_info)
+            request = transitions.claim_next(template_id)
+            if request is None:
+                db.rollback()
+                return
+            transitions.finish(request)
+            stats.record(request.id, conflict=False)
+
+
+def take_worker(session_factory, user_info, template_id, stats):
+    with session_factory() as db:
+        while True:
+            candidate = db.execute(
+                select(Request.id, Request.version)
+                .where(
+                    Request.template_id == template_id,
+                    Request.status == RequestStatus.IN_REVIEW.value,
+                    Request.assignee_id.is_(None),
+                )
+                .order_by(Request.created_at, Request.id)
+                .limit(1)
+            ).first()
+            if candidate is None:
+                db.rollback()
+                return
+            transitions = RequestTransitionService(db, user_info)
+            try:
+                request = transitions.load(candidate.id)
+                request = transitions.apply(
+                    request,
+                    {"assignee_id": user_info.id, "status": RequestStatus.APPROVED.value},
+                    from_statuses=[RequestStatus.IN_REVIEW.value],
+                    expected_version=candidate.version,
+                )
+                transitions.finish(request)
+                stats.record(request.id, conflict=False)
+            except HTTPException as e:
+                db.rollback()
+                if e.status_code != 409:
+                    raise
+                stats.record(None, conflict=True)
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.claimed = []
+        self.conflicts = 0
+
+    def record(self, request_id, conflict: bool):
+        with self.lock:
+            if conflict:
+                self.conflicts += 1
+            else:
+                self.claimed.append(request_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк очереди заявок (claim-next / take)")
+    parser.add_argument("--mode", choices=["claim", "take"], default="claim")
+    parser.add_argument("--workers", type=int, default=50, help="Число параллельных сотрудников")
+    parser.add_argument("--requests", type=int, default=5000, help="Число свободных заявок в очереди")
+    parser.add_argument("--keep", action="store_true", help="Не удалять тестовые данные")
+    args = parser.parse_args()
+
+    if not settings.DATABASE_URL.startswith("postgresql"):
+        print("❌ Бенчмарк требует PostgreSQL (FOR UPDATE SKIP LOCKED)")
+        return 1
+
+    # Отдельный пул - по соединению на каждого сотрудника
+    engine = create_engine(settings.DATABASE_URL, pool_size=args.workers, max_overflow=0)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+
+    cleanup(session_factory)
+    print(f"🌱 Создаем {args.requests} заявок и {args.workers} сотрудников...")
+    template_id, users, request_ids = seed(session_factory, args.workers, args.requests)
+
+    worker = claim_worker if args.mode == "claim" else take_worker
+    stats = Stats()
+    errors = []
+
+    def run(user_info):
+        try:
+            worker(session_factory, user_info, template_id, stats)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(user_info,)) for user_info in users]
+    started_at = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started_at
+
+    with session_factory() as db:
+        unassigned = db.execute(
+            select(func.count()).select_from(Request).where(
+                Request.template_id == template_id, Request.assignee_id.is_(None)
+            )
+        ).scalar()
+
+    duplicates = len(stats.claimed) - len(set(stats.claimed))
+    print(f"📊 Режим: {args.mode}, сотрудников: {args.workers}, заявок: {len(request_ids)}")
+    print(f"   ⏱️  Время: {elapsed:.2f} с, взято: {len(stats.claimed)} ({len(stats.claimed) / elapsed:.0f} заявок/с)")
+    print(f"   ⚔️  Конфликтов (409): {stats.conflicts}, повторных выдач: {duplicates}, осталось свободных: {unassigned}")
+
+    if not args.keep:
+        cleanup(session_factory)
+    engine.dispose()
+
+    if errors:
+        print(f"❌ Ошибки в потоках: {errors[0]!r}")
+        return 1
+    if duplicates or unassigned or len(stats.claimed) != len(request_ids):
+        print("❌ Каждая заявка должна достаться ровно одному сотруднику")
+        return 1
+    print("✅ Каждая заявка досталась ровно одному сотруднику")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк правил маршрутизации заявок.
+
+Генерирует шаблон с --rules правилами (eq, in, regex, range и составные
+условия) и --submissions данных форм, затем сравнивает:
+
+    legacy   - прежний проход по списку правил на каждую отправку
+               (только равенство, str().lower() обеих сторон);
+    linear   - проход по списку с разбором всех условий на каждую отправку;
+    compiled - таблица решений из кэша (как при POST /api/requests/{id}/submit).
+
+Результат таблицы решений сверяется с проходом linear.
+База данных не нужна.
+
+Использование:
+    python scripts/benchmark_routing_rules.py
+    python scripts/benchmark_routing_rules.py --rules 1000 --submissions 50000
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+# Добавляем корневую директорию проекта в путь
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.routing_rules import (
+    FormValues, apply_routing_rules, invalidate_routing_table, parse_condition, routing_table_cache
+)
+
+FACULTIES = [f"faculty_{n}" for n in range(300)]
+DEPARTMENTS = [f"dept_{n}" for n in range(100)]
+
+
+def make_rules(count: int, rng: random.Random):
+    rules = []
+    for n in range(count):
+        assignees = [n * 10 + 1, n * 10 + 2]
+        kind = n % 10
+        if kind < 6:
+            rule = {"field": "faculty", "value": FACULTIES[n % len(FACULTIES)]}
+        elif kind == 6:
+            rule = {"field": "department", "operator": "in", "value": ", ".join(rng.sample(DEPARTMENTS, 3))}
+        elif kind == 7:
+            rule = {"field": "group", "operator": "regex", "value": rf"^ИТ-{n % 50}\d$"}
+        elif kind == 8:
+            low = rng.randint(1, 5)
+            rule = {"field": "course", "operator": "range", "value": f"{low}..{low}"}
+        else:
+            rule = {
+                "field": "faculty", "value": FACULTIES[n % len(FACULTIES)],
+                "conditions": [{"field": "course", "operator": "range", "value": "1..2"}],
+            }
+        rule["assignees"] = assignees
+        rules.append(rule)
+    return rules
+
+
+def make_forms(count: int, rng: random.Random):
+    return [
+        {
+            "faculty": rng.choice(FACULTIES).upper() if rng.random() < 0.1 else rng.choice(FACULTIES),
+            "department": rng.choice(DEPARTMENTS),
+            "group": f"ИТ-{rng.randint(0, 600)}",
+            "course": str(rng.randint(1, 6)),
+            "comment": "x" * 50,
+        }
+        for _ in range(count)
+    ]
+
+
+def legacy_match(rules, form_data):
+    """Прежняя реализация apply_routing_rules"""
+    for rule in rules:
+        actual_value = form_data.get(rule.get("field"))
+        if str(actual_value).lower() == str(rule.get("value")).lower():
+            return rule.get("assignees", [])
+    return None
+
+
+def linear_match(rules, form_data):
+    """Прямая проверка всех условий каждого правила по порядку"""
+    form = FormValues(form_data)
+    for rule in rules:
+        conditions = [parse_condition(rule)] + [parse_condition(c) for c in rule.get("conditions") or []]
+        if all(form.matches(*condition) for condition in conditions):
+            return rule["assignees"]
+    return None
+
+
+def timed(label: str, func, forms):
+    started_at = time.perf_counter()
+    results = [func(form) for form in forms]
+    elapsed = time.perf_counter() - started_at
+    print(f"   {label:<10} {elapsed * 1000:8.1f} мс  ({len(forms) / elapsed:,.0f} отправок/с, "
+          f"{elapsed / len(forms) * 1e6:.1f} мкс на отправку)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк правил маршрутизации заявок")
+    parser.add_argument("--rules", type=int, default=200, help="Число правил в шаблоне")
+    parser.add_argument("--submissions", type=int, default=10000, help="Число отправок заявок")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rules = make_rules(args.rules, rng)
+    forms = make_forms(args.submissions, rng)
+    template = SimpleNamespace(id=-1, updated_at=datetime.now(), routing_rules=rules)
+    invalidate_routing_table(template.id)
+
+    print(f"📊 Правил: {len(rules)}, отправок: {len(forms)}")
+    timed("legacy", lambda form: legacy_match(rules, form), forms)
+    expected = timed("linear", lambda form: linear_match(rules, form), forms)
+    compiled = timed("compiled", lambda form: apply_routing_rules(template, form), forms)
+
+    mismatches = sum(1 for got, want in zip(compiled, expected) if got != want)
+    matched = sum(1 for result in compiled if result is not None)
+    cache = routing_table_cache.stats()
+    print(f"   Сработало правило: {matched}, кэш: попаданий {cache['hits']}, промахов {cache['misses']}")
+
+    if mismatches:
+        print(f"❌ Расхождений с проходом по списку: {mismatches}")
+        return 1
+    print("✅ Результаты совпадают с проходом по списку правил")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
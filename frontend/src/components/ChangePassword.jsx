@@ -76,7 +76,11 @@ const ChangePassword = ({ onClose }) => {
 
     setLoading(true);
     try {
-      await api.post('/api/profile/change-password', formData);
+      const response = await api.post('/api/profile/change-password', formData);
+      // Старые токены отозваны - продолжаем сессию с новым
+      if (response.data?.access_token) {
+        api.setToken(response.data.access_token);
+      }
       setSuccess(true);
       
       // Автоматически закрываем модальное окно через 2 секунды
@@ -33,6 +33,7 @@ const ActivityLogs = () => {
   const [resourceTypes, setResourceTypes] = useState([]);
   const [totalPages, setTotalPages] = useState(1);
   const [totalLogs, setTotalLogs] = useState(0);
+  const [totalCapped, setTotalCapped] = useState(false);
 
   useEffect(() => {
     loadActivityLogs();
@@ -53,8 +54,9 @@ const ActivityLogs = () => {
 
       const response = await api.get(`/api/activity-logs/?${params.toString()}`);
       setLogs(response.data.items);
-      setTotalPages(response.data.pages);
-      setTotalLogs(response.data.total);
+      setTotalPages(response.data.pages || 1);
+      setTotalLogs(response.data.total || 0);
+      setTotalCapped(response.data.total_capped);
     } catch (err) {
       setError('Ошибка загрузки журнала активности: ' + err.message);
     } finally {
@@ -343,7 +345,7 @@ const ActivityLogs = () => {
       {/* Информация о результатах */}
       <div className="flex flex-col sm:flex-row sm:items-center sm:justify-between gap-2 text-xs sm:text-sm text-gray-600">
         <span>
-          Показано {logs.length} из {totalLogs} записей
+          Показано {logs.length} из {totalLogs}{totalCapped ? '+' : ''} записей
         </span>
         <span>
           Страница {filters.page} из {totalPages}
@@ -26,6 +26,23 @@ import {
   BugAntIcon
 } from '@heroicons/react/24/outline';
 
+// Операторы условий правил маршрутизации (см. backend/app/services/routing_rules.py)
+const ROUTING_OPERATORS = [
+  { value: 'eq', label: 'Равно' },
+  { value: 'in', label: 'Одно из (через запятую)' },
+  { value: 'regex', label: 'Регулярное выражение' },
+  { value: 'range', label: 'Число в диапазоне (min..max)' }
+];
+
+const ROUTING_OPERATOR_SIGNS = { eq: '=', in: 'одно из', regex: '~', range: 'в диапазоне' };
+
+const ROUTING_VALUE_HINTS = {
+  eq: 'Например: technical',
+  in: 'Например: technical, economic',
+  regex: 'Например: ^ИТ-\\d+',
+  range: 'Например: 3..4'
+};
+
 const RequestBuilder = () => {
   const [templates, setTemplates] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -63,6 +80,7 @@ const RequestBuilder = () => {
   const [editingRule, setEditingRule] = useState(null);
   const [ruleData, setRuleData] = useState({
     field: '',
+    operator: 'eq',
     value: '',
     assignees: []
   });
@@ -357,6 +375,7 @@ const RequestBuilder = () => {
     setEditingRule(null);
     setRuleData({
       field: '',
+      operator: 'eq',
       value: '',
       assignees: []
     });
@@ -369,8 +388,11 @@ const RequestBuilder = () => {
     setEditingRule(index);
     setRuleData({
       field: rule.field,
+      operator: rule.operator || 'eq',
       value: rule.value,
-      assignees: rule.assignees
+      assignees: rule.assignees,
+      // Дополнительные условия (задаются через API) сохраняются при редактировании
+      conditions: rule.conditions || null
     });
     
     // Загружаем информацию о назначенных пользователях для правила
@@ -401,8 +423,10 @@ const RequestBuilder = () => {
 
     const rule = {
       field: ruleData.field.trim(),
+      operator: ruleData.operator || 'eq',
       value: ruleData.value.trim(),
-      assignees: ruleAssignees.map(user => user.id)
+      assignees: ruleAssignees.map(user => user.id),
+      ...(ruleData.conditions?.length ? { conditions: ruleData.conditions } : {})
     };
 
     let updatedRules;
@@ -1109,7 +1133,8 @@ const RequestBuilder = () => {
                               <div className="flex-1">
                                 <div className="flex items-center space-x-2">
                                   <span className="text-sm font-medium text-gray-900">
-                                    Если поле "{rule.field}" = "{rule.value}"
+                                    Если поле "{rule.field}" {ROUTING_OPERATOR_SIGNS[rule.operator || 'eq']} "{rule.value}"
+                                    {rule.conditions?.length > 0 && ` и еще ${rule.conditions.length} усл.`}
                                   </span>
                                   <span className="text-xs text-gray-500">→</span>
                                   <span className="text-sm text-blue-600">
@@ -1165,7 +1190,7 @@ const RequestBuilder = () => {
                           </CardHeader>
                           <CardContent>
                             <div className="space-y-4">
-                              <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
+                              <div className="grid grid-cols-1 md:grid-cols-3 gap-4">
                                 <div>
                                   <label className="block text-sm font-medium text-gray-700 mb-1">
                                     Поле формы *
@@ -1181,6 +1206,18 @@ const RequestBuilder = () => {
                                   </p>
                                 </div>
 
+                                <div>
+                                  <label className="block text-sm font-medium text-gray-700 mb-1">
+                                    Условие
+                                  </label>
+                                  <Select
+                                    value={ruleData.operator || 'eq'}
+                                    onChange={(value) => setRuleData(prev => ({ ...prev, operator: value }))}
+                                    options={ROUTING_OPERATORS}
+                                    disabled={loading}
+                                  />
+                                </div>
+
                                 <div>
                                   <label className="block text-sm font-medium text-gray-700 mb-1">
                                     Значение поля *
@@ -1188,7 +1225,7 @@ const RequestBuilder = () => {
                                   <Input
                                     value={ruleData.value}
                                     onChange={(e) => setRuleData(prev => ({ ...prev, value: e.target.value }))}
-                                    placeholder="Например: technical, economic"
+                                    placeholder={ROUTING_VALUE_HINTS[ruleData.operator || 'eq']}
                                     disabled={loading}
                                   />
                                   <p className="text-xs text-gray-500 mt-1">
@@ -22,24 +22,43 @@ const AssignedRequests = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [statusFilter, setStatusFilter] = useState('all');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [total, setTotal] = useState(0);
+  const [statusCounts, setStatusCounts] = useState({});
+  const [deadlineCounts, setDeadlineCounts] = useState({ overdue: 0, urgent: 0 });
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     loadRequests();
   }, [statusFilter]);
 
-  const loadRequests = async () => {
+  // cursor - курсор следующей страницы; без него список загружается заново
+  const loadRequests = async (cursor = null) => {
     try {
-      setLoading(true);
+      if (cursor) {
+        setLoadingMore(true);
+      } else {
+        setLoading(true);
+      }
       setError(null);
       
       const params = statusFilter !== 'all' ? { status: statusFilter.toLowerCase() } : {};
+      if (cursor) {
+        params.cursor = cursor;
+      }
       const response = await api.get('/api/requests/assigned', { params });
-      setRequests(response.data);
+      const { items, next_cursor, total, status_counts, deadline_counts } = response.data;
+      setRequests(prev => (cursor ? [...prev, ...items] : items));
+      setNextCursor(next_cursor);
+      setTotal(total);
+      setStatusCounts(status_counts || {});
+      setDeadlineCounts(deadline_counts || { overdue: 0, urgent: 0 });
     } catch (err) {
       console.error('Ошибка загрузки заявок:', err);
       setError('Не удалось загрузить заявки: ' + getErrorMessage(err));
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -225,6 +244,9 @@ const AssignedRequests = () => {
                 }`}
               >
                 {getStatusLabel(status)}
+                {statusCounts[status.toLowerCase()] > 0 && (
+                  <span className="ml-1 text-xs text-gray-500">{statusCounts[status.toLowerCase()]}</span>
+                )}
               </button>
             ))}
           </div>
@@ -240,7 +262,7 @@ const AssignedRequests = () => {
               <div className="min-w-0">
                 <p className="text-sm font-medium text-red-600">Просроченные</p>
                 <p className="text-2xl font-bold text-red-700">
-                  {requests.filter(r => getPriorityByDeadline(r.deadline) === 'overdue').length}
+                  {deadlineCounts.overdue}
                 </p>
                 <p className="text-xs text-red-500 mt-1">требуют внимания</p>
               </div>
@@ -255,7 +277,7 @@ const AssignedRequests = () => {
               <div className="min-w-0">
                 <p className="text-sm font-medium text-orange-600">Срочные</p>
                 <p className="text-2xl font-bold text-orange-700">
-                  {requests.filter(r => getPriorityByDeadline(r.deadline) === 'urgent').length}
+                  {deadlineCounts.urgent}
                 </p>
                 <p className="text-xs text-orange-500 mt-1">до 2 дней</p>
               </div>
@@ -270,7 +292,7 @@ const AssignedRequests = () => {
               <div className="min-w-0">
                 <p className="text-sm font-medium text-blue-600">На рассмотрении</p>
                 <p className="text-2xl font-bold text-blue-700">
-                  {requests.filter(r => r.status?.toUpperCase() === 'IN_REVIEW').length}
+                  {statusCounts.in_review || 0}
                 </p>
                 <p className="text-xs text-blue-500 mt-1">ожидают решения</p>
               </div>
@@ -285,7 +307,7 @@ const AssignedRequests = () => {
               <div className="min-w-0">
                 <p className="text-sm font-medium text-green-600">Завершенные</p>
                 <p className="text-2xl font-bold text-green-700">
-                  {requests.filter(r => r.status?.toUpperCase() === 'COMPLETED').length}
+                  {statusCounts.completed || 0}
                 </p>
                 <p className="text-xs text-green-500 mt-1">выполнено</p>
               </div>
@@ -300,7 +322,7 @@ const AssignedRequests = () => {
           <CardTitle>
             {statusFilter === 'all' ? 'Все заявки' : `Заявки: ${getStatusLabel(statusFilter)}`}
             <span className="ml-2 text-sm font-normal text-gray-500">
-              ({requests.length})
+              ({total})
             </span>
           </CardTitle>
         </CardHeader>
@@ -394,6 +416,18 @@ const AssignedRequests = () => {
                               })}
             </div>
           )}
+          {nextCursor && (
+            <div className="mt-4 flex justify-center">
+              <Button
+                onClick={() => loadRequests(nextCursor)}
+                variant="outline"
+                size="sm"
+                disabled={loadingMore}
+              >
+                {loadingMore ? 'Загрузка...' : `Показать еще (загружено ${requests.length} из ${total})`}
+              </Button>
+            </div>
+          )}
         </CardContent>
       </Card>
     </div>
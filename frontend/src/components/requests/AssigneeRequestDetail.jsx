@@ -86,7 +86,8 @@ const AssigneeRequestDetail = () => {
       setActionLoading(true);
       setError(null);
       
-      await api.post(`/api/requests/${id}/take`);
+      // Версия защищает от одновременного взятия заявки несколькими сотрудниками
+      await api.post(`/api/requests/${id}/take`, null, { params: { version: request?.version } });
       
       await loadRequest();
     } catch (err) {
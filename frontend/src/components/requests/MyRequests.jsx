@@ -22,24 +22,41 @@ const MyRequests = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [statusFilter, setStatusFilter] = useState('all');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [total, setTotal] = useState(0);
+  const [statusCounts, setStatusCounts] = useState({});
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     loadRequests();
   }, [statusFilter]);
 
-  const loadRequests = async () => {
+  // cursor - курсор следующей страницы; без него список загружается заново
+  const loadRequests = async (cursor = null) => {
     try {
-      setLoading(true);
+      if (cursor) {
+        setLoadingMore(true);
+      } else {
+        setLoading(true);
+      }
       setError(null);
       
       const params = statusFilter !== 'all' ? { status: statusFilter.toLowerCase() } : {};
+      if (cursor) {
+        params.cursor = cursor;
+      }
       const response = await api.get('/api/requests/my', { params });
-      setRequests(response.data);
+      const { items, next_cursor, total, status_counts } = response.data;
+      setRequests(prev => (cursor ? [...prev, ...items] : items));
+      setNextCursor(next_cursor);
+      setTotal(total);
+      setStatusCounts(status_counts || {});
     } catch (err) {
       console.error('Ошибка загрузки заявок:', err);
       setError('Не удалось загрузить заявки: ' + getErrorMessage(err));
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -172,6 +189,9 @@ const MyRequests = () => {
                 }`}
               >
                 {getStatusLabel(status)}
+                {statusCounts[status.toLowerCase()] > 0 && (
+                  <span className="ml-1 text-xs text-gray-500">{statusCounts[status.toLowerCase()]}</span>
+                )}
               </button>
             ))}
           </div>
@@ -184,7 +204,7 @@ const MyRequests = () => {
           <CardTitle>
             {statusFilter === 'all' ? 'Все заявки' : `Заявки: ${getStatusLabel(statusFilter)}`}
             <span className="ml-2 text-sm font-normal text-gray-500">
-              ({requests.length})
+              ({total})
             </span>
           </CardTitle>
         </CardHeader>
@@ -287,6 +307,18 @@ const MyRequests = () => {
               ))}
             </div>
           )}
+          {nextCursor && (
+            <div className="mt-4 flex justify-center">
+              <Button
+                onClick={() => loadRequests(nextCursor)}
+                variant="outline"
+                size="sm"
+                disabled={loadingMore}
+              >
+                {loadingMore ? 'Загрузка...' : `Показать еще (загружено ${requests.length} из ${total})`}
+              </Button>
+            </div>
+          )}
         </CardContent>
       </Card>
     </div>